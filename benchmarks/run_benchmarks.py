@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : run_benchmarks.py
+#  Required    : numpy, netCDF4, csv2nc (../csv2nc)
+#  Usage       : run_benchmarks.py [--rows N ...] [--variables N ...]
+#                                  [--stream atm|ocn ...] [--json FILE]
+#                                  [--baseline FILE [--tolerance F]]
+#  Purpose     : Time the conversion stages (csv2nc/instrument.py) on
+#                synthetic station files of increasing size and width, and record rows
+#                per second and peak RSS per case. Each case runs in its own
+#                process so that its peak RSS is not inherited from the
+#                previous one. With --baseline, a case whose total time grew
+#                by more than --tolerance over the baseline run is reported
+#                and the exit status is 1.
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from synthetic import write_station
+
+from csv2nc.instrument import STAGES
+
+
+def run_case(csv_path, hdr_path, out_path, profile, chunk_rows, block_size):
+    """Convert one file, timing each stage; runs in a child process."""
+    from csv2nc import Stats, convert_file, read_hdr
+
+    stats = Stats()
+    with stats.stage('header'):
+        station = read_hdr(hdr_path)
+    convert_file(csv_path, out_path, station, station['period'],
+                 file_id='benchmark', block_size=block_size,
+                 chunk_rows=chunk_rows, profile=profile, stats=stats)
+    # CSV rows: ocn files hold fewer records, one per time
+    rows = stats.stages['csv_parse']['rows']
+    record = stats.record(rows=rows)
+    total = record['seconds']
+    return {
+        'rows'        : rows,
+        'seconds'     : dict((name, record['stages'].get(name, {}).get('seconds', 0.))
+                             for name in STAGES),
+        'total'       : total,
+        'rows_per_sec': rows / total if total else 0.,
+        'peak_rss_mb' : record['peak_rss_mb'],
+    }
+
+
+def _in_child(args):
+    return run_case(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the csv2nc conversion stages on synthetic station files.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                        help='data rows per file (default: 1000 100000)')
+    parser.add_argument('--variables', type=int, nargs='+', default=[2, 7, 14],
+                        help='measurement columns per file (default: 2 7 14)')
+    parser.add_argument('--stream', nargs='+', choices=('atm', 'ocn'),
+                        default=['atm', 'ocn'])
+    parser.add_argument('--profile', default='default')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--block-size', type=int, default=65536)
+    parser.add_argument('--workdir', help='keep (and reuse) the synthetic '
+                                          'inputs in this directory')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown over the baseline (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='csv2nc-bench-')
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = dict((result['case'], result) for result in json.load(fh))
+
+    print(('%-20s %10s' + ' %16s' * len(STAGES) + ' %8s %12s %9s')
+          % (('case', 'rows') + STAGES + ('total', 'rows/s', 'peak MB')))
+    results = []
+    slower = []
+    for stream, rows, variables in itertools.product(args.stream, args.rows, args.variables):
+        case = '%s_%d_%d' % (stream, rows, variables)
+        prefix = 'bench_' + case
+        csv_path = os.path.join(workdir, prefix + '.csv')
+        if not os.path.isfile(csv_path):
+            write_station(workdir, prefix, stream, rows, variables)
+        job = (csv_path, os.path.join(workdir, prefix + '.hdr'),
+               os.path.join(workdir, prefix + '.nc'), args.profile,
+               args.chunk_rows or None, args.block_size or None)
+        with multiprocessing.Pool(1) as pool:
+            result = pool.apply(_in_child, (job,))
+        os.remove(job[2])
+        result.update(case=case, stream=stream, variables=variables,
+                      profile=args.profile)
+        results.append(result)
+        print(('%-20s %10d' + ' %16.3f' * len(STAGES) + ' %8.3f %12.0f %9.1f')
+              % ((case, result['rows']) + tuple(result['seconds'][s] for s in STAGES)
+                 + (result['total'], result['rows_per_sec'], result['peak_rss_mb'])))
+        before = baseline.get(case)
+        if before and result['total'] > before['total'] * (1. + args.tolerance):
+            slower.append('%s: %.3fs -> %.3fs' % (case, before['total'], result['total']))
+
+    if not args.workdir:
+        shutil.rmtree(workdir)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=1)
+    if slower:
+        print('\nslower than the baseline by more than %d%%:' % (args.tolerance * 100))
+        for line in slower:
+            print('  ' + line)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
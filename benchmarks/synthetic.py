@@ -0,0 +1,117 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : synthetic.py
+#  Required    : numpy, csv2nc (../csv2nc)
+#  Purpose     : Generate synthetic GCOOS WAF station files (prefix.csv and
+#                prefix.hdr) with the column layout of the real atm/ocn
+#                exports: 'name (units)' headers, -999.0 fill values and, for
+#                ocn files, two rows per timestamp (one at depth 0.0 holding
+#                the sea surface height, one at the sensor depth holding the
+#                other observations).
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc import cf
+
+ATM_COLUMNS = ('air_pressure', 'air_temperature', 'dew_point_temperature',
+               'relative_humidity', 'wind_speed', 'wind_speed_of_gust',
+               'wind_to_direction')
+OCN_COLUMNS = ('sea_water_speed', 'direction_of_sea_water_velocity',
+               'upward_sea_water_velocity', 'eastward_sea_water_velocity',
+               'northward_sea_water_velocity',
+               'mass_concentration_of_chlorophyll_in_sea_water',
+               'mole_concentration_of_dissolved_molecular_oxygen_in_sea_water',
+               'sea_surface_height_above_sea_level',
+               'sea_water_practical_salinity', 'sea_water_temperature',
+               'sea_water_turbidity')
+SURFACE_COLUMN = 'sea_surface_height_above_sea_level'
+
+# ocn columns populated in the real exports, picked first for small files
+_OCN_FIRST = (SURFACE_COLUMN, 'sea_water_practical_salinity',
+              'sea_water_temperature')
+
+_BLOCK = 100000
+
+
+def columns_for(stream, variables):
+    """Names of the ``variables`` measurement columns of a ``stream`` file,
+    in WAF column order: the stream's own columns first, then those of the
+    other stream."""
+    if stream == 'ocn':
+        rest = tuple(name for name in OCN_COLUMNS if name not in _OCN_FIRST)
+        order, picks = OCN_COLUMNS + ATM_COLUMNS, _OCN_FIRST + rest + ATM_COLUMNS
+    else:
+        order = picks = ATM_COLUMNS + OCN_COLUMNS
+    if not 1 <= variables <= len(picks):
+        raise ValueError('between 1 and %d variables are available' % len(picks))
+    chosen = set(picks[:variables])
+    return tuple(name for name in order if name in chosen)
+
+
+def _values(rng, name, count):
+    entry = cf.VARIABLES.get(name, {})
+    low, high = entry.get('valid_min', 0.), entry.get('valid_max', 100.)
+    return rng.uniform(low, low + (high - low) * 0.8, count)
+
+
+def _format(values):
+    return np.char.mod('%.3f', values).astype('S')
+
+
+def write_station(directory, prefix, stream='atm', rows=1000, variables=4,
+                  fill_fraction=0.1, start='2015-01-01', station='SYN1', seed=0):
+    """Write ``directory``/``prefix``.csv and .hdr with ``rows`` data rows of
+    ``variables`` measurement columns; returns the CSV path.
+
+    A ``fill_fraction`` of the values are -999.0.  atm rows are hourly at
+    half past the hour; ocn rows come in pairs per hourly timestamp.
+    """
+    rng = np.random.default_rng(seed)
+    names = columns_for(stream, variables)
+    ocn = stream == 'ocn'
+    units = [cf.VARIABLES[name]['units'] for name in names]
+
+    header = ['date', 'time'] + (['depth (m)'] if ocn else [])
+    header += ['%s (%s)' % (name, unit) for name, unit in zip(names, units)]
+    csv_path = os.path.join(directory, prefix + '.csv')
+    origin = np.datetime64(start, 's')
+
+    with open(csv_path, 'wb') as fh:
+        fh.write((','.join(header) + ' \n').encode('ascii'))
+        for first in range(0, rows, _BLOCK):
+            index = np.arange(first, min(first + _BLOCK, rows))
+            if ocn:
+                stamps = origin + (index // 2) * 3600
+            else:
+                stamps = origin + index * 3600 + 1800
+            text = np.datetime_as_string(stamps, unit='s').astype('S19')
+            raw = text.view('S1').reshape(-1, 19)
+            fields = [raw[:, :10].copy().view('S10').ravel(),
+                      raw[:, 11:].copy().view('S8').ravel()]
+            surface = (index % 2 == 0) if ocn else None
+            if ocn:
+                depth = np.where(surface, 0., np.round(rng.uniform(1.5, 3., len(index)), 3))
+                fields.append(_format(depth))
+            for name in names:
+                values = _values(rng, name, len(index))
+                values[rng.random(len(index)) < fill_fraction] = cf.FILL_VALUE
+                if ocn:
+                    at_surface = name == SURFACE_COLUMN
+                    values[surface != at_surface] = cf.FILL_VALUE
+                fields.append(_format(values))
+            line = fields[0]
+            for field in fields[1:]:
+                line = np.char.add(np.char.add(line, b','), field)
+            fh.write(b' \n'.join(line) + b' \n')
+
+    instruments = sorted(set(cf.VARIABLES[name]['instrument'] for name in names))
+    hdr = "%s,ioos:station:SYN:%s,http://data.gcoos.org/,'Synthetic station %s',ioos:station:SYN,Synthetic station %s,'%s','Synthetic probes and sensors',28.5,-90.0,%d" % (
+        start[:7], station, station, station, ', '.join(instruments), rows)
+    with open(os.path.join(directory, prefix + '.hdr'), 'w') as fh:
+        fh.write(hdr)
+    return csv_path
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : convert_gcoos_nc.py
+#  Required    : numpy,netCDF4,csv2nc (../csv2nc)
+#  Usage       : convert_gcoos_nc.py [-i] [-o OUT_DIR] CSV [CSV ...]
+#  Purpose     : Convert the CSV files named (- reads their paths from
+#                standard input), each with the .hdr next to it, in one
+#                process; meant for frequent runs over a few small files.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
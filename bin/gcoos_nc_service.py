@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : gcoos_nc_service.py
+#  Required    : numpy,netCDF4,csv2nc (../csv2nc)
+#  Usage       : gcoos_nc_service.py [--host HOST] [--port PORT] IN_DIR
+#  Purpose     : Serve the *.csv/*.hdr pairs of IN_DIR (e.g. csv/) as netCDF,
+#                converted on demand: GET /DISL_BSCA/2015-05/atm.nc returns
+#                gcoos_ioos_station_DISL_BSCA_2015_05_atm.nc.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.service import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : generate_gcoos_nc_batch.py
+#  Required    : numpy,netCDF4,csv2nc (../csv2nc)
+#  Usage       : generate_gcoos_nc_batch.py [-j WORKERS] IN_DIR OUT_DIR
+#  Purpose     : Convert every *.csv/*.hdr pair found in IN_DIR (e.g. csv/) to
+#                netCDF in OUT_DIR, using WORKERS processes, and print a
+#                per-file success/failure report.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.batch import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : index_gcoos_nc.py
+#  Required    : numpy,netCDF4,csv2nc (../csv2nc)
+#  Usage       : index_gcoos_nc.py OUT_DIR
+#  Purpose     : Write the time index of the *.nc files of OUT_DIR (e.g. nc/)
+#                that have none, and the catalog csv2nc.timeindex.query()
+#                reads.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.timeindex import main
+
+if __name__ == '__main__':
+    sys.exit(main())
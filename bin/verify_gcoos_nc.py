@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : verify_gcoos_nc.py
+#  Required    : numpy,netCDF4,csv2nc (../csv2nc)
+#  Usage       : verify_gcoos_nc.py [-j N] [--rtol R] [--atol A] NEW REFERENCE
+#  Purpose     : Compare regenerated netCDF files (a file or a directory) with
+#                the reference outputs, e.g. nc/, ignoring the attributes
+#                that change at every run.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.verify import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : csv2nc
+#  Purpose     : Conversion engine and shared stages used by the GCOOS CSV
+#                to netCDF generators in bin/. Other programs convert a
+#                CSV/HDR pair with a single call:
+#
+#                    import csv2nc
+#                    csv2nc.convert('..._2015_05_atm.csv', '..._2015_05_atm.hdr',
+#                                   '..._2015_05_atm.nc', profile='archive')
+#
+#                The names below are imported from their module on first use,
+#                so that importing the package (or a module that needs
+#                neither numpy nor netCDF4, e.g. batch.py or cli.py) does not
+#                load them.
+
+import importlib
+
+# exported names, by module
+_EXPORTS = {
+    'api'       : ('convert',),
+    'backends'  : ('Fanout', 'WRITERS'),
+    'batch'     : ('convert_directory', 'convert_pairs', 'discover'),
+    'engine'    : ('AppendError', 'append_file', 'append_options',
+                   'convert_bytes', 'convert_file', 'define_variables',
+                   'global_attributes', 'open_variables', 'station_template',
+                   'write_chunk', 'write_records'),
+    'header'    : ('parse_hdr', 'read_hdr'),
+    'instrument': ('Stats', 'emit'),
+    'profiles'  : ('PROFILES', 'DEFAULT_PROFILE', 'variable_options'),
+    'reader'    : ('iter_chunks', 'prefetch', 'DEFAULT_CHUNK_ROWS', 'DEFAULT_PREFETCH'),
+    'schema'    : ('parse_header', 'read_schema', 'Column', 'Schema'),
+    'staging'   : ('BUILD_MODES', 'DEFAULT_BUILD'),
+    'times'     : ('parse_timestamps', 'EPOCH_UNITS'),
+    'writer'    : ('write_blocks', 'write_columns', 'DEFAULT_BLOCK_SIZE'),
+}
+
+_MODULES = dict((name, module) for module, names in _EXPORTS.items()
+                for name in names)
+
+__all__ = [name for names in _EXPORTS.values() for name in names]
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : aggregate.py
+#  Purpose     : One netCDF file per station and stream instead of one per
+#                month. The monthly CSVs of a station/stream
+#                (<station>_YYYY_MM_<stream>.csv) are written in
+#                chronological order: the first is converted and the others
+#                appended along the unlimited timeSeries dimension, so the
+#                time index stays sorted. An incremental update appends the
+#                new rows of the last month and any later months; a change
+#                to an earlier month, or a month inserted before the last
+#                one, rebuilds the file.
+
+import collections
+import os
+import re
+
+import netCDF4
+
+from . import manifest, staging, timeindex
+from .engine import append_file, append_options, convert_file, \
+                    global_attributes, AppendError
+from .header import read_hdr
+from .instrument import Stats
+from .schema import read_schema
+
+_MONTHLY = re.compile(r'^(?P<station>.+)_(?P<year>\d{4})_(?P<month>\d{2})_(?P<stream>[A-Za-z0-9]+)$')
+
+
+def aggregate_name(csv_path):
+    """Name (without extension) of the station/stream aggregate of
+    ``csv_path``, or None when it is not named <station>_YYYY_MM_<stream>."""
+    match = _MONTHLY.match(os.path.splitext(os.path.basename(csv_path))[0])
+    if match is None:
+        return None
+    return '%s_%s' % (match.group('station'), match.group('stream'))
+
+
+def group(pairs):
+    """Group sorted (csv, hdr) pairs by aggregate; returns an ordered
+    {name: [(csv, hdr), ...]} with the months of each in chronological
+    order.  Files not named by month are left out."""
+    groups = collections.OrderedDict()
+    for csv_path, hdr_path in sorted(pairs):
+        name = aggregate_name(csv_path)
+        if name is not None:
+            groups.setdefault(name, []).append((csv_path, hdr_path))
+    return groups
+
+
+def _period(members):
+    first = read_hdr(members[0][1])['period']
+    last = read_hdr(members[-1][1])['period']
+    return first if first == last else '%s to %s' % (first, last)
+
+
+def _retitle(outfile, members, file_id):
+    """Set the title and summary of ``outfile`` to the period its members
+    cover."""
+    station = read_hdr(members[0][1])
+    attributes = global_attributes(station, _period(members), file_id,
+                                   read_schema(members[0][0]))
+    nc = netCDF4.Dataset(outfile, 'a')
+    try:
+        nc.setncatts({'title': attributes['title'],
+                      'summary': attributes['summary']})
+    finally:
+        nc.close()
+
+
+def _index(outfile, stats):
+    """Write the time index of the complete aggregate ``outfile``."""
+    with stats.stage('close'):
+        timeindex.write_index(outfile, timeindex.index_file(outfile))
+
+
+def _check_columns(members):
+    schema = read_schema(members[0][0])
+    for csv_path, _ in members[1:]:
+        if read_schema(csv_path).columns != schema.columns:
+            raise ValueError('%s: columns differ from %s'
+                             % (csv_path, os.path.basename(members[0][0])))
+
+
+def _member(csv_path, hdr_path, settings):
+    entry = manifest.make_entry(csv_path, hdr_path, read_hdr(hdr_path), 0,
+                                settings)
+    entry['name'] = os.path.basename(csv_path)
+    return entry
+
+
+def build(members, outfile, settings=None, stats=None, **options):
+    """Write the aggregate ``outfile`` of the chronological (csv, hdr)
+    ``members`` from scratch.
+
+    ``options`` are passed on to convert_file.  Unless their ``build`` is
+    INPLACE, the months are all written to one temporary file renamed into
+    place at the end.  Returns the number of records and, when ``settings``
+    is given, the manifest entries of the members.
+    """
+    stats = stats or Stats()
+    if options.pop('formats', None):
+        raise ValueError('aggregates are written as netCDF only')
+    if options.pop('resolutions', None):
+        raise ValueError('aggregates are not resampled')
+    _check_columns(members)
+    file_id = os.path.splitext(os.path.basename(outfile))[0]
+    mode = options.pop('build', staging.DEFAULT_BUILD)
+    appending = append_options(options)
+    entries = []
+    rows = 0
+    with staging.staged(outfile, mode) as path:
+        for n, (csv_path, hdr_path) in enumerate(members):
+            if settings is not None:
+                entries.append(_member(csv_path, hdr_path, settings))
+            if n == 0:
+                with stats.stage('header'):
+                    station = read_hdr(hdr_path)
+                added = convert_file(csv_path, path, station, _period(members),
+                                     file_id=file_id, stats=stats,
+                                     build=staging.MEMORY if mode == staging.MEMORY
+                                     else staging.INPLACE, index=False, **options)
+            else:
+                try:
+                    added = append_file(csv_path, path, 0, stats=stats,
+                                        build=staging.INPLACE, index=False,
+                                        **appending)
+                except BaseException:
+                    if mode == staging.INPLACE:
+                        os.remove(path)
+                    raise
+            if entries:
+                entries[-1]['rows'] = added
+            rows += added
+    _index(outfile, stats)
+    return rows, entries
+
+
+def plan(entry, members, outfile, settings=None):
+    """Decide how to bring the aggregate ``outfile`` up to date.
+
+    ``entry`` is its manifest entry (None when absent).  Returns
+    ``(action, start, offset)``: SKIP, CONVERT (rebuild from all members) or
+    APPEND the members from index ``start`` on, the first of them from byte
+    ``offset``.
+    """
+    settings = settings or {}
+    if not entry or not os.path.isfile(outfile) \
+            or entry.get('settings') != settings or not entry.get('members'):
+        return manifest.CONVERT, 0, 0
+    done = entry['members']
+    names = [os.path.basename(csv_path) for csv_path, _ in members]
+    if [member['name'] for member in done] != names[:len(done)]:
+        return manifest.CONVERT, 0, 0
+    for n, (member, (csv_path, hdr_path)) in enumerate(zip(done, members)):
+        action, offset = manifest.plan(member, csv_path, hdr_path, outfile,
+                                       read_hdr(hdr_path), settings)
+        if action == manifest.CONVERT \
+                or (action == manifest.APPEND and n < len(done) - 1):
+            return manifest.CONVERT, 0, 0
+        if action == manifest.APPEND:
+            return manifest.APPEND, n, offset
+    if len(done) < len(members):
+        return manifest.APPEND, len(done), 0
+    return manifest.SKIP, 0, 0
+
+
+def update(entry, members, outfile, settings=None, stats=None, **options):
+    """Skip, append to or rebuild the aggregate ``outfile``; returns the
+    action taken, the number of records and the new manifest entry."""
+    stats = stats or Stats()
+    settings = settings or {}
+    if options.get('resolutions'):
+        raise ValueError('aggregates are not resampled')
+    action, start, offset = plan(entry, members, outfile, settings)
+    if action == manifest.SKIP:
+        done = [manifest.refresh(member, csv_path, hdr_path)
+                for member, (csv_path, hdr_path) in zip(entry['members'], members)]
+        return action, entry['rows'], dict(entry, members=done)
+
+    if action == manifest.APPEND:
+        appending = append_options(options)
+        mode = appending.pop('build', staging.DEFAULT_BUILD)
+        done = entry['members'][:start]
+        rows = entry['rows']
+        try:
+            _check_columns([members[0]] + members[start:])
+            # one copy for all the months appended
+            with staging.staged(outfile, mode, copy=True) as path:
+                for n in range(start, len(members)):
+                    csv_path, hdr_path = members[n]
+                    member = _member(csv_path, hdr_path, settings)
+                    added = append_file(csv_path, path,
+                                        offset if n == start else 0, stats=stats,
+                                        build=staging.INPLACE, index=False,
+                                        **appending)
+                    member['rows'] = added
+                    if n < len(entry['members']):
+                        member['rows'] += entry['members'][n]['rows']
+                    done.append(member)
+                    rows += added
+                _retitle(path, members,
+                         os.path.splitext(os.path.basename(outfile))[0])
+            _index(outfile, stats)
+        except AppendError as e:
+            print('Rebuilding %s: %s' % (outfile, e))
+            action = manifest.CONVERT
+    if action == manifest.CONVERT:
+        rows, done = build(members, outfile, settings, stats, **options)
+    return action, rows, {'members': done, 'rows': rows, 'settings': settings}
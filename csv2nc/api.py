@@ -0,0 +1,40 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : api.py
+#  Purpose     : One-call conversion of a WAF CSV/HDR pair for callers that
+#                import the package instead of editing and running the
+#                scripts in bin/: the station metadata is read from the
+#                header and the netCDF file written to a path or a stream.
+
+import os
+
+from .engine import convert_bytes, convert_file
+from .header import read_hdr
+
+
+def convert(csv_path, hdr_path, out, period=None, vertical_position=None,
+            file_id=None, **options):
+    """Convert the WAF CSV ``csv_path`` described by the station header
+    ``hdr_path``.
+
+    ``out`` is the path of the netCDF file or a binary stream the file is
+    written to.  ``period`` and ``vertical_position`` override the values of
+    the header (the sensor height is set per stream by read_hdr); ``file_id``
+    defaults to the name of ``csv_path``.  ``options`` (block_size,
+    chunk_rows, profile, build, stats) are passed on to convert_file.
+    Returns the number of records written.
+    """
+    station = read_hdr(hdr_path)
+    if vertical_position is not None:
+        station['vertical_position'] = vertical_position
+    period = period or station['period']
+    if file_id is None:
+        file_id = os.path.splitext(os.path.basename(csv_path))[0]
+    if hasattr(out, 'write'):
+        options.pop('build', None)
+        data, rows = convert_bytes(csv_path, station, period, file_id, **options)
+        out.write(data)
+        return rows
+    return convert_file(csv_path, out, station, period, file_id=file_id,
+                        **options)
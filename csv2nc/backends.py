@@ -0,0 +1,426 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : backends.py
+#  Required    : netCDF4, numpy; zarr (>= 3) and pyarrow for their formats
+#  Purpose     : Analytics copies of a conversion, written in the same pass
+#                as the NETCDF4_CLASSIC file NCEI takes. A writer answers the
+#                calls the engine makes on a netCDF4.Dataset (createDimension,
+#                createVariable, setncatts, slice assignment of the rows), so
+#                each copy gets the same parsed columns and CF attributes:
+#
+#                  netcdf4  NETCDF4, time as native int64 seconds and the QC
+#                           flags in a 'qc' group (.nc4)
+#                  zarr     directory store, every array on timeSeries
+#                           chunked on the same record boundaries (.zarr)
+#                  parquet  one row per record (and depth level), the CF
+#                           attributes in the file metadata (.parquet)
+#
+#                Fanout passes the calls on to the netCDF file and every copy.
+
+import base64
+import collections
+import json
+import os
+import warnings
+
+import netCDF4
+import numpy as np
+
+from . import qc
+from .cf import FILL_VALUE
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# records per Zarr chunk, for every array on timeSeries alike
+ZARR_CHUNK_RECORDS = 8760
+
+# netCDF type codes of the engine -> NumPy types
+_TYPES = {'d': 'f8', 'i': 'i4', 'b': 'i1', 'c': 'S1', 'i8': 'i8'}
+
+
+def _json(value):
+    """``value`` (an attribute) as a JSON-serializable Python value."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _attributes(attributes):
+    return dict((name, _json(value)) for name, value in attributes.items())
+
+
+class Netcdf4Writer(object):
+    """NETCDF4 copy: time stored as int64 and the '<name>_qc' flags in the
+    'qc' group, referred to by their path in ancillary_variables."""
+
+    def __init__(self, path):
+        self.nc = netCDF4.Dataset(path, 'w', format='NETCDF4')
+        self.flags = None
+
+    def createDimension(self, name, size):
+        return self.nc.createDimension(name, size)
+
+    def createVariable(self, name, datatype, dimensions, **options):
+        if name == 'time':
+            # seconds since 1970 are whole numbers
+            datatype = 'i8'
+        if name.endswith(qc.flag_name('')):
+            if self.flags is None:
+                self.flags = self.nc.createGroup('qc')
+            return self.flags.createVariable(name, datatype, dimensions, **options)
+        return self.nc.createVariable(name, datatype, dimensions, **options)
+
+    def setncatts(self, attributes):
+        self.nc.setncatts(attributes)
+
+    def __getitem__(self, name):
+        if self.flags is not None and name in self.flags.variables:
+            return self.flags[name]
+        return self.nc[name]
+
+    def isopen(self):
+        return self.nc.isopen()
+
+    def close(self):
+        if not self.nc.isopen():
+            return
+        if self.flags is not None:
+            for variable in self.nc.variables.values():
+                if 'ancillary_variables' in variable.ncattrs():
+                    variable.ancillary_variables = ' '.join(
+                        'qc/' + name if name in self.flags.variables else name
+                        for name in variable.ancillary_variables.split())
+        self.nc.close()
+
+
+class _ZarrVariable(object):
+
+    def __init__(self, array, unlimited):
+        self.array = array
+        self.name = array.basename
+        self.unlimited = unlimited
+
+    def setncatts(self, attributes):
+        self.array.attrs.update(_attributes(attributes))
+
+    def __setitem__(self, key, values):
+        if not self.array.ndim:
+            self.array[...] = values
+            return
+        if self.unlimited and key.stop is not None and key.stop > self.array.shape[0]:
+            self.array.resize((key.stop,) + self.array.shape[1:])
+        self.array[key] = values
+
+
+class ZarrWriter(object):
+    """Zarr directory store, the dimension names recorded as
+    dimension_names for xarray; the metadata is consolidated on close."""
+
+    def __init__(self, path):
+        check_formats(['zarr'])
+        self.path = path
+        self.group = zarr.open_group(path, mode='w')
+        self.dimensions = {}
+        self.variables = {}
+
+    def createDimension(self, name, size):
+        self.dimensions[name] = size
+
+    def createVariable(self, name, datatype, dimensions, fill_value=None,
+                       **options):
+        # the HDF5 storage options of the profile do not apply
+        shape = tuple(self.dimensions[dimension] or 0 for dimension in dimensions)
+        chunks = tuple(ZARR_CHUNK_RECORDS if dimension == 'timeSeries' else size
+                       for dimension, size in zip(dimensions, shape))
+        array = self.group.create_array(
+            name, shape=shape, chunks=chunks,
+            # the char container variables hold no data
+            dtype='u1' if datatype == 'c' else _TYPES.get(datatype, datatype),
+            fill_value=fill_value, dimension_names=dimensions or None)
+        variable = self.variables[name] = _ZarrVariable(
+            array, bool(dimensions) and self.dimensions[dimensions[0]] is None)
+        return variable
+
+    def setncatts(self, attributes):
+        self.group.attrs.update(_attributes(attributes))
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def isopen(self):
+        return self.group is not None
+
+    def close(self):
+        if self.group is not None:
+            self.group = None
+            with warnings.catch_warnings():
+                # not in the Zarr 3 specification, but read by xarray
+                warnings.simplefilter('ignore')
+                zarr.consolidate_metadata(self.path)
+
+
+class _Column(object):
+
+    def __init__(self, owner, name, datatype, dimensions, fill_value):
+        self.owner = owner
+        self.name = name
+        self.dtype = np.dtype(_TYPES.get(datatype, datatype))
+        self.dimensions = dimensions
+        self.fill_value = fill_value
+        self.attributes = {}
+        # (first record, values) of the records not yet in a row group
+        self.blocks = []
+        # records written so far
+        self.end = 0
+        self.value = None
+
+    def setncatts(self, attributes):
+        self.attributes.update(_attributes(attributes))
+
+    def __setitem__(self, key, values):
+        if not self.dimensions:
+            self.value = _json(np.asarray(values)[()])
+            return
+        values = np.asarray(values, self.dtype)
+        start = key.start or 0
+        self.blocks.append((start, values))
+        self.end = max(self.end, start + len(values))
+        self.owner.written()
+
+    def take(self, first, stop, shape):
+        """Records ``first`` to ``stop``, the fill value where none was
+        written, dropping the blocks that end before ``stop``."""
+        fill = self.fill_value if self.fill_value is not None else 0
+        values = np.full((stop - first,) + shape, fill, dtype=self.dtype)
+        kept = []
+        for start, block in self.blocks:
+            low, high = max(start, first), min(start + len(block), stop)
+            if low < high:
+                values[low - first:high - first] = block[low - start:high - start]
+            if start + len(block) > stop:
+                kept.append((start, block))
+        self.blocks = kept
+        return values
+
+    def shape(self):
+        """Shape of a record (() or (levels,)), once known."""
+        return self.blocks[0][1].shape[1:] if self.blocks else None
+
+
+class ParquetWriter(object):
+    """Parquet table of the variables on timeSeries, one row per record or,
+    for files with a depth level, per record and level holding a depth.
+    Each time every column has been written past the records already out,
+    those records go to the file as one row group, so only the rows of the
+    current chunk are held.  The CF attributes of every column are stored
+    as JSON under the 'cf' key of its field metadata, and those of the file
+    and of the scalar variables (with their value) under the 'cf' key of
+    the file metadata; as attributes such as actual_range are only set
+    once the rows are written, the Arrow schema is completed on close."""
+
+    def __init__(self, path):
+        check_formats(['parquet'])
+        self.path = path
+        self.attributes = {}
+        self.variables = {}
+        self.open = True
+        self.writer = None
+        # records written to row groups
+        self.flushed = 0
+        # depth levels per record (0 for files without depth)
+        self.levels = None
+
+    def createDimension(self, name, size):
+        pass
+
+    def createVariable(self, name, datatype, dimensions, fill_value=None,
+                       **options):
+        variable = self.variables[name] = _Column(self, name, datatype,
+                                                  dimensions, fill_value)
+        return variable
+
+    def setncatts(self, attributes):
+        self.attributes.update(_attributes(attributes))
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def isopen(self):
+        return self.open
+
+    def _rows(self):
+        return [variable for variable in self.variables.values()
+                if variable.dimensions[:1] == ('timeSeries',)]
+
+    def written(self):
+        """Write out the records every column has reached."""
+        stop = min(variable.end for variable in self._rows())
+        if stop > self.flushed:
+            self._flush(stop)
+
+    def _flush(self, stop):
+        rows = self._rows()
+        if self.levels is None:
+            self.levels = max([variable.shape()[0] for variable in rows
+                               if variable.shape()] or [0])
+        count = stop - self.flushed
+        columns = dict((variable.name, variable.take(
+                            self.flushed, stop,
+                            (self.levels,) if len(variable.dimensions) > 1 else ()))
+                       for variable in rows)
+        if self.levels:
+            for name, values in columns.items():
+                columns[name] = values.reshape(-1) if values.ndim == 2 \
+                    else np.repeat(values, self.levels)
+            columns['level'] = np.tile(np.arange(self.levels, dtype='i4'), count)
+            keep = columns['z'] != FILL_VALUE
+            columns = dict((name, values[keep]) for name, values in columns.items())
+
+        arrays = []
+        for name, values in columns.items():
+            array = pyarrow.array(values)
+            if name == 'time':
+                array = array.cast('int64').cast(pyarrow.timestamp('s', tz='UTC'))
+            arrays.append(array)
+        if self.writer is None:
+            fields = [pyarrow.field(name, array.type, metadata={
+                          'cf': json.dumps(self.variables[name].attributes
+                                           if name in self.variables else {})})
+                      for name, array in zip(columns, arrays)]
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.path, pyarrow.schema(fields), compression='zstd')
+        self.writer.write_table(pyarrow.Table.from_arrays(
+            arrays, schema=self.writer.schema))
+        self.flushed = stop
+
+    def _schema(self):
+        """Schema of the file with the attributes as they are now."""
+        scalars = {}
+        for variable in self.variables.values():
+            if not variable.dimensions:
+                scalars[variable.name] = dict(variable.attributes)
+                if variable.value is not None:
+                    scalars[variable.name]['value'] = variable.value
+        fields = [field.with_metadata({'cf': json.dumps(
+                      self.variables[field.name].attributes
+                      if field.name in self.variables else {})})
+                  for field in self.writer.schema]
+        return pyarrow.schema(fields, metadata={'cf': json.dumps(
+            {'global': self.attributes, 'variables': scalars})})
+
+    def close(self):
+        if self.open:
+            self.open = False
+            rows = self._rows()
+            stop = max([variable.end for variable in rows] or [0])
+            if stop > self.flushed or self.writer is None:
+                self._flush(stop)
+            schema = self._schema()
+            # the Arrow schema stored by the writer is the one it was opened
+            # with; replace it with the complete one
+            self.writer.add_key_value_metadata({
+                'cf'          : schema.metadata[b'cf'].decode(),
+                'ARROW:schema': base64.b64encode(
+                    schema.serialize().to_pybytes()).decode(),
+            })
+            self.writer.close()
+
+
+class _FanoutVariable(object):
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.name = targets[0].name
+
+    def setncatts(self, attributes):
+        for target in self.targets:
+            target.setncatts(attributes)
+
+    def __setitem__(self, key, values):
+        for target in self.targets:
+            target[key] = values
+
+
+class Fanout(object):
+    """Passes the writes meant for one Dataset on to every writer of
+    ``targets``; reads, if any, are left to the first."""
+
+    def __init__(self, targets):
+        self.targets = targets
+
+    def createDimension(self, name, size):
+        for target in self.targets:
+            target.createDimension(name, size)
+
+    def createVariable(self, name, datatype, dimensions, **options):
+        return _FanoutVariable([target.createVariable(name, datatype, dimensions,
+                                                      **options)
+                                for target in self.targets])
+
+    def setncatts(self, attributes):
+        for target in self.targets:
+            target.setncatts(attributes)
+
+    def __getitem__(self, name):
+        return _FanoutVariable([target[name] for target in self.targets])
+
+    def isopen(self):
+        return any(target.isopen() for target in self.targets)
+
+    def close(self):
+        """Close every writer still open, re-raising the first error."""
+        error = None
+        for target in self.targets:
+            try:
+                if target.isopen():
+                    target.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+
+# extension of the copy, whether it is a directory, class taking its path
+# and the optional package it needs (None when always available)
+Writer = collections.namedtuple('Writer', 'extension directory factory package')
+
+WRITERS = {
+    'netcdf4': Writer('.nc4',     False, Netcdf4Writer, None),
+    'parquet': Writer('.parquet', False, ParquetWriter, 'pyarrow'),
+    'zarr'   : Writer('.zarr',    True,  ZarrWriter,    'zarr'),
+}
+
+
+def check_formats(formats):
+    """Raise ValueError for an unknown format name in ``formats``, and
+    ImportError for one whose package is not installed."""
+    for name in formats:
+        if name not in WRITERS:
+            raise ValueError('unknown output format %r (choose from %s)'
+                             % (name, ', '.join(sorted(WRITERS))))
+        package = WRITERS[name].package
+        if package is not None and globals()[package] is None:
+            raise ImportError('the %s format needs the %s package'
+                              % (name, package))
+
+
+def output_path(outfile, name):
+    """Path of the ``name`` copy of the netCDF file ``outfile``."""
+    return os.path.splitext(outfile)[0] + WRITERS[name].extension
+
+
+def open_writer(name, path):
+    """A new writer of format ``name`` at ``path``."""
+    return WRITERS[name].factory(path)
@@ -0,0 +1,344 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : batch.py
+#  Purpose     : Convert every CSV/HDR pair of a WAF directory, spreading the
+#                files over a pool of worker processes, and report the
+#                outcome of each file once all are done. Incremental runs
+#                skip or append to outputs according to the manifest kept in
+#                the output directory (see manifest.py). Aggregated runs write
+#                one file per station and stream (see aggregate.py), regional
+#                runs one file per period and stream (see region.py). The
+#                per-stage timings of each file can be written out as JSON
+#                lines.
+#
+#                The modules needing numpy and netCDF4 are imported when a
+#                file is actually written, so a run that only skips
+#                unchanged inputs never loads them (see cli.py).
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+
+from . import manifest
+from .header import read_hdr
+from .instrument import Stats, emit
+from .profiles import PROFILES, DEFAULT_PROFILE
+from .staging import BUILD_MODES, DEFAULT_BUILD
+
+# convert_file options that change the content of the output; a change in
+# any of them invalidates the manifest entries of an incremental run
+OUTPUT_OPTIONS = ('profile', 'formats', 'resolutions')
+
+# entry is the manifest entry of outfile, or None for a full conversion
+Job    = collections.namedtuple('Job', 'csv hdr outfile options incremental entry')
+# the monthly (csv, hdr) members of the station/stream aggregate name
+Group  = collections.namedtuple('Group', 'name members outfile options incremental entry')
+# the (csv, hdr) members, one per station, of the period/stream region name
+Region = collections.namedtuple('Region', 'name members outfile options')
+# metrics is the instrument.Stats record of the conversion
+Result = collections.namedtuple('Result',
+                                'csv outfile ok action rows seconds error entry metrics')
+
+
+def discover(in_dir):
+    """Return the sorted (csv, hdr) paths of the CSV files in ``in_dir``
+    that have a station header next to them."""
+    pairs = []
+    for csv_path in sorted(glob.glob(os.path.join(in_dir, '*.csv'))):
+        hdr_path = os.path.splitext(csv_path)[0] + '.hdr'
+        if os.path.isfile(hdr_path):
+            pairs.append((csv_path, hdr_path))
+    return pairs
+
+
+def output_path(csv_path, out_dir):
+    """netCDF file written for ``csv_path`` in ``out_dir``."""
+    prefix = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(out_dir, prefix + '.nc')
+
+
+def output_settings(options):
+    """The options of a run recorded in, and compared against, the manifest."""
+    return dict((name, options[name]) for name in OUTPUT_OPTIONS
+                if options.get(name))
+
+
+def _update(job, station, settings, stats):
+    """Skip, append to or convert the output of an incremental job."""
+    action, offset = manifest.plan(job.entry, job.csv, job.hdr, job.outfile,
+                                   station, settings)
+    if action == manifest.SKIP:
+        return action, job.entry['rows'], manifest.refresh(job.entry, job.csv,
+                                                           job.hdr)
+    from .engine import append_file, append_options, convert_file, AppendError
+
+    entry = manifest.make_entry(job.csv, job.hdr, station, 0, settings)
+    rows = None
+    if action == manifest.APPEND and job.options.get('formats'):
+        # the copies in other formats are not appended to
+        action = manifest.CONVERT
+    if action == manifest.APPEND:
+        try:
+            rows = job.entry['rows'] + append_file(job.csv, job.outfile, offset,
+                                                   stats=stats,
+                                                   **append_options(job.options))
+        except AppendError as e:
+            print('Converting %s again: %s' % (job.outfile, e))
+            action = manifest.CONVERT
+    if action == manifest.CONVERT:
+        rows = convert_file(job.csv, job.outfile, station, station['period'],
+                            stats=stats, **job.options)
+    entry['rows'] = rows
+    return action, rows, entry
+
+
+def _aggregate(job, stats):
+    from . import aggregate
+
+    if job.incremental:
+        return aggregate.update(job.entry, job.members, job.outfile,
+                                output_settings(job.options), stats,
+                                **job.options)
+    rows, _ = aggregate.build(job.members, job.outfile, stats=stats,
+                              **job.options)
+    return manifest.CONVERT, rows, None
+
+
+def _region(job, stats):
+    from . import region
+
+    options = dict(job.options)
+    if options.pop('formats', None):
+        raise ValueError('region files are written as netCDF only')
+    if options.pop('resolutions', None):
+        raise ValueError('region files are not resampled')
+    rows = region.build(job.members, job.outfile, stats=stats, **options)
+    return manifest.CONVERT, rows, None
+
+
+def _convert(job, stats):
+    if job.options.get('resolutions'):
+        from .schema import has_depth, read_schema
+        if has_depth(read_schema(job.csv)):
+            # profiles are not resampled
+            job = job._replace(options=dict(job.options, resolutions=[]))
+    with stats.stage('header'):
+        station = read_hdr(job.hdr)
+    if job.incremental:
+        return _update(job, station, output_settings(job.options), stats)
+    from .engine import convert_file
+
+    rows = convert_file(job.csv, job.outfile, station, station['period'],
+                        stats=stats, **job.options)
+    return manifest.CONVERT, rows, None
+
+
+def run_job(job):
+    """Convert one CSV/HDR pair, or write one Group aggregate or Region
+    file; never raises, the outcome is returned as a Result so one bad file
+    does not stop the batch."""
+    start = time.time()
+    stats = Stats()
+    source = job.name if isinstance(job, (Group, Region)) else job.csv
+    try:
+        if isinstance(job, Group):
+            action, rows, entry = _aggregate(job, stats)
+        elif isinstance(job, Region):
+            action, rows, entry = _region(job, stats)
+        else:
+            action, rows, entry = _convert(job, stats)
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+        return Result(source, job.outfile, False, manifest.CONVERT, 0,
+                      time.time() - start, error, None,
+                      stats.record(file=job.outfile, csv=source, ok=False,
+                                   action=manifest.CONVERT, rows=0,
+                                   error=error))
+    return Result(source, job.outfile, True, action, rows,
+                  time.time() - start, '', entry,
+                  stats.record(file=job.outfile, csv=source, ok=True,
+                               action=action, rows=rows, error=None))
+
+
+def convert_directory(in_dir, out_dir, **options):
+    """Convert every CSV/HDR pair of ``in_dir`` into ``out_dir`` (see
+    convert_pairs for the ``options``)."""
+    return convert_pairs(discover(in_dir), out_dir, **options)
+
+
+def convert_pairs(pairs, out_dir, workers=None, incremental=False,
+                  manifest_path=None, metrics=None, aggregated=False,
+                  regional=False, **options):
+    """Convert the (csv, hdr) ``pairs`` into ``out_dir``.
+
+    ``workers`` is the number of worker processes (None uses one per CPU,
+    1 converts in this process).  With ``incremental`` the manifest at
+    ``manifest_path`` (default: MANIFEST_NAME in ``out_dir``) decides which
+    outputs are skipped, appended to or converted, and is updated at the
+    end.  With ``aggregated`` the monthly files of each station and stream
+    go to one file (see aggregate.py); files not named by month are still
+    converted one by one.  With ``regional`` the files of all the stations
+    of a period and stream go to one file (see region.py), rewritten on
+    every run.  ``metrics`` (a path, '-' or a stream) receives the
+    per-stage record of every file as a JSON line, as each file completes.
+    The time-index catalog of ``out_dir`` (see timeindex.py) is rewritten
+    at the end, unless every output was skipped.  ``options`` are passed on
+    to convert_file.  Returns the Results in input order.
+    """
+    if regional and (aggregated or incremental):
+        raise ValueError('region files are neither aggregated nor updated '
+                         'incrementally')
+    if manifest_path is None:
+        manifest_path = os.path.join(out_dir, manifest.MANIFEST_NAME)
+    entries = manifest.load(manifest_path) if incremental else {}
+
+    jobs = []
+    if aggregated:
+        from . import aggregate
+        groups = aggregate.group(pairs)
+        for name, members in groups.items():
+            outfile = os.path.join(out_dir, name + '.nc')
+            jobs.append(Group(name, members, outfile, options, incremental,
+                              entries.get(os.path.basename(outfile))))
+        grouped = set(member for members in groups.values() for member in members)
+        pairs = [pair for pair in pairs if pair not in grouped]
+    if regional:
+        from . import region
+        groups = region.group(pairs)
+        for name, members in groups.items():
+            jobs.append(Region(name, members, os.path.join(out_dir, name + '.nc'),
+                               options))
+        grouped = set(member for members in groups.values() for member in members)
+        pairs = [pair for pair in pairs if pair not in grouped]
+    for csv_path, hdr_path in pairs:
+        outfile = output_path(csv_path, out_dir)
+        jobs.append(Job(csv_path, hdr_path, outfile, options, incremental,
+                        entries.get(os.path.basename(outfile))))
+    results = []
+    if workers == 1 or len(jobs) < 2:
+        outcomes, pool = map(run_job, jobs), None
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        outcomes = pool.map(run_job, jobs)
+    try:
+        for result in outcomes:
+            if metrics is not None:
+                emit(result.metrics, metrics)
+            results.append(result)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if incremental:
+        for result in results:
+            name = os.path.basename(result.outfile)
+            if result.ok:
+                entries[name] = result.entry
+            else:
+                entries.pop(name, None)
+        manifest.save(manifest_path, entries)
+    if any(not result.ok or result.action != manifest.SKIP for result in results):
+        from . import timeindex
+        timeindex.write_catalog(out_dir)
+    return results
+
+
+def report(results, out=None):
+    """Print one line per converted file and a summary; returns the number
+    of failed files."""
+    out = out or sys.stdout
+    failed = 0
+    actions = collections.Counter()
+    for result in results:
+        name = os.path.basename(result.csv)
+        if result.ok:
+            actions[result.action] += 1
+            out.write('OK    %s -> %s (%s, %d records, %.2fs)\n'
+                      % (name, result.outfile, result.action, result.rows,
+                         result.seconds))
+        else:
+            failed += 1
+            out.write('FAIL  %s: %s\n' % (name, result.error))
+    out.write('%d file(s) converted, %d appended, %d skipped, %d failed\n'
+              % (actions[manifest.CONVERT], actions[manifest.APPEND],
+                 actions[manifest.SKIP], failed))
+    return failed
+
+
+def main(argv=None):
+    from .backends import WRITERS
+    from .reader import DEFAULT_CHUNK_ROWS, DEFAULT_PREFETCH
+    from .resample import RESOLUTIONS
+    from .writer import DEFAULT_BLOCK_SIZE
+
+    parser = argparse.ArgumentParser(
+        description='Convert every GCOOS WAF CSV/HDR pair of a directory to netCDF.')
+    parser.add_argument('in_dir', help='directory holding the *.csv/*.hdr pairs')
+    parser.add_argument('out_dir', help='directory receiving the *.nc files')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                        help='rows per netCDF slice write (0: whole variable)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='CSV rows parsed per chunk (0: whole file)')
+    parser.add_argument('--pipeline', type=int, default=DEFAULT_PREFETCH,
+                        help='CSV chunks parsed ahead of the netCDF writes by '
+                             'a reader thread (0: parse and write in turn; '
+                             'default: %(default)s)')
+    parser.add_argument('-p', '--profile', choices=sorted(PROFILES),
+                        default=DEFAULT_PROFILE,
+                        help='chunking/compression profile of the output '
+                             '(default: %(default)s)')
+    parser.add_argument('--build', choices=BUILD_MODES, default=DEFAULT_BUILD,
+                        help='write each file in place, or under a temporary '
+                             'name or in memory and rename it into place once '
+                             'complete (default: %(default)s)')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='skip unchanged inputs and append new rows, '
+                             'using the manifest in OUT_DIR')
+    parser.add_argument('-f', '--format', dest='formats', action='append',
+                        choices=sorted(WRITERS), default=[],
+                        help='also write a copy of each file in this format '
+                             '(repeatable; not with --aggregate or --region)')
+    parser.add_argument('--resample', dest='resolutions', action='append',
+                        choices=sorted(RESOLUTIONS), default=[],
+                        help='also write the means, minima and maxima of each '
+                             'atm file at this resolution (repeatable; not '
+                             'with --aggregate or --region)')
+    parser.add_argument('-a', '--aggregate', action='store_true',
+                        help='write one file per station and stream, '
+                             'appending the months in order')
+    parser.add_argument('-r', '--region', action='store_true',
+                        help='write one file per period and stream holding '
+                             'every station (CF timeSeries ragged array)')
+    parser.add_argument('--metrics', metavar='FILE', default=None,
+                        help='append the per-stage timings of each file as '
+                             'JSON lines to FILE (- for standard output)')
+    args = parser.parse_args(argv)
+    if args.formats and args.aggregate:
+        parser.error('--format cannot be combined with --aggregate')
+    if args.resolutions and (args.aggregate or args.region):
+        parser.error('--resample cannot be combined with --aggregate or --region')
+    if args.region and (args.formats or args.aggregate or args.incremental):
+        parser.error('--region cannot be combined with --format, --aggregate '
+                     'or --incremental')
+
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+    results = convert_directory(args.in_dir, args.out_dir, workers=args.workers,
+                                incremental=args.incremental,
+                                metrics=args.metrics,
+                                aggregated=args.aggregate,
+                                regional=args.region,
+                                block_size=args.block_size or None,
+                                chunk_rows=args.chunk_rows or None,
+                                pipeline=args.pipeline,
+                                profile=args.profile, build=args.build,
+                                formats=args.formats,
+                                resolutions=args.resolutions)
+    return 1 if report(results) else 0
@@ -0,0 +1,295 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : cf.py
+#  Purpose     : CF variable-attribute table for the GCOOS WAF measurement
+#                columns (CF Standard Name Table v33, GCMD Science Keywords
+#                8.1) and the fixed attribute sets of the coordinate and
+#                ancillary variables written to every file.
+
+import functools
+
+from .times import EPOCH_UNITS
+
+FILL_VALUE = -999.
+
+GCMD_VOCABULARY = 'GCMD Science Keywords Version 8.1'
+
+# per standard name: long_name, units, valid range, GCMD science keyword and
+# GCMD instrument long name. Units given in the CSV header take precedence.
+VARIABLES = {
+    # atmospheric (atm) columns
+    'air_pressure': {
+        'long_name' : 'air pressure',
+        'units'     : 'mbar',
+        'valid_min' : 700.,
+        'valid_max' : 1040.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC PRESSURE>ATMOSPHERIC PRESSURE MEASUREMENTS',
+        'instrument': 'Air Pressure Sensor',
+    },
+    'air_temperature': {
+        'long_name' : 'air temperature',
+        'units'     : 'Celsius',
+        'valid_min' : -10.,
+        'valid_max' : 40.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC TEMPERATURE>SURFACE TEMPERATURE>AIR TEMPERATURE',
+        'instrument': 'Thermometers',
+    },
+    'dew_point_temperature': {
+        'long_name' : 'dew point temperature',
+        'units'     : 'Celsius',
+        'valid_min' : -10.,
+        'valid_max' : 40.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC TEMPERATURE>SURFACE TEMPERATURE>DEW POINT TEMPERATURE',
+        'instrument': 'HUMIDITY SENSORS',
+    },
+    'relative_humidity': {
+        'long_name' : 'relative humidity',
+        'units'     : '%',
+        'valid_min' : 0.,
+        'valid_max' : 105.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC WATER VAPOR>HUMIDITY',
+        'instrument': 'HUMIDITY SENSORS',
+    },
+    'wind_speed': {
+        'long_name' : 'wind speed',
+        'units'     : 'm s-1',
+        'valid_min' : 0.,
+        'valid_max' : 150.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC WINDS>SURFACE WINDS>WIND SPEED/WIND DIRECTION',
+        'instrument': 'Combined Recording Wind Vane Anemograph',
+    },
+    'wind_speed_of_gust': {
+        'long_name' : 'wind speed of gust',
+        'units'     : 'm s-1',
+        'valid_min' : 0.,
+        'valid_max' : 150.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC WINDS>SURFACE WINDS>WIND SPEED/WIND DIRECTION',
+        'instrument': 'Combined Recording Wind Vane Anemograph',
+    },
+    'wind_to_direction': {
+        'long_name' : 'wind to direction',
+        'units'     : 'degrees_true',
+        'valid_min' : 0.,
+        'valid_max' : 360.,
+        'keyword'   : 'EARTH SCIENCE>ATMOSPHERE>ATMOSPHERIC WINDS>SURFACE WINDS>WIND SPEED/WIND DIRECTION',
+        'instrument': 'Combined Recording Wind Vane Anemograph',
+    },
+    # oceanographic (ocn) columns
+    'sea_water_speed': {
+        'long_name' : 'sea water speed',
+        'units'     : 'cm s-1',
+        'valid_min' : 0.,
+        'valid_max' : 500.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CIRCULATION>OCEAN CURRENTS',
+        'instrument': 'CURRENT METERS',
+    },
+    'direction_of_sea_water_velocity': {
+        'long_name' : 'direction of sea water velocity',
+        'units'     : 'degrees_true',
+        'valid_min' : 0.,
+        'valid_max' : 360.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CIRCULATION>OCEAN CURRENTS',
+        'instrument': 'CURRENT METERS',
+    },
+    'upward_sea_water_velocity': {
+        'long_name' : 'upward sea water velocity',
+        'units'     : 'cm s-1',
+        'valid_min' : -500.,
+        'valid_max' : 500.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CIRCULATION>OCEAN CURRENTS',
+        'instrument': 'CURRENT METERS',
+    },
+    'eastward_sea_water_velocity': {
+        'long_name' : 'eastward sea water velocity',
+        'units'     : 'cm s-1',
+        'valid_min' : -500.,
+        'valid_max' : 500.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CIRCULATION>OCEAN CURRENTS',
+        'instrument': 'CURRENT METERS',
+    },
+    'northward_sea_water_velocity': {
+        'long_name' : 'northward sea water velocity',
+        'units'     : 'cm s-1',
+        'valid_min' : -500.,
+        'valid_max' : 500.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CIRCULATION>OCEAN CURRENTS',
+        'instrument': 'CURRENT METERS',
+    },
+    'mass_concentration_of_chlorophyll_in_sea_water': {
+        'long_name' : 'mass concentration of chlorophyll in sea water',
+        'units'     : 'ug L-1',
+        'valid_min' : 0.,
+        'valid_max' : 500.,
+        'keyword'   : 'EARTH SCIENCE>TERRESTRIAL HYDROSPHERE>WATER QUALITY/WATER CHEMISTRY>CHLOROPHYLL',
+        'instrument': 'FLUOROMETERS',
+    },
+    'mole_concentration_of_dissolved_molecular_oxygen_in_sea_water': {
+        'long_name' : 'mole concentration of dissolved molecular oxygen in sea water',
+        'units'     : 'umol L-1',
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN CHEMISTRY>OXYGEN',
+        'instrument': 'DISSOLVED OXYGEN ANALYZERS',
+    },
+    'sea_surface_height_above_sea_level': {
+        'long_name' : 'sea surface height above sea level',
+        'units'     : 'm',
+        'valid_min' : -10.,
+        'valid_max' : 10.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>SEA SURFACE TOPOGRAPHY>SEA SURFACE HEIGHT',
+        'instrument': 'WATER LEVEL GAUGES',
+    },
+    'sea_water_practical_salinity': {
+        'long_name' : 'sea water practical salinity',
+        'units'     : '1',
+        'valid_min' : 0.,
+        'valid_max' : 38.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>SALINITY/DENSITY>SALINITY',
+        'instrument': 'CONDUCTIVITY METERS',
+    },
+    'sea_water_temperature': {
+        'long_name' : 'sea water temperature',
+        'units'     : 'Celsius',
+        'valid_min' : -10.,
+        'valid_max' : 35.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN TEMPERATURE>WATER TEMPERATURE',
+        'instrument': 'TEMPERATURE SENSORS',
+    },
+    'sea_water_turbidity': {
+        'long_name' : 'sea water turbidity',
+        'units'     : 'NTU',
+        'valid_min' : 0.,
+        'valid_max' : 1000.,
+        'keyword'   : 'EARTH SCIENCE>OCEANS>OCEAN OPTICS>TURBIDITY',
+        'instrument': 'TURBIDITY METERS',
+    },
+}
+
+# fixed attribute sets of the coordinate and ancillary variables
+TIME = {
+    'long_name'          : 'Time',
+    'standard_name'      : 'time',
+    'units'              : EPOCH_UNITS,
+    'calendar'           : 'standard',
+    'axis'               : 'T',
+    'ancillary_variables': '',
+    'comment'            : '',
+}
+
+LATITUDE = {
+    'long_name'          : 'Latitude',
+    'standard_name'      : 'latitude',
+    'units'              : 'degrees_north',
+    'axis'               : 'Y',
+    'valid_min'          : -90.00,
+    'valid_max'          : 90.00,
+    'ancillary_variables': '',
+    'comment'            : '',
+}
+
+LONGITUDE = {
+    'long_name'          : 'Longitude',
+    'standard_name'      : 'longitude',
+    'units'              : 'degrees_east',
+    'axis'               : 'X',
+    'valid_min'          : -180.00,
+    'valid_max'          : 180.00,
+    'ancillary_variables': '',
+    'comment'            : '',
+}
+
+# z of an ocn file is a per-row depth, that of an atm file a fixed altitude
+DEPTH = {
+    'long_name'          : 'Depth',
+    'standard_name'      : 'depth',
+    'units'              : 'm',
+    'axis'               : 'Z',
+    'positive'           : 'down',
+    'ancillary_variables': '',
+    'comment'            : '',
+}
+
+ALTITUDE = {
+    'long_name'          : 'Altitude',
+    'standard_name'      : 'altitude',
+    'units'              : 'm',
+    'axis'               : 'Z',
+    'positive'           : 'up',
+    'ancillary_variables': '',
+    'comment'            : '',
+}
+
+CRS = {
+    'grid_mapping_name'  : 'latitude_longitude',
+    'epsg_code'          : 'EPSG:4326',
+    'semi_major_axis'    : 6378137,
+    'inverse_flattening' : 298.257223563,
+}
+
+
+def keywords(columns):
+    """GCMD keyword string for the measurement ``columns`` of a file, in
+    column order and without repeats."""
+    found = []
+    for column in columns:
+        keyword = VARIABLES.get(column.name, {}).get('keyword')
+        if keyword and keyword not in found:
+            found.append(keyword)
+    return ','.join(found)
+
+
+@functools.lru_cache(maxsize=1024)
+def instrument_attributes(column, ioos_code):
+    """Attributes of the instrument variable paired with ``column``.  The
+    dict is cached and shared between files; do not modify it."""
+    entry = VARIABLES.get(column.name, {})
+    return {
+        'long_name'            : entry.get('instrument', ''),
+        'instrument_vocabulary': GCMD_VOCABULARY,
+        'ioos_code'            : ioos_code,
+        'comment'              : '',
+    }
+
+
+@functools.lru_cache(maxsize=1024)
+def variable_attributes(column, instrument, ioos_code, references, with_z):
+    """Attributes of the observation variable holding ``column``.
+
+    ``instrument`` names the paired instrument variable and ``with_z`` tells
+    whether the variable varies with the z coordinate.  The dict is cached
+    and shared between the files of a station; do not modify it.
+    """
+    entry = VARIABLES.get(column.name, {})
+    if with_z:
+        coordinates  = 'time lat lon z'
+        cell_methods = 'time: point lat: point lon: point z: point'
+    else:
+        coordinates  = 'time lat lon'
+        cell_methods = 'time: point lat: point lon: point'
+
+    attributes = {'long_name': entry.get('long_name', column.name.replace('_', ' '))}
+    if entry:
+        attributes['standard_name'] = column.name
+        attributes['ncei_name']     = column.name
+    attributes.update({
+        'units'                : column.units or entry.get('units', ''),
+        'scale_factor'         : 1.,
+        'add_offset'           : 0.,
+        'missing_value'        : FILL_VALUE,
+    })
+    if 'valid_min' in entry:
+        attributes['valid_min'] = entry['valid_min']
+        attributes['valid_max'] = entry['valid_max']
+    attributes.update({
+        'coordinates'          : coordinates,
+        'coverage_content_type': 'physicalMeasurement',
+        'grid_mapping'         : 'crs',
+        'source'               : 'GCOOS LDN upload/SOS.',
+        'references'           : references,
+        'cell_methods'         : cell_methods,
+        'ancillary_variables'  : '%s_qc %s platform' % (column.name, instrument),
+        'platform'             : 'platform',
+        'instrument'           : instrument,
+        'ioos_code'            : ioos_code,
+        'comment'              : '',
+    })
+    return attributes
@@ -0,0 +1,121 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : cli.py
+#  Usage       : bin/convert_gcoos_nc.py [-i] [-o OUT_DIR] CSV [CSV ...]
+#                find csv -name '*.csv' -mmin -60 | bin/convert_gcoos_nc.py -i -o nc -
+#  Purpose     : Lean command line for many small conversions, e.g. the
+#                files of the latest hour run from cron. The files named
+#                (or listed on standard input) are converted one after the
+#                other in this process, so the interpreter start-up and the
+#                numpy/netCDF4 imports are paid once per run instead of once
+#                per file, and only when a file is actually written: with -i
+#                a run whose inputs are all unchanged stops after reading
+#                the manifest. Each CSV is converted with the station header
+#                (.hdr) next to it, as by batch.py.
+
+import argparse
+import os
+import sys
+
+from . import batch
+from .profiles import PROFILES, DEFAULT_PROFILE
+from .staging import BUILD_MODES, DEFAULT_BUILD
+
+
+def read_list(stream):
+    """Paths listed one per line in ``stream``, blank lines left out."""
+    return [line.strip() for line in stream if line.strip()]
+
+
+def pairs(paths):
+    """(csv, hdr) pair of each CSV path, in order and without duplicates."""
+    seen, found = set(), []
+    for path in paths:
+        if path in seen:
+            continue
+        seen.add(path)
+        found.append((path, os.path.splitext(path)[0] + '.hdr'))
+    return found
+
+
+def _check_choices(parser, option, values, choices):
+    for value in values:
+        if value not in choices:
+            parser.error('argument %s: invalid choice: %r (choose from %s)'
+                         % (option, value, ', '.join(sorted(choices))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convert GCOOS WAF CSV files (with their .hdr) to netCDF '
+                    'in one process.')
+    parser.add_argument('csv', nargs='+',
+                        help='CSV file to convert; - reads the paths from '
+                             'standard input, one per line')
+    parser.add_argument('-o', '--out-dir', default='.',
+                        help='directory receiving the *.nc files '
+                             '(default: the current directory)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='worker processes (default: %(default)s, convert '
+                             'in this process)')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='skip unchanged inputs and append new rows, '
+                             'using the manifest in OUT_DIR')
+    # the defaults of the options below are those of convert_file, left out
+    # here so that parsing them imports neither numpy nor netCDF4
+    parser.add_argument('--block-size', type=int, default=argparse.SUPPRESS,
+                        help='rows per netCDF slice write (0: whole variable)')
+    parser.add_argument('--chunk-rows', type=int, default=argparse.SUPPRESS,
+                        help='CSV rows parsed per chunk (0: whole file)')
+    parser.add_argument('--pipeline', type=int, default=argparse.SUPPRESS,
+                        help='CSV chunks parsed ahead of the netCDF writes '
+                             '(0: parse and write in turn)')
+    parser.add_argument('-p', '--profile', choices=sorted(PROFILES),
+                        default=DEFAULT_PROFILE,
+                        help='chunking/compression profile of the output '
+                             '(default: %(default)s)')
+    parser.add_argument('--build', choices=BUILD_MODES, default=DEFAULT_BUILD,
+                        help='write each file in place, or under a temporary '
+                             'name or in memory and rename it into place once '
+                             'complete (default: %(default)s)')
+    parser.add_argument('-f', '--format', dest='formats', action='append',
+                        default=[], metavar='FORMAT',
+                        help='also write a copy of each file in this format '
+                             '(repeatable)')
+    parser.add_argument('--resample', dest='resolutions', action='append',
+                        default=[], metavar='RESOLUTION',
+                        help='also write the means, minima and maxima of each '
+                             'atm file at this resolution (repeatable)')
+    parser.add_argument('--metrics', metavar='FILE', default=None,
+                        help='append the per-stage timings of each file as '
+                             'JSON lines to FILE (- for standard output)')
+    args = parser.parse_args(argv)
+    if args.formats:
+        from .backends import WRITERS
+        _check_choices(parser, '-f/--format', args.formats, WRITERS)
+    if args.resolutions:
+        from .resample import RESOLUTIONS
+        _check_choices(parser, '--resample', args.resolutions, RESOLUTIONS)
+
+    paths = []
+    for path in args.csv:
+        paths.extend(read_list(sys.stdin) if path == '-' else [path])
+    options = dict(profile=args.profile, build=args.build, formats=args.formats,
+                   resolutions=args.resolutions)
+    for name in ('block_size', 'chunk_rows'):
+        if name in args:
+            options[name] = getattr(args, name) or None
+    if 'pipeline' in args:
+        options['pipeline'] = args.pipeline
+
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+    results = batch.convert_pairs(pairs(paths), args.out_dir, workers=args.workers,
+                                  incremental=args.incremental,
+                                  metrics=args.metrics, **options)
+    return 1 if batch.report(results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
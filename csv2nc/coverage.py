@@ -0,0 +1,151 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : coverage.py
+#  Purpose     : ACDD time and vertical coverage of a file, accumulated while
+#                its chunks are written: the running min/max of time and z
+#                and a count of each sampling interval, from which the median
+#                interval is exact without keeping the times. The result is
+#                the time_coverage_* and geospatial_vertical_min/max global
+#                attributes, set once the data pass is done. The same pass
+#                keeps the earliest and latest time of each block of rows,
+#                the time index of the file (see timeindex.py).
+
+import collections
+import datetime
+
+import numpy as np
+
+from .cf import FILL_VALUE
+
+# global attributes of the coverage, in file order
+ATTRIBUTES = ('time_coverage_start', 'time_coverage_end',
+              'time_coverage_duration', 'time_coverage_resolution')
+
+# least rows per block of the time index
+INDEX_ROWS = 1024
+
+
+def index_rows(chunk_rows=None):
+    """Rows per block of the time index of a time variable stored in
+    chunks of ``chunk_rows`` (None when not known): whole chunks, at least
+    INDEX_ROWS rows."""
+    if not chunk_rows:
+        return INDEX_ROWS
+    return chunk_rows * -(-INDEX_ROWS // chunk_rows)
+
+
+def iso_time(seconds):
+    """ISO 8601 UTC timestamp of ``seconds`` since 1970."""
+    return datetime.datetime.fromtimestamp(
+        int(seconds), datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def iso_duration(seconds):
+    """ISO 8601 duration of ``seconds``, e.g. P30DT23H or PT10M."""
+    seconds = int(round(seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    date = '%dD' % days if days else ''
+    time = ''.join('%d%s' % (value, unit)
+                   for value, unit in ((hours, 'H'), (minutes, 'M'), (seconds, 'S'))
+                   if value)
+    if not date and not time:
+        time = '0S'
+    return 'P' + date + ('T' + time if time else '')
+
+
+class Coverage(object):
+    """Time and vertical extent of one file, fed chunk by chunk.
+    ``chunk_rows`` is the chunk length of its time variable, which the
+    blocks of the time index are aligned to."""
+
+    def __init__(self, chunk_rows=None):
+        self.start = self.end = self.latest = None
+        self.z_min = self.z_max = None
+        # sampling interval (s) -> number of consecutive times that far apart
+        self.intervals = collections.Counter()
+        self.rows = 0
+        self.chunk_rows = chunk_rows
+        self.block_rows = index_rows(chunk_rows)
+        # [first row, earliest time, latest time] of each block of rows
+        self.blocks = []
+        # first row of the current series and number of its last block
+        self._origin, self._block = 0, None
+
+    def restart(self):
+        """Start a new series (the next station of the file) at the next
+        row: intervals and index blocks do not run across the two."""
+        self.latest = None
+        self._origin, self._block = self.rows, None
+
+    def _index(self, seconds):
+        count = len(seconds)
+        # block of each row, counted from the first row of the series
+        block = (np.arange(self.rows, self.rows + count) - self._origin) // self.block_rows
+        starts = np.flatnonzero(np.diff(block, prepend=-1))
+        lows = np.minimum.reduceat(seconds, starts).tolist()
+        highs = np.maximum.reduceat(seconds, starts).tolist()
+        first = 0
+        if self._block == block[0]:
+            # the last block goes on
+            last = self.blocks[-1]
+            last[1], last[2] = min(last[1], lows[0]), max(last[2], highs[0])
+            first = 1
+        for n in range(first, len(starts)):
+            self.blocks.append([self.rows + int(starts[n]), lows[n], highs[n]])
+        self._block = block[-1]
+        self.rows += count
+
+    def add_times(self, seconds):
+        """Account for the times of the next rows or records, in file
+        order; intervals that are not positive are left out."""
+        seconds = np.asarray(seconds, dtype='i8')
+        if not len(seconds):
+            return
+        self._index(seconds)
+        if self.latest is not None:
+            seconds = np.concatenate(([self.latest], seconds))
+        steps = np.diff(seconds)
+        steps, counts = np.unique(steps[steps > 0], return_counts=True)
+        self.intervals.update(dict(zip(steps.tolist(), counts.tolist())))
+        self.latest = int(seconds[-1])
+        low, high = int(seconds.min()), int(seconds.max())
+        self.start = low if self.start is None else min(self.start, low)
+        self.end = high if self.end is None else max(self.end, high)
+
+    def add_depths(self, z):
+        """Account for the depths ``z``; fill values are left out."""
+        z = np.asarray(z)
+        z = z[z != FILL_VALUE]
+        if z.size:
+            low, high = float(z.min()), float(z.max())
+            self.z_min = low if self.z_min is None else min(self.z_min, low)
+            self.z_max = high if self.z_max is None else max(self.z_max, high)
+
+    def resolution(self):
+        """Median sampling interval in seconds, or None."""
+        total = sum(self.intervals.values())
+        if not total:
+            return None
+        seen = 0
+        for step in sorted(self.intervals):
+            seen += self.intervals[step]
+            if 2 * seen >= total:
+                return step
+
+    def attributes(self):
+        """Global attributes of the coverage seen so far; the time coverage
+        is left empty for a file without rows."""
+        attributes = dict.fromkeys(ATTRIBUTES, '')
+        if self.start is not None:
+            attributes['time_coverage_start'] = iso_time(self.start)
+            attributes['time_coverage_end'] = iso_time(self.end)
+            attributes['time_coverage_duration'] = iso_duration(self.end - self.start)
+        if self.resolution() is not None:
+            attributes['time_coverage_resolution'] = iso_duration(self.resolution())
+        if self.z_min is not None:
+            attributes['geospatial_vertical_min'] = self.z_min
+            attributes['geospatial_vertical_max'] = self.z_max
+        return attributes
@@ -0,0 +1,705 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : engine.py
+#  Required    : numpy, netCDF4
+#  Purpose     : Single conversion engine for the GCOOS WAF atm and ocn CSV
+#                files. The variables written are derived from the CSV header
+#                (see schema.py) and their attributes from the CF table in
+#                cf.py, so the same code handles any combination of columns.
+#
+#                The station is described by a dict with the keys
+#                  organization, urn, url, description, naming, wmo,
+#                  latitude, longitude, vertical_position
+#                as listed in the station header file (prefix+'.hdr').
+
+import contextlib
+import datetime
+import os
+import uuid
+
+import netCDF4
+import numpy as np
+
+from . import backends, cf, coverage, pivot, qc, resample, staging, timeindex
+from .instrument import Stats
+from .profiles import variable_options, DEFAULT_PROFILE
+from .reader import iter_chunks, prefetch, DEFAULT_CHUNK_ROWS, DEFAULT_PREFETCH
+from .schema import read_schema, has_depth
+from .staging import DEFAULT_BUILD
+from .times import parse_timestamps
+from .writer import write_columns, DEFAULT_BLOCK_SIZE
+
+# NCEI supports only the netCDF4 classic (as of 2016-01-31)
+FORMAT = 'NETCDF4_CLASSIC'
+
+class AppendError(ValueError):
+    """New rows that cannot be appended to an existing file, which has to
+    be converted again: its variables are not those of the CSV columns, or
+    the rows do not fit its depth levels or follow its last time."""
+
+
+# per-station global attribute templates, by station URN
+_templates = {}
+
+# global attributes set per file; None in the station template
+FILE_ATTRIBUTES = ('title', 'summary', 'keywords', 'id', 'history',
+                   'date_created', 'date_modified', 'date_metadata_modified',
+                   'geospatial_vertical_positive', 'uuid',
+                   'ncei_template_version', 'featureType') + coverage.ATTRIBUTES
+
+# station fields the template is compiled from
+_TEMPLATE_FIELDS = ('urn', 'naming', 'organization', 'latitude', 'longitude',
+                    'vertical_position')
+
+
+def _compile_template(station):
+    vertical = station['vertical_position']
+    return {
+        'ncei_template_version'       : None,
+        'featureType'                 : None,
+        'title'                       : None,
+        'summary'                     : None,
+        'keywords'                    : None,
+        'keywords_vocabulary'         : cf.GCMD_VOCABULARY,
+        'Conventions'                 : 'CF1.6, ACDD-1.3',
+        'id'                          : None,
+        'naming_authority'            : station['naming'],
+        'history'                     : None,
+        'source'                      : 'LDN SOS endpoint',
+        'processing_level'            : 'Data ingested as provided.',
+        'comment'                     : 'Data generated from GCOOS tables.',
+        'acknowledment'               : '',
+        'license'                     : 'Creative Common (CC) 0',
+        'standard_name_vocabulary'    : 'CF Standard Name Table v33',
+        'date_created'                : None,
+        'creator_name'                : 'Felimon Gayanilo',
+        'creator_email'               : 'felimon.gayanilo@gcoos.org',
+        'creator_url'                 : 'https://www.linkedin.com/in/felimon-gayanilo-56728418',
+        'institution'                 : 'Texas A&M University',
+        'project'                     : 'Gulf of Mexico Coastal Ocean Observing System (GCOOS)',
+        'publisher_name'              : 'Gulf of Mexico Coastal Ocean Observing System (GCOOS)',
+        'publisher_email'             : 'info@gcoos.org',
+        'publisher_url'               : 'data.gcoos.org',
+        'geospatial_lat_min'          : station['latitude'],
+        'geospatial_lat_max'          : station['latitude'],
+        'geospatial_lon_min'          : station['longitude'],
+        'geospatial_lon_max'          : station['longitude'],
+        'geospatial_vertical_min'     : vertical,
+        'geospatial_vertical_max'     : vertical,
+        'geospatial_vertical_positive': None,
+        'time_coverage_start'         : None,
+        'time_coverage_end'           : None,
+        'time_coverage_duration'      : None,
+        'time_coverage_resolution'    : None,
+        'uuid'                        : None,
+        'sea_name'                    : 'Gulf of Mexico',
+        'creator_type'                : 'institution',
+        'creator_institution'         : 'Gulf of Mexico Coastal Ocean Observing System (GCOOS)',
+        'publisher_type'              : 'institution',
+        'publisher_institution'       : 'Gulf of Mexico Coastal Ocean Observing System (GCOOS)',
+        'program'                     : 'NOAA IOOS',
+        'contributor_name'            : station['organization'],
+        'contributor_role'            : 'Local Data Node',
+        'geospatial_lat_units'        : 'degrees_north',
+        'geospatial_lon_units'        : 'degrees_east',
+        'geospatial_vertical_units'   : 'EPSG:4979',
+        'date_modified'               : None,
+        'date_issued'                 : '',
+        'date_metadata_modified'      : None,
+        'product_version'             : 'Ver. 1.0',
+        'platform'                    : station['urn'],
+        'platform_vocabulary'         : 'CF Standard Name Table v33, GCMD Earth Science Keywords. Version 8.1',
+        'instrument'                  : '',
+        'instrument_vocabulary'       : 'GCMD Earth Science Keywords. Version 8.1',
+        'cdm_data_type'               : 'Station',
+        'metadata_link'               : '',
+        'references'                  : '',
+    }
+
+
+def station_template(station):
+    """Global (ACDD/NCEI template) attributes shared by every file of
+    ``station``, in file order, with the FILE_ATTRIBUTES left as None.
+
+    Templates are compiled once per station URN and reused as long as the
+    station fields they depend on do not change; do not modify the dict.
+    """
+    key = tuple(station[field] for field in _TEMPLATE_FIELDS)
+    cached = _templates.get(station['urn'])
+    if cached is None or cached[0] != key:
+        cached = _templates[station['urn']] = (key, _compile_template(station))
+    return cached[1]
+
+
+def global_attributes(station, period, file_id, schema, today=None):
+    """Global attributes of one output file: the station template completed
+    with the FILE_ATTRIBUTES, ready for a single setncatts call."""
+    if today is None:
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+    urn = station['urn']
+    # ocn files hold a profile of depth levels at each time (see pivot.py);
+    # their z(timeSeries, level) changes from one profile to the next, so
+    # only the time axis is orthogonal
+    if has_depth(schema):
+        feature, template = 'TimeSeriesProfile', 'IncomVertical_OrthTemporal'
+    else:
+        feature, template = 'TimeSeries', 'Orthogonal'
+    attributes = dict(station_template(station))
+    attributes.update({
+        'ncei_template_version'       : 'NCEI_NetCDF_%s_%s_Template_v2.0' % (feature, template),
+        'featureType'                 : feature[0].lower() + feature[1:],
+        'title'                       : 'GCOOS netCDF Data for '+urn+' for the period '+period,
+        'summary'                     : period+' time series data for '+urn+' platform served via GCOOS Data Portal. The uuid was generated using the uuid python module, invoking the command uuid.uuid4().',
+        'keywords'                    : cf.keywords(schema.measurements),
+        # the filename is a unique identification and will be used as the file id
+        'id'                          : file_id,
+        # assume the version to be original, change if otherwise.
+        'history'                     : 'V1 '+today,
+        'date_created'                : today,
+        'date_modified'               : today,
+        'date_metadata_modified'      : today,
+        'geospatial_vertical_positive': 'down' if has_depth(schema) else 'up',
+        'uuid'                        : str(uuid.uuid4()),
+    })
+    # completed from the data once it is written
+    attributes.update(coverage.Coverage().attributes())
+    return attributes
+
+
+def define_variables(nc, station, schema, profile=DEFAULT_PROFILE, levels=1):
+    """Create the dimensions and every variable of the file in one pass.
+
+    Files with a depth column get a 'level' dimension of ``levels`` depths
+    and hold one record per time (see pivot.py); the others one record per
+    CSV row.  The chunking and compression of the variables on timeSeries
+    follow the storage ``profile`` (see profiles.py).  Returns a dict of the
+    variables written record by record: 'time', 'timeSeries', 'z' (ocn
+    files only) and one per measurement column and its QC flags.
+    """
+    nc.createDimension('timeSeries', None)
+    with_z = has_depth(schema)
+    storage = variable_options(profile)
+    if with_z:
+        nc.createDimension('level', levels)
+        dimensions = ('timeSeries', 'level')
+        grid_storage = variable_options(profile, levels=levels)
+        observation_storage = variable_options(profile, observation=True,
+                                               levels=levels)
+    else:
+        dimensions = ('timeSeries',)
+        grid_storage = storage
+        observation_storage = variable_options(profile, observation=True)
+
+    timeseries = nc.createVariable('timeSeries', 'i', ('timeSeries',), **storage)
+    timeseries.setncatts({'long_name': station['description'],
+                          'cf_role'  : 'timeseries_id'})
+    times = nc.createVariable('time', 'd', ('timeSeries',), **storage)
+    times.setncatts(cf.TIME)
+    nc.createVariable('lat', 'd', ()).setncatts(cf.LATITUDE)
+    nc.createVariable('lon', 'd', ()).setncatts(cf.LONGITUDE)
+    if with_z:
+        z = nc.createVariable('z', 'd', dimensions, fill_value=cf.FILL_VALUE,
+                              **grid_storage)
+        z.setncatts(cf.DEPTH)
+    else:
+        z = nc.createVariable('z', 'd', ())
+        z.setncatts(cf.ALTITUDE)
+
+    platform = nc.createVariable('platform', 'c', ())
+    platform.setncatts({
+        'long_name': station.get('platform') or station['description'],
+        'comment'  : '',
+        'call_sign': '',
+        'ncei_code': '147F, 3614',
+        'wmo_code' : station['wmo'],
+        'imo_code' : '',
+        'ioos_code': station['urn'],
+    })
+    nc.createVariable('crs', 'i', ()).setncatts(cf.CRS)
+
+    variables = {'time': times, 'timeSeries': timeseries}
+    if with_z:
+        variables['z'] = z
+    for n, column in enumerate(schema.measurements, 1):
+        instrument = 'instrument%d' % n
+        ioos_code  = '%s:%s:1' % (station['urn'], column.name)
+        nc.createVariable(instrument, 'c', ()).setncatts(
+            cf.instrument_attributes(column, ioos_code))
+        obs = nc.createVariable(column.name, 'd', dimensions,
+                                fill_value=cf.FILL_VALUE, **observation_storage)
+        obs.setncatts(cf.variable_attributes(column, instrument, ioos_code,
+                                             station['url'], with_z))
+        variables[column.name] = obs
+        flags = nc.createVariable(qc.flag_name(column.name), 'b', dimensions,
+                                  **grid_storage)
+        flags.setncatts(qc.flag_attributes(column))
+        variables[flags.name] = flags
+
+    nc['lat'][:] = station['latitude']
+    nc['lon'][:] = station['longitude']
+    if not with_z:
+        z[:] = station['vertical_position']
+    return variables
+
+
+def open_variables(nc, schema):
+    """Return the row-wise variables of an existing file, keyed as by
+    define_variables."""
+    variables = {'time': nc['time'], 'timeSeries': nc['timeSeries']}
+    if has_depth(schema):
+        variables['z'] = nc['z']
+    for column in schema.measurements:
+        variables[column.name] = nc[column.name]
+        variables[qc.flag_name(column.name)] = nc[qc.flag_name(column.name)]
+    return variables
+
+
+def _checks(variables, schema, latest=None):
+    """QC state of a file, continuing the actual ranges already written."""
+    ranges = {}
+    for column in schema.measurements:
+        if 'actual_range' in variables[column.name].ncattrs():
+            ranges[column.name] = variables[column.name].actual_range
+    return qc.Checks(latest, ranges)
+
+
+def _coverage(nc, variables, schema, records):
+    """Coverage of the first ``records`` records of an existing file."""
+    chunking = variables['time'].chunking()
+    extent = coverage.Coverage(chunking[0] if isinstance(chunking, list) else None)
+    extent.add_times(variables['time'][:records])
+    if has_depth(schema) and records:
+        extent.add_depths([nc.geospatial_vertical_min, nc.geospatial_vertical_max])
+    return extent
+
+
+def _resample_records(variables, schema, records, stats, resamplers):
+    """Bin the first ``records`` records of an existing file."""
+    with stats.stage('resample', records):
+        seconds = variables['time'][:records]
+        values = [np.ma.filled(variables[column.name][:records], cf.FILL_VALUE)
+                  for column in schema.measurements]
+        flags = [np.ma.filled(variables[qc.flag_name(column.name)][:records],
+                              qc.MISSING) for column in schema.measurements]
+        for resampler in resamplers:
+            resampler.add(seconds, values, flags)
+
+
+def _write_summaries(nc, variables, checks, extent):
+    """Set the attributes accumulated while the data was written."""
+    for name, bounds in checks.actual_ranges().items():
+        variables[name].setncatts({'actual_range': bounds})
+    nc.setncatts(extent.attributes())
+
+
+def write_chunk(variables, schema, data, row, block_size=DEFAULT_BLOCK_SIZE,
+                stats=None, checks=None, extent=None, resamplers=()):
+    """Append the parsed CSV rows ``data`` of a file without depth column at
+    ``row``; returns the next row and the number of rows dropped for an
+    unparseable date/time.  The stages are timed into ``stats`` when given;
+    ``checks`` and ``extent`` are the qc.Checks and coverage.Coverage of
+    the file, and the rows are binned into each of the resample.Resamplers
+    ``resamplers``."""
+    stats = stats or Stats()
+    checks = checks or qc.Checks()
+    extent = extent or coverage.Coverage()
+    with stats.stage('time_conversion', len(data)):
+        seconds, bad = parse_timestamps(data['date'], data['time'])
+        dropped = int(bad.sum())
+        if dropped:
+            data    = data[~bad]
+            seconds = seconds[~bad]
+
+    with stats.stage('qc', len(data)):
+        suspect = checks.time_flags(seconds)
+        flags = [checks.flags(column, data[column.name], suspect)
+                 for column in schema.measurements]
+        extent.add_times(seconds)
+
+    if resamplers:
+        with stats.stage('resample', len(data)):
+            values = [data[column.name] for column in schema.measurements]
+            for resampler in resamplers:
+                resampler.add(seconds, values, flags)
+
+    with stats.stage('write', len(data)):
+        columns = [(variables['time'], seconds),
+                   (variables['timeSeries'],
+                    np.arange(row+1, row+len(data)+1, dtype='i4'))]
+        for column, column_flags in zip(schema.measurements, flags):
+            columns += [(variables[column.name], data[column.name]),
+                        (variables[qc.flag_name(column.name)], column_flags)]
+        row = write_columns(columns, start=row, block_size=block_size)
+    return row, dropped
+
+
+def write_records(variables, schema, records, record,
+                  block_size=DEFAULT_BLOCK_SIZE, stats=None, checks=None,
+                  extent=None):
+    """Write the pivot.Records ``records`` of a file with depth column at
+    ``record``; returns the next record."""
+    stats = stats or Stats()
+    checks = checks or qc.Checks()
+    extent = extent or coverage.Coverage()
+    count = len(records.times)
+    # pivoted times are increasing, only the values are checked
+    with stats.stage('qc', count):
+        flags = [checks.flags(column, records.values[:, :, n])
+                 for n, column in enumerate(schema.measurements)]
+        extent.add_times(records.times)
+        extent.add_depths(records.z)
+
+    with stats.stage('write', count):
+        columns = [(variables['time'], records.times),
+                   (variables['timeSeries'],
+                    np.arange(record+1, record+count+1, dtype='i4')),
+                   (variables['z'], records.z)]
+        for n, column in enumerate(schema.measurements):
+            columns += [(variables[column.name], records.values[:, :, n]),
+                        (variables[qc.flag_name(column.name)], flags[n])]
+        return write_columns(columns, start=record, block_size=block_size)
+
+
+def _parse(infile, schema, chunk_rows, offset, stats):
+    chunks = iter_chunks(infile, schema.dtype, chunk_rows=chunk_rows,
+                         offset=offset)
+    while True:
+        with stats.stage('csv_parse'):
+            data = next(chunks, None)
+        if data is None:
+            return
+        stats.count('csv_parse', len(data))
+        yield data
+
+
+def parse_chunks(infile, schema, chunk_rows, offset, stats, pipeline):
+    """Yield the parsed chunks of ``infile`` from byte ``offset``, parsed by
+    a reader thread up to ``pipeline`` chunks ahead (0: in turn with the
+    writes).  The writer's wait for the reader is timed as 'reader_wait'."""
+    chunks = _parse(infile, schema, chunk_rows, offset, stats)
+    if not pipeline:
+        yield from chunks
+        return
+    chunks = prefetch(chunks, pipeline)
+    try:
+        while True:
+            with stats.stage('reader_wait'):
+                data = next(chunks, None)
+            if data is None:
+                return
+            yield data
+    finally:
+        chunks.close()
+
+
+def _write_rows(variables, schema, infile, row, block_size, chunk_rows,
+                offset, stats, checks, extent, pipeline, resamplers=()):
+    """Stream the CSV rows of ``infile`` (from byte ``offset``) into the
+    variables from ``row`` on; returns the row following the last one."""
+    with contextlib.closing(parse_chunks(infile, schema, chunk_rows, offset,
+                                         stats, pipeline)) as chunks:
+        for data in chunks:
+            row, dropped = write_chunk(variables, schema, data, row,
+                                       block_size, stats, checks, extent,
+                                       resamplers)
+            if dropped:
+                print('Skipping %d row(s) with an unparseable date/time in %s'
+                      % (dropped, infile))
+    return row
+
+
+def _write_profiles(variables, schema, infile, record, levels, block_size,
+                    chunk_rows, offset, stats, checks, extent, pipeline,
+                    pending=None, latest=None):
+    """Stream the CSV rows of ``infile`` (from byte ``offset``), pivoted to
+    one record per time, into the variables from ``record`` on; returns the
+    record following the last one.
+
+    ``pending`` are rows of the time of ``record`` already in the file,
+    merged with the rows of the same time read from ``infile``.  Raises
+    pivot.LayoutError when a time is not after ``latest`` or one already
+    written, or has more depths than ``levels``.
+    """
+    names = [column.name for column in schema.measurements]
+    chunks = parse_chunks(infile, schema, chunk_rows, offset, stats, pipeline)
+    with contextlib.closing(chunks):
+        while True:
+            data = next(chunks, None)
+            if data is None:
+                rows, pending = pending, None
+            else:
+                with stats.stage('time_conversion', len(data)):
+                    seconds, bad = parse_timestamps(data['date'], data['time'])
+                    if bad.any():
+                        print('Skipping %d row(s) with an unparseable date/time in %s'
+                              % (bad.sum(), infile))
+                        data, seconds = data[~bad], seconds[~bad]
+                # hold back the last time, the next chunk may continue it
+                rows, pending = pivot.split_last(pivot.concat(
+                    pending, pivot.make_rows(seconds, data, names)))
+            if rows is not None and len(rows.seconds):
+                with stats.stage('pivot', len(rows.seconds)):
+                    records = pivot.pivot(rows, levels)
+                if latest is not None and records.times[0] <= latest:
+                    raise pivot.LayoutError('%s: rows are not in time order'
+                                            % infile)
+                latest = records.times[-1]
+                if records.duplicates:
+                    print('Merged %d duplicate time/depth row(s) in %s'
+                          % (records.duplicates, infile))
+                record = write_records(variables, schema, records, record,
+                                       block_size, stats, checks, extent)
+            if data is None:
+                return record
+
+
+def _prepare(infile, chunk_rows, stats):
+    """Schema, depth levels and chunk size to convert ``infile`` with."""
+    with stats.stage('header'):
+        schema = read_schema(infile)
+    levels = 1
+    if has_depth(schema):
+        with stats.stage('pivot'):
+            levels, chunk_rows = pivot.count_levels(infile, schema, chunk_rows)
+    return schema, levels, chunk_rows
+
+
+def _build(nc, infile, schema, levels, station, period, file_id, block_size,
+           chunk_rows, profile, stats, pipeline, resamplers=()):
+    """Write the whole file into the new Dataset ``nc``; returns the number
+    of records and its time index."""
+    with stats.stage('define_variables'):
+        nc.setncatts(global_attributes(station, period, file_id, schema))
+        variables = define_variables(nc, station, schema, profile, levels)
+    chunking = variable_options(profile).get('chunksizes')
+    checks = qc.Checks()
+    extent = coverage.Coverage(chunking[0] if chunking else None)
+    if has_depth(schema):
+        row = _write_profiles(variables, schema, infile, 0, levels,
+                              block_size, chunk_rows, 0, stats, checks,
+                              extent, pipeline)
+    else:
+        row = _write_rows(variables, schema, infile, 0, block_size,
+                          chunk_rows, 0, stats, checks, extent, pipeline,
+                          resamplers)
+    with stats.stage('qc'):
+        _write_summaries(nc, variables, checks, extent)
+    return row, timeindex.make_index(
+        extent, [timeindex.Span(station['urn'], 0, extent.rows)])
+
+
+def convert_bytes(infile, station, period, file_id,
+                  block_size=DEFAULT_BLOCK_SIZE, chunk_rows=DEFAULT_CHUNK_ROWS,
+                  profile=DEFAULT_PROFILE, stats=None,
+                  pipeline=DEFAULT_PREFETCH):
+    """Convert the WAF CSV ``infile`` in memory, without touching the disk;
+    returns the bytes of the netCDF file and its number of records.
+
+    The bytes are meant to be served or read; the library cannot append to
+    a file saved from them, use convert_file for files kept on disk.
+    """
+    stats = stats or Stats()
+    schema, levels, chunk_rows = _prepare(infile, chunk_rows, stats)
+    # initial size of the in-memory file, grown by the library as needed
+    size = max(os.path.getsize(infile), 1 << 16)
+    nc = netCDF4.Dataset(file_id + '.nc', 'w', format=FORMAT, memory=size)
+    try:
+        row, _ = _build(nc, infile, schema, levels, station, period, file_id,
+                        block_size, chunk_rows, profile, stats, pipeline)
+        with stats.stage('close'):
+            data = nc.close()
+    except BaseException:
+        if nc.isopen():
+            nc.close()
+        raise
+    return data.tobytes(), row
+
+
+def convert_file(infile, outfile, station, period, file_id=None,
+                 block_size=DEFAULT_BLOCK_SIZE, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 profile=DEFAULT_PROFILE, stats=None, build=DEFAULT_BUILD,
+                 pipeline=DEFAULT_PREFETCH, formats=(), index=True,
+                 resolutions=()):
+    """Convert the WAF CSV ``infile`` to the netCDF file ``outfile``, stored
+    according to the named ``profile``.
+
+    Returns the number of records written: one per CSV row, or one per time
+    for files with a depth column.  ``build`` (see staging.py) tells whether
+    the file is written in place, or under a temporary name (TEMPFILE) or
+    in memory (MEMORY) and renamed into place once complete.  On error the
+    partial output is removed and the exception re-raised.  Pass an
+    instrument.Stats as ``stats`` to collect the time spent in each stage.
+    A reader thread parses up to ``pipeline`` chunks of CSV ahead while the
+    previous ones are written; 0 parses and writes in turn.  The same pass
+    writes a copy of the file in each of the ``formats`` of backends.py
+    next to ``outfile`` (see backends.output_path), staged alike.  With
+    ``index`` the time index of the file is written next to it (see
+    timeindex.py).  The hourly or daily means, minima and maxima of each of
+    the ``resolutions`` of resample.py are binned in the same pass and
+    written next to ``outfile`` (see resample.output_path).
+    """
+    stats = stats or Stats()
+    staging.check_build(build)
+    backends.check_formats(formats)
+    resample.check_resolutions(resolutions)
+    if file_id is None:
+        file_id = os.path.splitext(os.path.basename(outfile))[0]
+
+    schema, levels, chunk_rows = _prepare(infile, chunk_rows, stats)
+    resample.check_resolutions(resolutions, schema)
+    resamplers = [resample.Resampler(name, schema.measurements)
+                  for name in resolutions]
+    with contextlib.ExitStack() as outputs:
+        path = outputs.enter_context(staging.staged(outfile, build))
+        copies = [(name, outputs.enter_context(staging.staged(
+                      backends.output_path(outfile, name), build,
+                      directory=backends.WRITERS[name].directory)))
+                  for name in formats]
+        products = [outputs.enter_context(staging.staged(
+                        resample.output_path(outfile, name), build))
+                    for name in resolutions]
+        # a diskless file is saved to path in one go when closed
+        writers = [netCDF4.Dataset(path, 'w', format=FORMAT,
+                                   diskless=build == staging.MEMORY, persist=True)]
+        try:
+            writers += [backends.open_writer(name, copy) for name, copy in copies]
+            nc = backends.Fanout(writers) if copies else writers[0]
+            row, rows_index = _build(nc, infile, schema, levels, station, period,
+                                     file_id, block_size, chunk_rows, profile,
+                                     stats, pipeline, resamplers)
+            with stats.stage('close'):
+                nc.close()
+            _write_products(products, resamplers, path, stats)
+        except BaseException:
+            for writer in writers:
+                try:
+                    if writer.isopen():
+                        writer.close()
+                except Exception:
+                    pass
+            if build == staging.INPLACE:
+                for output in [path] + [copy for _, copy in copies] + products:
+                    staging.remove(output)
+            raise
+    _index(outfile, rows_index if index else None)
+    return row
+
+
+def _write_products(products, resamplers, source, stats):
+    """Write the bins of each of the ``resamplers`` to the matching path of
+    ``products``, with the metadata of the netCDF file ``source``."""
+    if not resamplers:
+        return
+    with stats.stage('resample'):
+        for product, resampler in zip(products, resamplers):
+            resample.write(product, resampler, source)
+
+
+def _index(outfile, index):
+    """Write the time ``index`` of ``outfile``, or remove the one it had when
+    None."""
+    if index is None:
+        timeindex.remove_index(outfile)
+    else:
+        timeindex.write_index(outfile, index)
+
+
+def append_options(options):
+    """The convert_file ``options`` that append_file takes as well; the
+    others (the storage profile) are fixed when the file is created."""
+    return dict((key, value) for key, value in options.items()
+                if key in ('block_size', 'chunk_rows', 'build', 'pipeline',
+                           'resolutions'))
+
+
+def append_file(infile, outfile, offset, block_size=DEFAULT_BLOCK_SIZE,
+                chunk_rows=DEFAULT_CHUNK_ROWS, stats=None, build=DEFAULT_BUILD,
+                pipeline=DEFAULT_PREFETCH, index=True, resolutions=()):
+    """Append the rows of ``infile`` from byte ``offset`` on to the existing
+    ``outfile`` along the unlimited timeSeries dimension.
+
+    ``outfile`` must have been converted from the same CSV columns.  Rows
+    continuing the last time of a file with depth column are merged into its
+    last record.  Returns the number of records added; raises AppendError
+    when the rows cannot be appended and the file must be converted again.
+    Unless ``build`` is INPLACE the rows are appended to a copy renamed over
+    ``outfile`` once complete (MEMORY works as TEMPFILE here).  On error an
+    in-place file may hold part of the new rows and should be converted
+    again from scratch.  The time index of ``outfile`` is rewritten with
+    ``index``, removed without, and the products of the ``resolutions`` (see
+    resample.py) binned again from the records already in the file and the
+    new ones.
+    """
+    stats = stats or Stats()
+    resample.check_resolutions(resolutions)
+    with stats.stage('header'):
+        schema = read_schema(infile)
+    resample.check_resolutions(resolutions, schema)
+    resamplers = [resample.Resampler(name, schema.measurements)
+                  for name in resolutions]
+    with contextlib.ExitStack() as outputs:
+        path = outputs.enter_context(staging.staged(outfile, build, copy=True))
+        products = [outputs.enter_context(staging.staged(
+                        resample.output_path(outfile, name), build))
+                    for name in resolutions]
+        added, rows_index = _append(infile, path, schema, offset, block_size,
+                                    chunk_rows, stats, pipeline, resamplers)
+        _write_products(products, resamplers, path, stats)
+    _index(outfile, rows_index if index else None)
+    return added
+
+
+def _append(infile, outfile, schema, offset, block_size, chunk_rows, stats,
+            pipeline, resamplers=()):
+    nc = netCDF4.Dataset(outfile, 'a')
+    try:
+        with stats.stage('define_variables'):
+            try:
+                variables = open_variables(nc, schema)
+            except IndexError as e:
+                # netCDF4 raises IndexError for a missing variable
+                raise AppendError('%s: %s' % (outfile, e))
+        start = len(nc.dimensions['timeSeries'])
+        if has_depth(schema):
+            levels = len(nc.dimensions['level'])
+            record, pending, latest = start, None, None
+            if start > 1:
+                latest = variables['time'][start - 2]
+            if start:
+                # rewrite the last record with any rows continuing it
+                record = start - 1
+                pending = pivot.unpivot(
+                    variables['time'][record],
+                    np.ma.filled(variables['z'][record], cf.FILL_VALUE),
+                    np.ma.filled(np.column_stack(
+                        [variables[column.name][record]
+                         for column in schema.measurements]), cf.FILL_VALUE))
+            checks = _checks(variables, schema)
+            extent = _coverage(nc, variables, schema, record)
+            try:
+                row = _write_profiles(variables, schema, infile, record,
+                                      levels, block_size, chunk_rows, offset,
+                                      stats, checks, extent, pipeline,
+                                      pending, latest)
+            except pivot.LayoutError as e:
+                raise AppendError(str(e))
+        else:
+            checks = _checks(variables, schema,
+                             variables['time'][start - 1] if start else None)
+            extent = _coverage(nc, variables, schema, start)
+            if resamplers and start:
+                _resample_records(variables, schema, start, stats, resamplers)
+            row = _write_rows(variables, schema, infile, start, block_size,
+                              chunk_rows, offset, stats, checks, extent,
+                              pipeline, resamplers)
+        with stats.stage('qc'):
+            _write_summaries(nc, variables, checks, extent)
+        today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        nc.setncatts({'date_modified': today, 'date_metadata_modified': today})
+        rows_index = timeindex.make_index(
+            extent, [timeindex.Span(nc.getncattr('platform'), 0, extent.rows)])
+    finally:
+        with stats.stage('close'):
+            nc.close()
+    return row - start, rows_index
@@ -0,0 +1,88 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : header.py
+#  Purpose     : Parse the station header file (prefix+'.hdr') generated by
+#                the GCOOS WAF next to each CSV. The header is one comma-
+#                separated line with single-quoted fields, e.g.
+#                  2015-05,ioos:station:DISL:BSCA,http://...,'Station Bon
+#                  Secour, LA',ioos:station:DISL,Station Bon Secour, LA,
+#                  'Air temperature probe, ...','Environmental probes and
+#                  sensors',30.3288,-87.8293,7290
+#                The platform name (6th field) is not quoted, so it may span
+#                several comma-separated fields; the fields before and after
+#                it are located from either end of the line.
+#
+#                Parsed headers are cached by their text. The sensor
+#                height/depth, which the header does not carry, is set by
+#                read_hdr() from the stream (atm/ocn) ending the file name.
+
+import csv
+import functools
+import os
+
+# long names of the local data nodes, by naming authority code
+ORGANIZATIONS = {
+    'DISL': 'Dauphin Island Sea Laboratory (DISL)',
+}
+
+# sensor height/depth (vertical_position) of each stream; z of an ocn file
+# is the depth column of its CSV instead
+VERTICAL_POSITIONS = {'atm': 3.0, 'ocn': 0.}
+
+_LEADING  = 5
+_TRAILING = 5
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse(line):
+    fields = next(csv.reader([line], quotechar="'"))
+    if len(fields) < _LEADING + _TRAILING:
+        raise ValueError('station header has %d fields, expected at least %d'
+                         % (len(fields), _LEADING + _TRAILING))
+    period, station_id, url, description, naming = fields[:_LEADING]
+    instruments, instrument_desc, latitude, longitude, records = fields[-_TRAILING:]
+    platform = ','.join(fields[_LEADING:-_TRAILING]).strip()
+    code = naming.rsplit(':', 1)[-1]
+
+    return {
+        'period'           : period,
+        'organization'     : ORGANIZATIONS.get(code, code),
+        'urn'              : station_id if station_id.startswith('urn:') else 'urn:'+station_id,
+        'url'              : url,
+        'description'      : description,
+        'naming'           : naming,
+        'platform'         : platform or description,
+        'instruments'      : tuple(name.strip() for name in instruments.split(',') if name.strip()),
+        'instrument_desc'  : instrument_desc,
+        'wmo'              : '',
+        'latitude'         : float(latitude),
+        'longitude'        : float(longitude),
+        'vertical_position': 0.,
+        'records'          : int(records),
+    }
+
+
+def parse_hdr(line):
+    """Parse the text of a station header into a station dict (see
+    engine.py) extended with 'period', 'platform', 'instruments',
+    'instrument_desc' and 'records'.  The dict returned is the caller's to
+    modify."""
+    station = dict(_parse(line.strip()))
+    station['instruments'] = list(station['instruments'])
+    return station
+
+
+def stream(path):
+    """Stream (e.g. 'atm' or 'ocn') of the WAF file ``path``, the last
+    '_'-separated part of its name."""
+    return os.path.splitext(os.path.basename(path))[0].rsplit('_', 1)[-1]
+
+
+def read_hdr(path):
+    """Read and parse the station header file ``path``, with the
+    vertical_position of its stream (VERTICAL_POSITIONS)."""
+    with open(path, 'r') as fh:
+        station = parse_hdr(fh.read())
+    station['vertical_position'] = VERTICAL_POSITIONS.get(stream(path), 0.)
+    return station
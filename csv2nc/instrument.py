@@ -0,0 +1,183 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : instrument.py
+#  Purpose     : Per-stage instrumentation of a conversion. A Stats object
+#                accumulates the wall time, rows processed and peak RSS of
+#                each pipeline stage (header, define_variables, csv_parse,
+#                reader_wait, time_conversion, pivot, qc, resample, write,
+#                close) and turns them into one JSON-serialisable record per
+#                output file, emitted as a JSON line for monitoring to
+#                scrape.
+#
+#                The peak RSS of a stage is measured by resetting the peak
+#                of the process (VmHWM, through /proc/self/clear_refs) when
+#                the stage starts and reading it when it ends; the peak
+#                reached before each reset is first credited to the stages
+#                and files still being measured. The RSS is that of the
+#                whole process: a stage timed while the reader thread parses
+#                ahead (see reader.prefetch) also counts what the reader
+#                allocated meanwhile. Where the peak cannot be reset (not
+#                Linux), stages have no peak and the peak of a file is that
+#                of the process so far (ru_maxrss).
+
+import collections
+import contextlib
+import datetime
+import json
+import sys
+import threading
+import time
+import weakref
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows; peak RSS is then reported as null
+    resource = None
+
+STAGES = ('header', 'define_variables', 'csv_parse', 'reader_wait',
+          'time_conversion', 'pivot', 'qc', 'resample', 'write', 'close')
+
+# the peaks being measured, credited before each reset of the process peak
+_measured = weakref.WeakSet()
+_lock = threading.Lock()
+# False once the process peak turned out not to be resettable
+_resettable = True
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB (or None)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024. * 1024.) if sys.platform == 'darwin' else peak / 1024.
+
+
+def _high_water_mb():
+    """Peak RSS of this process since its last reset (VmHWM), in MiB."""
+    with open('/proc/self/status') as fh:
+        for line in fh:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024.
+    raise ValueError('no VmHWM in /proc/self/status')
+
+
+class _Peak(object):
+    """Peak RSS, in MiB, reached since a measure started."""
+
+    __slots__ = ('mb', '__weakref__')
+
+    def __init__(self, mb):
+        self.mb = mb
+
+
+def _start_peak():
+    """Reset the peak RSS of the process and return a _Peak following it
+    from now, or None where the peak cannot be reset."""
+    global _resettable
+    with _lock:
+        if not _resettable:
+            return None
+        try:
+            reached = _high_water_mb()
+            with open('/proc/self/clear_refs', 'w') as fh:
+                fh.write('5')
+            peak = _Peak(_high_water_mb())
+        except (IOError, OSError, ValueError):
+            _resettable = False
+            return None
+        for other in _measured:
+            other.mb = max(other.mb, reached)
+        _measured.add(peak)
+    return peak
+
+
+def _stop_peak(peak):
+    """Peak RSS, in MiB, reached since ``peak`` was started."""
+    with _lock:
+        _measured.discard(peak)
+        try:
+            return max(peak.mb, _high_water_mb())
+        except (IOError, OSError, ValueError):
+            return peak.mb
+
+
+class Stats(object):
+    """Wall time, rows and peak RSS per stage of one conversion."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.peak = _start_peak()
+        self.stages = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=0):
+        """Time the enclosed block as (part of) stage ``name``."""
+        peak = _start_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add(name, seconds, rows,
+                     _stop_peak(peak) if peak is not None else None)
+
+    def add(self, name, seconds, rows=0, peak_rss_mb=None):
+        """Add one run of stage ``name``: its time, rows and the peak RSS
+        reached while it ran (in MiB, None when unknown)."""
+        entry = self.stages.setdefault(name, {'seconds': 0., 'rows': 0})
+        entry['seconds'] += seconds
+        entry['rows'] += rows
+        if peak_rss_mb is not None:
+            entry['peak_rss_mb'] = max(entry.get('peak_rss_mb', 0.), peak_rss_mb)
+
+    def count(self, name, rows):
+        """Add ``rows`` to a stage timed before its row count was known."""
+        self.stages.setdefault(name, {'seconds': 0., 'rows': 0})['rows'] += rows
+
+    def record(self, **fields):
+        """One record for the file, with ``fields`` (file, ok, rows, error,
+        ...) followed by the stage breakdown.
+
+        'seconds' is the wall time since the Stats was made.  Stages timed
+        on the reader thread (csv_parse) overlap those of the writer, so
+        'stage_seconds', the sum of the stages, can exceed it.
+        'peak_rss_mb' is the peak RSS since the Stats was made (or, where it
+        cannot be reset, since the process started).
+        """
+        stages = collections.OrderedDict()
+        for name in sorted(self.stages, key=lambda name: STAGES.index(name)
+                           if name in STAGES else len(STAGES)):
+            entry = dict(self.stages[name])
+            seconds = entry['seconds']
+            entry['rows_per_sec'] = (entry['rows'] / seconds
+                                     if entry['rows'] and seconds else None)
+            stages[name] = entry
+        record = collections.OrderedDict()
+        record['timestamp'] = datetime.datetime.fromtimestamp(
+            self.started, datetime.timezone.utc).isoformat()
+        record.update(fields)
+        record['seconds'] = time.perf_counter() - self.clock
+        record['stage_seconds'] = sum(entry['seconds'] for entry in stages.values())
+        record['peak_rss_mb'] = (_stop_peak(self.peak) if self.peak is not None
+                                 else peak_rss_mb())
+        record['stages'] = stages
+        return record
+
+
+def emit(record, target):
+    """Append ``record`` as one JSON line to ``target``: a path, '-' for
+    standard output, or an open text stream."""
+    line = json.dumps(record) + '\n'
+    if target == '-':
+        sys.stdout.write(line)
+        sys.stdout.flush()
+    elif hasattr(target, 'write'):
+        target.write(line)
+        target.flush()
+    else:
+        with open(target, 'a') as fh:
+            fh.write(line)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : manifest.py
+#  Purpose     : Manifest of the inputs each netCDF file was converted from,
+#                used by incremental runs. For every output it records the
+#                size, mtime and SHA-1 of the CSV and HDR files. On the next
+#                run an output whose inputs are unchanged is skipped, and one
+#                whose CSV only grew at the end (the current month) gets just
+#                the new rows appended instead of being converted again.
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.csv2nc_manifest.json'
+# bumped when the outputs written change, so that files appended to by an
+# older version are converted again (2: 'standard' time calendar)
+VERSION = 2
+
+SKIP    = 'skipped'
+APPEND  = 'appended'
+CONVERT = 'converted'
+
+_BLOCK = 1 << 20
+
+
+def fingerprint(path, prefix_size=None):
+    """Return the size/mtime/sha1 record of ``path``.
+
+    When ``prefix_size`` is given, the SHA-1 of the first ``prefix_size``
+    bytes is computed in the same read and returned as 'prefix_sha1'.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    prefix = None
+    done = 0
+    with open(path, 'rb') as fh:
+        while True:
+            block = fh.read(_BLOCK)
+            if not block:
+                break
+            if prefix_size is not None and prefix is None \
+                    and done + len(block) >= prefix_size:
+                digest.update(block[:prefix_size - done])
+                prefix = digest.copy().hexdigest()
+                digest.update(block[prefix_size - done:])
+            else:
+                digest.update(block)
+            done += len(block)
+    record = {'size': stat.st_size, 'mtime': stat.st_mtime,
+              'sha1': digest.hexdigest()}
+    if prefix_size is not None:
+        record['prefix_sha1'] = prefix
+    return record
+
+
+def _same_stat(path, record):
+    stat = os.stat(path)
+    return stat.st_size == record['size'] and stat.st_mtime == record['mtime']
+
+
+def _ends_with_newline(path, size):
+    with open(path, 'rb') as fh:
+        fh.seek(size - 1)
+        return fh.read(1) == b'\n'
+
+
+def station_key(station):
+    """The part of a parsed station header that must not change for rows to
+    be appended; the record count grows with the CSV."""
+    return dict((key, value) for key, value in station.items()
+                if key != 'records')
+
+
+def plan(entry, csv_path, hdr_path, outfile, station, settings=None):
+    """Decide how to bring ``outfile`` up to date with its inputs.
+
+    ``entry`` is the manifest entry of ``outfile`` (None when absent),
+    ``station`` the parsed header of ``hdr_path`` and ``settings`` the
+    output-affecting options of this run.  Returns ``(action, offset)`` where
+    action is SKIP, APPEND (new CSV rows start at byte ``offset``) or CONVERT.
+    """
+    if not entry or not os.path.isfile(outfile) \
+            or entry.get('settings') != (settings or {}):
+        return CONVERT, 0
+    old_csv, old_hdr = entry['csv'], entry['hdr']
+    if _same_stat(csv_path, old_csv) and _same_stat(hdr_path, old_hdr):
+        return SKIP, 0
+
+    size = old_csv['size']
+    csv_now = fingerprint(csv_path, prefix_size=size)
+    if csv_now['sha1'] == old_csv['sha1']:
+        # touched but not modified; the header decides
+        if fingerprint(hdr_path)['sha1'] == old_hdr['sha1']:
+            return SKIP, 0
+        return CONVERT, 0
+    if size and csv_now['size'] > size \
+            and csv_now['prefix_sha1'] == old_csv['sha1'] \
+            and _ends_with_newline(csv_path, size) \
+            and entry.get('station') == station_key(station):
+        return APPEND, size
+    return CONVERT, 0
+
+
+def refresh(entry, csv_path, hdr_path):
+    """Copy of a SKIP ``entry`` with the current size/mtime of its inputs, so
+    that a touched but unmodified file is not hashed again next run."""
+    entry = dict(entry)
+    for key, path in (('csv', csv_path), ('hdr', hdr_path)):
+        stat = os.stat(path)
+        entry[key] = dict(entry[key], size=stat.st_size, mtime=stat.st_mtime)
+    return entry
+
+
+def make_entry(csv_path, hdr_path, station, rows, settings=None):
+    """Manifest entry for an output converted from these inputs; take it
+    before converting so that a change made meanwhile is seen next run."""
+    return {'csv': fingerprint(csv_path), 'hdr': fingerprint(hdr_path),
+            'station': station_key(station), 'rows': rows,
+            'settings': settings or {}}
+
+
+def load(path):
+    """Return the {output name: entry} mapping stored at ``path``."""
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as fh:
+        manifest = json.load(fh)
+    if manifest.get('version') != VERSION:
+        return {}
+    return manifest['files']
+
+
+def save(path, files):
+    """Write the manifest atomically (rename over the previous one)."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump({'version': VERSION, 'files': files}, fh, indent=1,
+                  sort_keys=True)
+    os.replace(tmp, path)
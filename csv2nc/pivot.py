@@ -0,0 +1,157 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : pivot.py
+#  Purpose     : Group the rows of an ocn CSV by timestamp and depth and pivot
+#                them into one record per timestamp with a fixed number of
+#                depth levels, the (time, level) layout of the NCEI
+#                timeSeriesProfile incomplete-vertical, orthogonal-temporal
+#                template: the depths of the levels change from one record
+#                to the next. Rows repeating a (time, depth) pair are
+#                merged. Everything is done with sorts and array indexing,
+#                chunk by chunk; the rows of the last timestamp of a chunk
+#                are held back until the next chunk shows whether more rows
+#                follow for it.
+
+import collections
+
+import numpy as np
+
+from .cf import FILL_VALUE
+from .reader import iter_chunks, DEFAULT_CHUNK_ROWS
+from .schema import DATE_COLUMN, TIME_COLUMN, DEPTH_COLUMN
+from .times import parse_timestamps
+
+# seconds and depth are (n,), values (n, measurements)
+Rows    = collections.namedtuple('Rows', 'seconds depth values')
+# times is (records,), z (records, levels) and values (records, levels,
+# measurements); duplicates counts the rows merged into another one
+Records = collections.namedtuple('Records', 'times z values duplicates')
+
+
+class LayoutError(ValueError):
+    """Rows that do not fit the records of a file: more depths at one time
+    than its levels, or a time not after those already written."""
+
+
+def make_rows(seconds, data, names):
+    """Rows of the parsed CSV chunk ``data`` with the measurement columns
+    ``names`` side by side."""
+    values = np.empty((len(data), len(names)))
+    for n, name in enumerate(names):
+        values[:, n] = data[name]
+    return Rows(seconds, data[DEPTH_COLUMN], values)
+
+
+def concat(first, second):
+    """``first`` followed by ``second``; either may be None."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return Rows(*(np.concatenate(pair) for pair in zip(first, second)))
+
+
+def split_last(rows):
+    """Split ``rows`` into those before their latest timestamp and those at
+    it, which may be continued by the next chunk."""
+    if not len(rows.seconds):
+        return rows, None
+    tail = rows.seconds == rows.seconds.max()
+    return (Rows(*(field[~tail] for field in rows)),
+            Rows(*(field[tail] for field in rows)))
+
+
+def unpivot(seconds, z, values):
+    """Rows of one record read back from a file: ``z`` holds its (levels,)
+    depths and ``values`` its (levels, measurements) values."""
+    keep = z != FILL_VALUE
+    return Rows(np.full(int(keep.sum()), seconds, dtype='i8'), z[keep],
+                values[keep])
+
+
+def _layout(seconds, depth):
+    """Sort order of the rows by time then depth, and for the sorted rows
+    the cell (distinct time and depth) of each row, the first row of each
+    cell, and the record and level of each cell."""
+    # lexsort is stable: duplicates keep their order in the file
+    order = np.lexsort((depth, seconds))
+    seconds = seconds[order]
+    depth = depth[order]
+
+    new_cell = np.ones(len(order), dtype=bool)
+    new_cell[1:] = (seconds[1:] != seconds[:-1]) | (depth[1:] != depth[:-1])
+    cell = np.cumsum(new_cell) - 1
+    starts = np.flatnonzero(new_cell)
+
+    new_record = np.ones(len(starts), dtype=bool)
+    new_record[1:] = seconds[starts[1:]] != seconds[starts[:-1]]
+    record = np.cumsum(new_record) - 1
+    level = np.arange(len(starts)) - np.flatnonzero(new_record)[record]
+    return order, cell, starts, record, level
+
+
+def pivot(rows, levels):
+    """Pivot ``rows`` into Records with ``levels`` depth levels.
+
+    The depths found at one timestamp fill its levels from the shallowest
+    on; the levels left over hold FILL_VALUE.  Of rows repeating a time and
+    depth, the value of the last one that is not FILL_VALUE is kept.
+    Raises LayoutError when a timestamp has more than ``levels`` depths.
+    """
+    order, cell, starts, record, level = _layout(rows.seconds, rows.depth)
+    if not len(order):
+        return Records(rows.seconds[:0], np.empty((0, levels)),
+                       np.empty((0, levels, rows.values.shape[1])), 0)
+    if level.max() >= levels:
+        raise LayoutError('%d depths at one timestamp, the file has %d '
+                          'level(s)' % (level.max() + 1, levels))
+    count = record[-1] + 1
+
+    times = np.empty(count, dtype=rows.seconds.dtype)
+    times[record] = rows.seconds[order][starts]
+    z = np.full((count, levels), FILL_VALUE)
+    z[record, level] = rows.depth[order][starts]
+
+    values = np.full((count, levels, rows.values.shape[1]), FILL_VALUE)
+    merged = np.empty(len(starts))
+    for n in range(rows.values.shape[1]):
+        column = rows.values[order, n]
+        valid = column != FILL_VALUE
+        cells = cell[valid]
+        # the last valid row of each cell wins
+        last = np.ones(len(cells), dtype=bool)
+        last[:-1] = cells[1:] != cells[:-1]
+        merged.fill(FILL_VALUE)
+        merged[cells[last]] = column[valid][last]
+        values[record, level, n] = merged
+    return Records(times, z, values, len(order) - len(starts))
+
+
+def count_levels(path, schema, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Scan the date, time and depth columns of the CSV file ``path``.
+
+    Returns (levels, chunk_rows): the most distinct depths found at one
+    timestamp, and the chunk size to pivot the file with, which is None
+    (the whole file at once) when the timestamps go back from one chunk to
+    the next.
+    """
+    names = [column.name for column in schema.columns]
+    usecols = [names.index(name) for name in (DATE_COLUMN, TIME_COLUMN, DEPTH_COLUMN)]
+    dtype = np.dtype([(names[n], schema.dtype[names[n]]) for n in usecols])
+
+    levels, latest, pending = 0, None, None
+    for data in iter_chunks(path, dtype, usecols=usecols, chunk_rows=chunk_rows):
+        seconds, bad = parse_timestamps(data[DATE_COLUMN], data[TIME_COLUMN])
+        rows = make_rows(seconds[~bad], data[~bad], ())
+        if not len(rows.seconds):
+            continue
+        if latest is not None and rows.seconds.min() < latest:
+            return count_levels(path, schema, None)
+        latest = rows.seconds.max()
+        complete, pending = split_last(concat(pending, rows))
+        if len(complete.seconds):
+            levels = max(levels, _layout(complete.seconds, complete.depth)[4].max() + 1)
+    if pending is not None:
+        levels = max(levels, _layout(pending.seconds, pending.depth)[4].max() + 1)
+    return int(max(levels, 1)), chunk_rows
@@ -0,0 +1,68 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : profiles.py
+#  Purpose     : Named storage profiles for the NETCDF4_CLASSIC output: the
+#                HDF5 chunk length along timeSeries and the compression
+#                filters applied to every data variable of a run.
+#
+#                  default       netCDF4 library defaults
+#                  archive       deflate level 9 + shuffle, a year of hourly
+#                                records per chunk (long-term storage, NCEI)
+#                  archive-lossy archive, observations also quantized to 3
+#                                decimal digits (least_significant_digit)
+#                  fast-write    no filters, chunks sized for bulk writes (a
+#                                chunk is allocated whole, so short files grow)
+
+DEFAULT_PROFILE = 'default'
+
+# records per chunk of the (timeSeries, level) variables of profiles without
+# chunk_rows: the library default there is a single record per chunk, which
+# multiplies the size of the file and the time spent writing it
+GRID_CHUNK_ROWS = 1024
+
+PROFILES = {
+    'default': {},
+    'archive': {
+        'zlib'      : True,
+        'complevel' : 9,
+        'shuffle'   : True,
+        'chunk_rows': 8760,
+    },
+    'archive-lossy': {
+        'zlib'      : True,
+        'complevel' : 9,
+        'shuffle'   : True,
+        'chunk_rows': 8760,
+        'least_significant_digit': 3,
+    },
+    'fast-write': {
+        'zlib'      : False,
+        'shuffle'   : False,
+        'chunk_rows': 4096,
+    },
+}
+
+
+def variable_options(profile, observation=False, levels=None):
+    """createVariable keyword arguments of ``profile`` for a variable on the
+    timeSeries dimension, followed by the level dimension of ``levels``
+    depths when given; those are always chunked explicitly (GRID_CHUNK_ROWS
+    records per chunk unless the profile sets chunk_rows).  Quantization
+    only applies to ``observation`` variables, never to time or z.  Raises
+    ValueError for an unknown profile."""
+    try:
+        settings = PROFILES[profile]
+    except KeyError:
+        raise ValueError('unknown output profile %r (choose from %s)'
+                         % (profile, ', '.join(sorted(PROFILES))))
+    options = dict((key, settings[key]) for key in ('zlib', 'complevel', 'shuffle')
+                   if key in settings)
+    if levels:
+        options['chunksizes'] = (settings.get('chunk_rows') or GRID_CHUNK_ROWS,
+                                 levels)
+    elif settings.get('chunk_rows'):
+        options['chunksizes'] = (settings['chunk_rows'],)
+    if observation and settings.get('least_significant_digit') is not None:
+        options['least_significant_digit'] = settings['least_significant_digit']
+    return options
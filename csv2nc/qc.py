@@ -0,0 +1,105 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : qc.py
+#  Purpose     : Quality control of the observation columns while they are
+#                written. Each column is flagged in one vectorized pass with
+#                IOOS QARTOD primary flags: missing (fill value), fail
+#                (outside valid_min/valid_max of cf.VARIABLES), suspect (time
+#                not after the previous row) or pass. The same pass keeps the
+#                running min/max of the values not failed, written out as the
+#                actual_range attribute once the file is complete.
+
+import functools
+
+import numpy as np
+
+from .cf import FILL_VALUE, VARIABLES
+
+# QARTOD primary flags
+PASS, NOT_EVALUATED, SUSPECT, FAIL, MISSING = 1, 2, 3, 4, 9
+
+FLAG_VALUES   = np.array([PASS, NOT_EVALUATED, SUSPECT, FAIL, MISSING], dtype='i1')
+FLAG_MEANINGS = 'PASS NOT_EVALUATED SUSPECT FAIL MISSING'
+QARTOD_MANUAL = 'https://ioos.noaa.gov/ioos-in-action/qartod/'
+
+
+def flag_name(name):
+    """Name of the flag variable of the observation variable ``name``."""
+    return name + '_qc'
+
+
+@functools.lru_cache(maxsize=None)
+def flag_attributes(column):
+    """Attributes of the flag variable of ``column``.  The dict is cached;
+    do not modify it."""
+    entry = VARIABLES.get(column.name, {})
+    long_name = entry.get('long_name', column.name.replace('_', ' '))
+    attributes = {
+        'long_name'            : long_name + ' quality flag',
+        'flag_values'          : FLAG_VALUES,
+        'flag_meanings'        : FLAG_MEANINGS,
+        'valid_min'            : FLAG_VALUES.min(),
+        'valid_max'            : FLAG_VALUES.max(),
+        'coverage_content_type': 'qualityInformation',
+        'references'           : QARTOD_MANUAL,
+    }
+    if entry:
+        attributes['standard_name'] = column.name + ' status_flag'
+    return attributes
+
+
+class Checks(object):
+    """Flags the columns of one file chunk by chunk and keeps the running
+    state the checks need: the latest time seen and the actual range of
+    each column."""
+
+    def __init__(self, latest=None, ranges=None):
+        self.latest = latest
+        # column name -> [min, max] of the values not failed
+        self.ranges = dict((name, list(bounds))
+                           for name, bounds in (ranges or {}).items())
+
+    def time_flags(self, seconds):
+        """True for the times that are not after the one before them, the
+        previous chunk included."""
+        seconds = np.asarray(seconds)
+        suspect = np.zeros(len(seconds), dtype=bool)
+        if len(seconds):
+            suspect[1:] = seconds[1:] <= seconds[:-1]
+            if self.latest is not None:
+                suspect[0] = seconds[0] <= self.latest
+            latest = seconds.max()
+            if self.latest is None or latest > self.latest:
+                self.latest = latest
+        return suspect
+
+    def flags(self, column, values, suspect=None):
+        """QARTOD flags of the ``values`` of ``column``; ``suspect`` marks
+        the rows (first axis) whose time failed the time check."""
+        values = np.asarray(values)
+        flags = np.full(values.shape, PASS, dtype='i1')
+        entry = VARIABLES.get(column.name, {})
+        if 'valid_min' in entry:
+            failed = (values < entry['valid_min']) | (values > entry['valid_max'])
+        else:
+            failed = None
+            flags[...] = NOT_EVALUATED
+        if suspect is not None and suspect.any():
+            flags[suspect] = SUSPECT
+        if failed is not None:
+            flags[failed] = FAIL
+        missing = (values == FILL_VALUE) | np.isnan(values)
+        flags[missing] = MISSING
+
+        kept = values[(flags != FAIL) & (flags != MISSING)]
+        if kept.size:
+            bounds = self.ranges.setdefault(column.name, [kept.min(), kept.max()])
+            bounds[0] = min(bounds[0], kept.min())
+            bounds[1] = max(bounds[1], kept.max())
+        return flags
+
+    def actual_ranges(self):
+        """actual_range attribute value of each column with valid values."""
+        return dict((name, np.array(bounds, dtype='d'))
+                    for name, bounds in self.ranges.items())
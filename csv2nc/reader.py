@@ -0,0 +1,132 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : reader.py
+#  Required    : numpy (>= 1.23 for the C-backed loadtxt parser)
+#  Purpose     : Streaming ingestion of the GCOOS WAF CSV files. The file is
+#                memory-mapped and cut into fixed-size row chunks by
+#                vectorized scans of its bytes for newlines; each chunk is
+#                handed whole to NumPy's C parser, which fills a structured
+#                array, so no Python object is made per line and peak memory
+#                depends on the chunk size and not on the length of the file.
+#                prefetch() runs the parser in a background thread, a bounded
+#                number of chunks ahead of the netCDF writer.
+
+import contextlib
+import io
+import mmap
+import os
+import queue
+import threading
+
+import numpy as np
+
+# rows parsed per chunk; None reads the whole file as a single chunk
+DEFAULT_CHUNK_ROWS = 100000
+
+# chunks parsed ahead of the writer; 0 parses and writes in turn
+DEFAULT_PREFETCH = 2
+
+_END = object()
+
+_NL = ord('\n')
+
+# bytes scanned at a time per row wanted, when looking for the end of a chunk
+_ROW_BYTES = 128
+
+
+def _lines_end(mapped, start, lines):
+    """Offset following the first ``lines`` lines of ``mapped`` from
+    ``start``, or the end of ``mapped`` when it has fewer."""
+    size = len(mapped)
+    if not lines:
+        return size
+    found = 0
+    while start < size:
+        stop = min(start + lines * _ROW_BYTES, size)
+        newlines = np.flatnonzero(np.frombuffer(
+            mapped, dtype=np.uint8, count=stop - start, offset=start) == _NL)
+        if found + len(newlines) >= lines:
+            return start + int(newlines[lines - found - 1]) + 1
+        found += len(newlines)
+        start = stop
+    return size
+
+
+def iter_chunks(path, dtype, usecols=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                skip_header=1, offset=0):
+    """Yield the rows of the CSV file ``path`` as structured arrays of at
+    most ``chunk_rows`` rows.
+
+    ``dtype`` is the structured dtype of a row and ``usecols`` the indices of
+    the CSV columns it maps to (all columns when None).  The first
+    ``skip_header`` lines are skipped and blank lines are ignored.  A non-zero
+    ``offset`` starts reading at that byte, which must be the start of a data
+    row; the header is then not skipped.
+    """
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size <= offset:
+            return
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    with contextlib.closing(mapped):
+        start = offset or (_lines_end(mapped, 0, skip_header) if skip_header else 0)
+        while start < len(mapped):
+            stop = _lines_end(mapped, start, chunk_rows)
+            chunk = np.loadtxt(io.BytesIO(mapped[start:stop]), dtype=dtype,
+                               delimiter=',', usecols=usecols, ndmin=1)
+            start = stop
+            if len(chunk):
+                yield chunk
+
+
+def prefetch(iterable, depth=DEFAULT_PREFETCH):
+    """Yield the items of ``iterable``, produced by a background thread at
+    most ``depth`` items ahead of the consumer.
+
+    The bounded queue keeps memory to ``depth`` chunks while the parser and
+    the writer overlap (HDF5 writes release the GIL).  An exception raised
+    by ``iterable`` is re-raised in the consumer; a consumer that stops
+    early stops the thread after its current item.
+    """
+    if not depth:
+        for item in iterable:
+            yield item
+        return
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as e:
+            put((_END, e))
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='csv2nc-reader', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
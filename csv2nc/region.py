@@ -0,0 +1,298 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : region.py
+#  Required    : numpy, netCDF4
+#  Purpose     : One CF discrete-sampling-geometry file for every station of
+#                a period and stream instead of one file per station. The
+#                CSVs named <station>_YYYY_MM_<stream>.csv of a period and
+#                stream go to gcoos_ioos_region_YYYY_MM_<stream>.nc, a
+#                timeSeries file in the contiguous ragged array
+#                representation (CF 1.6, H.2.4):
+#
+#                  station  lat, lon, z, platform (URN, the timeseries_id),
+#                           platform_name and row_size, the number of obs
+#                           of the station
+#                  obs      time, the measurement columns and their QC flags,
+#                           the stations one after the other in row_size
+#                           order (the obs of station i start at the sum of
+#                           the row_size before it, see station_rows)
+#
+#                A measurement missing at a station is filled. Files with a
+#                depth column (timeSeriesProfile) are not merged; a batch
+#                converts them one by one.
+
+import collections
+import contextlib
+import os
+import re
+
+import netCDF4
+import numpy as np
+
+from . import cf, coverage, qc, staging, timeindex
+from .engine import global_attributes, parse_chunks, FORMAT
+from .header import read_hdr
+from .instrument import Stats
+from .profiles import variable_options, DEFAULT_PROFILE
+from .reader import DEFAULT_CHUNK_ROWS, DEFAULT_PREFETCH
+from .schema import read_schema, has_depth
+from .staging import DEFAULT_BUILD
+from .times import parse_timestamps
+from .writer import write_columns, DEFAULT_BLOCK_SIZE
+
+REGION_PREFIX = 'gcoos_ioos_region_'
+
+_MONTHLY = re.compile(r'^(?P<station>.+)_(?P<year>\d{4})_(?P<month>\d{2})_(?P<stream>[A-Za-z0-9]+)$')
+
+
+def region_name(csv_path):
+    """Name (without extension) of the region file of ``csv_path``, or None
+    when it is not named <station>_YYYY_MM_<stream>."""
+    match = _MONTHLY.match(os.path.splitext(os.path.basename(csv_path))[0])
+    if match is None:
+        return None
+    return REGION_PREFIX + '%s_%s_%s' % match.group('year', 'month', 'stream')
+
+
+def group(pairs):
+    """Group sorted (csv, hdr) pairs by region file; returns an ordered
+    {name: [(csv, hdr), ...]}, the stations of each in name order.  Files
+    not named by month, or with a depth column, are left out."""
+    groups = collections.OrderedDict()
+    for csv_path, hdr_path in sorted(pairs):
+        name = region_name(csv_path)
+        if name is not None and not has_depth(read_schema(csv_path)):
+            groups.setdefault(name, []).append((csv_path, hdr_path))
+    return groups
+
+
+def station_rows(row_size, index):
+    """Slice of the obs of station ``index`` given the ``row_size`` of every
+    station."""
+    offsets = np.concatenate(([0], np.cumsum(row_size)))
+    return slice(int(offsets[index]), int(offsets[index + 1]))
+
+
+def _columns(members, schemas):
+    """Measurement columns of the region: those of every member, in the
+    order first met.  Raises ValueError for files with a depth column or
+    a column given in other units."""
+    columns = collections.OrderedDict()
+    for (csv_path, _), schema in zip(members, schemas):
+        if has_depth(schema):
+            raise ValueError('%s: files with a depth column are not merged '
+                             'into region files' % csv_path)
+        for column in schema.measurements:
+            known = columns.setdefault(column.name, column)
+            if known.units != column.units:
+                raise ValueError('%s: %s in %s, not %s as in the other stations'
+                                 % (csv_path, column.name, column.units or 'no units',
+                                    known.units or 'no units'))
+    return tuple(columns.values())
+
+
+def _chars(values):
+    """Char array of the strings ``values``, one row each."""
+    values = [value.encode('utf-8') for value in values]
+    width = max([len(value) for value in values] + [1])
+    return np.array(values, dtype='S%d' % width).view('S1').reshape(len(values), width)
+
+
+def region_attributes(stations, schema, columns, period, file_id):
+    """Global attributes of the region file of ``stations``: those of the
+    first station with the title, platform, contributors, keywords and
+    bounding box of all."""
+    attributes = global_attributes(stations[0], period, file_id, schema)
+    urns = [station['urn'] for station in stations]
+    organizations = []
+    for station in stations:
+        if station['organization'] not in organizations:
+            organizations.append(station['organization'])
+    latitudes = [station['latitude'] for station in stations]
+    longitudes = [station['longitude'] for station in stations]
+    verticals = [station['vertical_position'] for station in stations]
+    # no NCEI template covers the ragged array representation
+    del attributes['ncei_template_version']
+    attributes.update({
+        'title'                  : 'GCOOS netCDF Data for %d stations for the period %s'
+                                   % (len(stations), period),
+        'summary'                : period+' time series data for the '+', '.join(urns)+' platforms served via GCOOS Data Portal. The uuid was generated using the uuid python module, invoking the command uuid.uuid4().',
+        'keywords'               : cf.keywords(columns),
+        'platform'               : ', '.join(urns),
+        'contributor_name'       : ', '.join(organizations),
+        'geospatial_lat_min'     : min(latitudes),
+        'geospatial_lat_max'     : max(latitudes),
+        'geospatial_lon_min'     : min(longitudes),
+        'geospatial_lon_max'     : max(longitudes),
+        'geospatial_vertical_min': min(verticals),
+        'geospatial_vertical_max': max(verticals),
+    })
+    return attributes
+
+
+def define_region(nc, stations, columns, profile=DEFAULT_PROFILE):
+    """Create the station and obs dimensions and every variable of a region
+    file; returns a dict of the variables written obs by obs ('time', one
+    per measurement column and its QC flags) and 'row_size'."""
+    nc.createDimension('station', len(stations))
+    nc.createDimension('obs', None)
+    storage = variable_options(profile)
+    observation_storage = variable_options(profile, observation=True)
+
+    urns = _chars([station['urn'] for station in stations])
+    names = _chars([station['platform'] for station in stations])
+    nc.createDimension('urn_strlen', urns.shape[1])
+    nc.createDimension('name_strlen', names.shape[1])
+    platform = nc.createVariable('platform', 'c', ('station', 'urn_strlen'))
+    platform.setncatts({'long_name': 'platform URN',
+                        'cf_role'  : 'timeseries_id'})
+    platform[:] = urns
+    platform_name = nc.createVariable('platform_name', 'c', ('station', 'name_strlen'))
+    platform_name.setncatts({'long_name': 'platform name'})
+    platform_name[:] = names
+    for name, attributes, field in (('lat', cf.LATITUDE, 'latitude'),
+                                    ('lon', cf.LONGITUDE, 'longitude'),
+                                    ('z', cf.ALTITUDE, 'vertical_position')):
+        variable = nc.createVariable(name, 'd', ('station',))
+        variable.setncatts(attributes)
+        variable[:] = [station[field] for station in stations]
+    row_size = nc.createVariable('row_size', 'i', ('station',))
+    row_size.setncatts({'long_name'        : 'number of observations of the station',
+                        'sample_dimension' : 'obs'})
+    nc.createVariable('crs', 'i', ()).setncatts(cf.CRS)
+
+    times = nc.createVariable('time', 'd', ('obs',), **storage)
+    times.setncatts(cf.TIME)
+    variables = {'time': times, 'row_size': row_size}
+    for n, column in enumerate(columns, 1):
+        instrument = 'instrument%d' % n
+        nc.createVariable(instrument, 'c', ()).setncatts(
+            cf.instrument_attributes(column, ''))
+        attributes = dict(cf.variable_attributes(column, instrument, '', '', False))
+        attributes.update({
+            'coordinates'        : 'time lat lon z',
+            'ancillary_variables': '%s %s' % (qc.flag_name(column.name), instrument),
+        })
+        del attributes['platform'], attributes['ioos_code']
+        obs = nc.createVariable(column.name, 'd', ('obs',),
+                                fill_value=cf.FILL_VALUE, **observation_storage)
+        obs.setncatts(attributes)
+        variables[column.name] = obs
+        flags = nc.createVariable(qc.flag_name(column.name), 'b', ('obs',),
+                                  **storage)
+        flags.setncatts(qc.flag_attributes(column))
+        variables[flags.name] = flags
+    return variables
+
+
+def write_observations(variables, columns, data, row,
+                       block_size=DEFAULT_BLOCK_SIZE, stats=None, checks=None,
+                       extent=None):
+    """Append the parsed CSV rows ``data`` of one station at obs ``row``,
+    the ``columns`` it does not have filled; returns the next row and the
+    number of rows dropped for an unparseable date/time."""
+    stats = stats or Stats()
+    checks = checks or qc.Checks()
+    extent = extent or coverage.Coverage()
+    with stats.stage('time_conversion', len(data)):
+        seconds, bad = parse_timestamps(data['date'], data['time'])
+        dropped = int(bad.sum())
+        if dropped:
+            data    = data[~bad]
+            seconds = seconds[~bad]
+
+    with stats.stage('qc', len(data)):
+        suspect = checks.time_flags(seconds)
+        values = [data[column.name] if column.name in data.dtype.names
+                  else np.full(len(data), cf.FILL_VALUE) for column in columns]
+        flags = [checks.flags(column, column_values, suspect)
+                 for column, column_values in zip(columns, values)]
+        extent.add_times(seconds)
+
+    with stats.stage('write', len(data)):
+        pairs = [(variables['time'], seconds)]
+        for column, column_values, column_flags in zip(columns, values, flags):
+            pairs += [(variables[column.name], column_values),
+                      (variables[qc.flag_name(column.name)], column_flags)]
+        row = write_columns(pairs, start=row, block_size=block_size)
+    return row, dropped
+
+
+def _write_region(nc, members, schemas, stations, period, file_id, profile,
+                  block_size, chunk_rows, stats, pipeline):
+    with stats.stage('define_variables'):
+        columns = _columns(members, schemas)
+        nc.setncatts(region_attributes(stations, schemas[0], columns, period,
+                                       file_id))
+        variables = define_region(nc, stations, columns, profile)
+    chunking = variable_options(profile).get('chunksizes')
+    checks = qc.Checks()
+    extent = coverage.Coverage(chunking[0] if chunking else None)
+    row_size = np.zeros(len(members), dtype='i4')
+    spans = []
+    row = 0
+    for n, ((csv_path, _), schema) in enumerate(zip(members, schemas)):
+        # the time checks, sampling intervals and index blocks are per station
+        checks.latest = None
+        extent.restart()
+        start = row
+        with contextlib.closing(parse_chunks(csv_path, schema, chunk_rows, 0,
+                                             stats, pipeline)) as chunks:
+            for data in chunks:
+                row, dropped = write_observations(variables, columns, data, row,
+                                                  block_size, stats, checks,
+                                                  extent)
+                if dropped:
+                    print('Skipping %d row(s) with an unparseable date/time in %s'
+                          % (dropped, csv_path))
+        row_size[n] = row - start
+        spans.append(timeindex.Span(stations[n]['urn'], start, row))
+    with stats.stage('qc'):
+        variables['row_size'][:] = row_size
+        for name, bounds in checks.actual_ranges().items():
+            variables[name].setncatts({'actual_range': bounds})
+        nc.setncatts(extent.attributes())
+    return row, timeindex.make_index(extent, spans)
+
+
+def build(members, outfile, period=None, file_id=None,
+          block_size=DEFAULT_BLOCK_SIZE, chunk_rows=DEFAULT_CHUNK_ROWS,
+          profile=DEFAULT_PROFILE, stats=None, build=DEFAULT_BUILD,
+          pipeline=DEFAULT_PREFETCH):
+    """Write the region file ``outfile`` of the (csv, hdr) ``members``, one
+    per station, in the order given.
+
+    ``period`` defaults to that of the first station header and ``file_id``
+    to the name of ``outfile``; the other options are those of
+    engine.convert_file.  The time index of the file, per station, is
+    written next to it.  Returns the number of obs written.
+    """
+    stats = stats or Stats()
+    staging.check_build(build)
+    if not members:
+        raise ValueError('a region file needs at least one station')
+    if file_id is None:
+        file_id = os.path.splitext(os.path.basename(outfile))[0]
+    with stats.stage('header'):
+        stations = [read_hdr(hdr_path) for _, hdr_path in members]
+        schemas = [read_schema(csv_path) for csv_path, _ in members]
+    period = period or stations[0]['period']
+
+    with staging.staged(outfile, build) as path:
+        nc = netCDF4.Dataset(path, 'w', format=FORMAT,
+                             diskless=build == staging.MEMORY, persist=True)
+        try:
+            row, index = _write_region(nc, members, schemas, stations, period,
+                                       file_id, profile, block_size, chunk_rows,
+                                       stats, pipeline)
+            with stats.stage('close'):
+                nc.close()
+        except BaseException:
+            if nc.isopen():
+                nc.close()
+            if build == staging.INPLACE:
+                staging.remove(path)
+            raise
+    timeindex.write_index(outfile, index)
+    return row
@@ -0,0 +1,210 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : resample.py
+#  Required    : numpy, netCDF4
+#  Purpose     : Hourly and daily products written in the conversion pass.
+#                The parsed columns of each chunk, with their QC flags, are
+#                binned on the fly: per bin and column the sum, count,
+#                minimum and maximum of the values neither missing nor
+#                failed, with one bincount (or minimum/maximum.at) per
+#                column. Once the file is complete every resolution asked
+#                for goes to a sibling file (<name>_hourly.nc,
+#                <name>_daily.nc): per column the mean, minimum, maximum and
+#                number of observations of each bin holding rows, with CF
+#                cell_methods and time bounds. Files with a depth column are
+#                not resampled.
+
+import os
+import uuid
+
+import netCDF4
+import numpy as np
+
+from . import cf, qc
+from .schema import has_depth
+
+# bin width (s) and CF interval of each resolution
+RESOLUTIONS = {
+    'hourly': (3600,  '1 hour', 'PT1H'),
+    'daily' : (86400, '1 day',  'P1D'),
+}
+
+FORMAT = 'NETCDF4_CLASSIC'
+
+# per statistic: variable name suffix, cell method and long name suffix
+_STATISTICS = (
+    ('',     'mean',    ''),
+    ('_min', 'minimum', ' minimum'),
+    ('_max', 'maximum', ' maximum'),
+)
+
+
+def check_resolutions(names, schema=None):
+    """Raise ValueError for an unknown resolution in ``names``, or for a
+    ``schema`` with a depth column."""
+    for name in names:
+        if name not in RESOLUTIONS:
+            raise ValueError('unknown resolution %r (choose from %s)'
+                             % (name, ', '.join(sorted(RESOLUTIONS))))
+    if names and schema is not None and has_depth(schema):
+        raise ValueError('files with a depth column are not resampled')
+
+
+def output_path(outfile, name):
+    """Path of the ``name`` resolution of the netCDF file ``outfile``."""
+    root, extension = os.path.splitext(outfile)
+    return '%s_%s%s' % (root, name, extension or '.nc')
+
+
+class Resampler(object):
+    """Running sum, count, minimum and maximum of ``columns`` over the bins
+    of one resolution, fed chunk by chunk in any time order."""
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.width = RESOLUTIONS[name][0]
+        self.columns = tuple(columns)
+        # bin number (seconds // width) of the first bin held
+        self.first = None
+        count = len(self.columns)
+        self.rows = np.zeros(0, dtype='i8')
+        self.sums = np.zeros((0, count))
+        self.counts = np.zeros((0, count), dtype='i8')
+        self.mins = np.zeros((0, count))
+        self.maxs = np.zeros((0, count))
+
+    def _grow(self, low, high):
+        """Make room for the bins ``low`` to ``high``."""
+        if self.first is None:
+            self.first = low
+        before = max(self.first - low, 0)
+        after = max(high - (self.first + len(self.rows) - 1), 0)
+        if not before and not after:
+            return
+
+        def pad(values, fill):
+            shape = values.shape[1:]
+            return np.concatenate((np.full((before,) + shape, fill, values.dtype),
+                                   values,
+                                   np.full((after,) + shape, fill, values.dtype)))
+        self.rows = pad(self.rows, 0)
+        self.sums = pad(self.sums, 0.)
+        self.counts = pad(self.counts, 0)
+        self.mins = pad(self.mins, np.inf)
+        self.maxs = pad(self.maxs, -np.inf)
+        self.first -= before
+
+    def add(self, seconds, values, flags):
+        """Account for the rows at ``seconds`` with the ``values`` and QC
+        ``flags`` of each column; missing and failed values are left out."""
+        seconds = np.asarray(seconds)
+        if not len(seconds):
+            return
+        bins = np.floor_divide(seconds, self.width).astype('i8')
+        self._grow(int(bins.min()), int(bins.max()))
+        index = bins - self.first
+        size = len(self.rows)
+        self.rows += np.bincount(index, minlength=size)
+        for n, (column_values, column_flags) in enumerate(zip(values, flags)):
+            kept = (column_flags != qc.FAIL) & (column_flags != qc.MISSING)
+            at, kept_values = index[kept], np.asarray(column_values)[kept]
+            self.sums[:, n] += np.bincount(at, weights=kept_values, minlength=size)
+            self.counts[:, n] += np.bincount(at, minlength=size)
+            np.minimum.at(self.mins[:, n], at, kept_values)
+            np.maximum.at(self.maxs[:, n], at, kept_values)
+
+    def bins(self):
+        """Start time (s) of each bin holding rows, and the mean, minimum,
+        maximum (the fill value where no value was kept) and count of each
+        column in those bins."""
+        held = np.flatnonzero(self.rows)
+        times = (self.first + held) * float(self.width)
+        counts = self.counts[held]
+        empty = counts == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums[held] / counts
+        statistics = [means, self.mins[held], self.maxs[held]]
+        for values in statistics:
+            values[empty] = cf.FILL_VALUE
+        return times, statistics, counts.astype('i4')
+
+
+def _cell_methods(method, interval, source):
+    """cell_methods of ``source`` with its time method replaced."""
+    time_method = 'time: %s (interval: %s comment: missing and QC-failed ' \
+                  'values excluded)' % (method, interval)
+    if 'time: point' in source:
+        return source.replace('time: point', time_method)
+    return (time_method + ' ' + source).strip()
+
+
+def write(path, resampler, source):
+    """Write the bins of ``resampler`` to the netCDF file ``path``, its
+    metadata taken from the converted file ``source``."""
+    width, interval, resolution = RESOLUTIONS[resampler.name]
+    times, statistics, counts = resampler.bins()
+    src = netCDF4.Dataset(source)
+    nc = netCDF4.Dataset(path, 'w', format=FORMAT)
+    try:
+        attributes = dict((name, src.getncattr(name)) for name in src.ncattrs())
+        file_id = '%s_%s' % (attributes.get('id', ''), resampler.name)
+        attributes.update({
+            'title'                   : '%s %s' % (resampler.name.capitalize(),
+                                                   attributes.get('title', '')),
+            'id'                      : file_id,
+            'uuid'                    : str(uuid.uuid4()),
+            'time_coverage_resolution': resolution,
+            'processing_level'        : 'Binned to %s means, minima and maxima '
+                                        'of the values not missing nor failing QC.'
+                                        % interval,
+        })
+        nc.setncatts(attributes)
+        nc.createDimension('time', len(times))
+        nc.createDimension('nv', 2)
+        time = nc.createVariable('time', 'd', ('time',))
+        time.setncatts(dict(cf.TIME, bounds='time_bounds'))
+        time[:] = times
+        bounds = nc.createVariable('time_bounds', 'd', ('time', 'nv'))
+        bounds[:] = np.column_stack((times, times + width))
+
+        # the station and instrument variables
+        for name, variable in src.variables.items():
+            if variable.dimensions:
+                continue
+            copy = nc.createVariable(name, variable.dtype if variable.dtype != 'S1'
+                                     else 'c', ())
+            copy.setncatts(dict((key, variable.getncattr(key))
+                                for key in variable.ncattrs()))
+            if variable.dtype != 'S1':
+                copy[:] = variable[:]
+
+        for n, column in enumerate(resampler.columns):
+            variable = src[column.name]
+            base = dict((key, variable.getncattr(key)) for key in variable.ncattrs()
+                        if key not in ('_FillValue', 'actual_range',
+                                       'ancillary_variables'))
+            for (suffix, method, long_name), values in zip(_STATISTICS, statistics):
+                out = nc.createVariable(column.name + suffix, 'd', ('time',),
+                                        fill_value=cf.FILL_VALUE)
+                out.setncatts(dict(base, **{
+                    'long_name'          : base.get('long_name', column.name) + long_name,
+                    'cell_methods'       : _cell_methods(method, interval,
+                                                         base.get('cell_methods', '')),
+                    'ancillary_variables': column.name + '_count',
+                }))
+                out[:] = values[:, n]
+            count = nc.createVariable(column.name + '_count', 'i', ('time',))
+            count.setncatts({
+                'long_name'   : '%s number of observations'
+                                % base.get('long_name', column.name),
+                'units'       : '1',
+                'coordinates' : base.get('coordinates', 'time lat lon'),
+                'cell_methods': 'time: sum (interval: %s)' % interval,
+            })
+            if 'standard_name' in base:
+                count.standard_name = base['standard_name'] + ' number_of_observations'
+            count[:] = counts[:, n]
+    finally:
+        nc.close()
+        src.close()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : schema.py
+#  Required    : numpy
+#  Purpose     : Column schema of a GCOOS WAF CSV file, inferred from its
+#                header line, e.g.
+#                  date,time,depth (m),sea_water_temperature (Celsius),...
+#                Each measurement column is written as 'name (units)'. Parsed
+#                headers are cached, so the many monthly files of a station
+#                (which share a header) are only parsed once.
+
+import collections
+import functools
+import re
+
+import numpy as np
+
+DATE_COLUMN  = 'date'
+TIME_COLUMN  = 'time'
+DEPTH_COLUMN = 'depth'
+
+_COLUMN = re.compile(r'^\s*([^()]*?)\s*(?:\(([^()]*)\))?\s*$')
+
+Column = collections.namedtuple('Column', 'name units')
+
+# columns     : every Column of the CSV, in file order
+# measurements: the Columns holding observations (not date/time/depth)
+# dtype       : structured dtype of a parsed row
+Schema = collections.namedtuple('Schema', 'columns measurements dtype')
+
+
+def has_depth(schema):
+    """True when the CSV carries a per-row depth column (ocn files)."""
+    return any(column.name == DEPTH_COLUMN for column in schema.columns)
+
+
+@functools.lru_cache(maxsize=64)
+def parse_header(line):
+    """Parse a CSV header line into a Schema.
+
+    Raises ValueError when the line does not start with the 'date' and
+    'time' columns or a column name is empty or repeated.
+    """
+    columns = []
+    for field in line.strip().split(','):
+        match = _COLUMN.match(field)
+        if not match or not match.group(1):
+            raise ValueError('unrecognised CSV header column %r' % field)
+        columns.append(Column(match.group(1), (match.group(2) or '').strip()))
+
+    names = [column.name for column in columns]
+    if names[:2] != [DATE_COLUMN, TIME_COLUMN]:
+        raise ValueError('CSV header must start with date,time (got %s)'
+                         % ','.join(names[:2]))
+    if len(set(names)) != len(names):
+        raise ValueError('CSV header repeats a column name: %s' % line.strip())
+
+    dtype = [(DATE_COLUMN, 'S10'), (TIME_COLUMN, 'S8')]
+    dtype += [(name, 'f8') for name in names[2:]]
+    measurements = tuple(column for column in columns[2:]
+                         if column.name != DEPTH_COLUMN)
+    return Schema(tuple(columns), measurements, np.dtype(dtype))
+
+
+def read_schema(path):
+    """Return the Schema of the CSV file ``path`` from its first line."""
+    with open(path, 'r') as fh:
+        return parse_header(fh.readline())
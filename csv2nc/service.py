@@ -0,0 +1,146 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : service.py
+#  Purpose     : Local HTTP service converting WAF files to netCDF on
+#                demand. It runs in one long-lived process, so the imports,
+#                the parsed station headers, the attribute templates and the
+#                recently generated files stay in memory between requests.
+#                GET /<station>/<period>/<stream>.nc, e.g.
+#                /DISL_BSCA/2015-05/atm.nc, converts
+#                <in_dir>/gcoos_ioos_station_DISL_BSCA_2015_05_atm.csv (and
+#                .hdr) and streams the file back; ?profile=archive selects a
+#                storage profile.
+
+import argparse
+import collections
+import http.server
+import io
+import os
+import re
+import sys
+import threading
+import urllib.parse
+
+from .api import convert
+from .profiles import PROFILES, DEFAULT_PROFILE
+
+# name of the WAF files of a station, period (YYYY_MM) and stream
+FILE_PREFIX = 'gcoos_ioos_station_%s_%s_%s'
+
+_PATH = re.compile(r'^/(?P<station>[A-Za-z0-9_]+)/(?P<year>\d{4})-(?P<month>\d{2})'
+                   r'/(?P<stream>[A-Za-z0-9]+)\.nc$')
+
+_BLOCK = 1 << 16
+
+
+class Converter(object):
+    """Converts the files of ``in_dir`` and keeps the last ``cache_size``
+    results, keyed by the size and mtime of their inputs."""
+
+    def __init__(self, in_dir, cache_size=32, **options):
+        self.in_dir = in_dir
+        self.cache_size = cache_size
+        self.options = options
+        self._cache = collections.OrderedDict()
+        # netCDF4/HDF5 is not thread-safe: one conversion at a time
+        self._lock = threading.Lock()
+
+    def inputs(self, station, year, month, stream):
+        """Paths of the CSV/HDR pair of a request; raises IOError when one
+        is missing."""
+        prefix = os.path.join(self.in_dir,
+                              FILE_PREFIX % (station, '%s_%s' % (year, month), stream))
+        paths = (prefix + '.csv', prefix + '.hdr')
+        for path in paths:
+            if not os.path.isfile(path):
+                raise IOError('no such file: %s' % os.path.basename(path))
+        return paths
+
+    def netcdf(self, csv_path, hdr_path, profile=DEFAULT_PROFILE):
+        """Bytes of the netCDF file of ``csv_path``, converted or cached."""
+        key = (csv_path, profile) + tuple(
+            (stat.st_size, stat.st_mtime)
+            for stat in (os.stat(csv_path), os.stat(hdr_path)))
+        with self._lock:
+            data = self._cache.get(key)
+            if data is None:
+                options = dict(self.options, profile=profile)
+                out = io.BytesIO()
+                convert(csv_path, hdr_path, out, **options)
+                data = out.getvalue()
+                self._cache[key] = data
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+        return data
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """GET /<station>/<YYYY-MM>/<stream>.nc[?profile=NAME]"""
+
+    converter = None
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        match = _PATH.match(url.path)
+        if match is None:
+            return self.send_error(404, 'expected /<station>/<YYYY-MM>/<stream>.nc')
+        query = urllib.parse.parse_qs(url.query)
+        profile = query.get('profile', [DEFAULT_PROFILE])[0]
+        if profile not in PROFILES:
+            return self.send_error(400, 'unknown profile %r' % profile)
+        try:
+            csv_path, hdr_path = self.converter.inputs(*match.group(
+                'station', 'year', 'month', 'stream'))
+        except IOError as e:
+            return self.send_error(404, str(e))
+        try:
+            data = self.converter.netcdf(csv_path, hdr_path, profile)
+        except Exception as e:
+            return self.send_error(500, '%s: %s' % (type(e).__name__, e))
+
+        name = os.path.splitext(os.path.basename(csv_path))[0] + '.nc'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-netcdf')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Content-Disposition', 'attachment; filename="%s"' % name)
+        self.end_headers()
+        view = memoryview(data)
+        for offset in range(0, len(data), _BLOCK):
+            self.wfile.write(view[offset:offset + _BLOCK])
+
+
+def serve(in_dir, host='127.0.0.1', port=8080, cache_size=32, **options):
+    """Serve the files of ``in_dir`` until interrupted; ``options`` are
+    passed on to convert."""
+    handler = type('Handler', (Handler,),
+                   {'converter': Converter(in_dir, cache_size, **options)})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    print('Serving netCDF of %s on http://%s:%d/' % (in_dir, host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve GCOOS WAF CSV/HDR files as netCDF, converted on demand.')
+    parser.add_argument('in_dir', help='directory holding the *.csv/*.hdr pairs')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='port to listen on (default: %(default)s)')
+    parser.add_argument('--cache', type=int, default=32,
+                        help='generated files kept in memory (default: %(default)s)')
+    args = parser.parse_args(argv)
+    serve(args.in_dir, args.host, args.port, args.cache)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : staging.py
+#  Purpose     : Keep partial output out of sight of the readers of the
+#                output directory (the web tier serves nc/ live). A file is
+#                built under a temporary name next to its final path and
+#                renamed over it, atomically, only once complete; a failed
+#                build leaves the previous file, if any, untouched.
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+# how a file is built: in place (readers may see it half written), as a
+# temporary file renamed into place, or in memory, saved to the temporary
+# file in one go when complete
+INPLACE  = 'inplace'
+TEMPFILE = 'tempfile'
+MEMORY   = 'memory'
+
+BUILD_MODES   = (INPLACE, TEMPFILE, MEMORY)
+DEFAULT_BUILD = TEMPFILE
+
+
+def check_build(build):
+    """Raise ValueError for an unknown build mode."""
+    if build not in BUILD_MODES:
+        raise ValueError('unknown build mode %r (choose from %s)'
+                         % (build, ', '.join(BUILD_MODES)))
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def remove(path):
+    """Remove the file or directory ``path``, if any."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _replace_directory(path, outfile):
+    # a directory cannot be renamed over another: the old one is moved
+    # aside first, so readers briefly see no store rather than a partial one
+    old = None
+    if os.path.isdir(outfile):
+        old = tempfile.mkdtemp(prefix='.%s.' % os.path.basename(outfile),
+                               suffix='.old', dir=os.path.dirname(path))
+        os.rmdir(old)
+        os.rename(outfile, old)
+    os.rename(path, outfile)
+    if old is not None:
+        shutil.rmtree(old)
+
+
+@contextlib.contextmanager
+def staged(outfile, build=DEFAULT_BUILD, copy=False, directory=False):
+    """Yield the path to write ``outfile`` at.
+
+    Unless ``build`` is INPLACE, that is a temporary file in the directory
+    of ``outfile``, renamed over it when the block completes and removed
+    when it raises.  With ``copy`` the temporary file starts as a copy of
+    ``outfile``, for changes to an existing file.  A ``directory`` output
+    (a Zarr store) is built as an empty temporary directory.
+    """
+    check_build(build)
+    if build == INPLACE:
+        yield outfile
+        return
+    parent, name = os.path.split(os.path.abspath(outfile))
+    if directory:
+        path = tempfile.mkdtemp(prefix='.%s.' % name, suffix='.tmp', dir=parent)
+        os.chmod(path, 0o777 & ~_umask())
+    else:
+        handle, path = tempfile.mkstemp(prefix='.%s.' % name, suffix='.tmp',
+                                        dir=parent)
+        os.close(handle)
+    try:
+        if copy:
+            shutil.copy2(outfile, path)
+        elif not directory:
+            # mkstemp creates the file readable by its owner only
+            os.chmod(path, 0o666 & ~_umask())
+        yield path
+        if directory:
+            _replace_directory(path, os.path.abspath(outfile))
+        else:
+            os.replace(path, outfile)
+    except BaseException:
+        remove(path)
+        raise
+
@@ -0,0 +1,331 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : timeindex.py
+#  Required    : numpy, netCDF4
+#  Usage       : bin/index_gcoos_nc.py OUT_DIR
+#  Purpose     : Time index of the generated files, to subset an archive by
+#                time without reading every time variable. Each file gets a
+#                JSON sidecar (<file>.nc.index.json) written with it: for
+#                every station the rows it occupies and its time range, and
+#                the earliest and latest time of each block of rows (whole
+#                chunks of the time variable, see coverage.py). The catalog
+#                of an output directory (.csv2nc_time_index.json) gathers the
+#                station ranges of all its files, leaving out the hourly and
+#                daily products (see resample.py), which would repeat the
+#                stations of their source. The catalog records the size and
+#                mtime of each file, and a file changed since (e.g. by a
+#                single-file conversion or an append) is indexed again when
+#                the catalog is loaded. query() reads the catalog, opens
+#                only the files with rows in the range asked for and reads
+#                only the blocks that overlap it.
+
+import argparse
+import collections
+import datetime
+import glob
+import json
+import os
+import sys
+
+import netCDF4
+import numpy as np
+
+from .coverage import Coverage
+from .resample import RESOLUTIONS, output_path
+
+VERSION = 1
+CATALOG_VERSION = 2
+
+SIDECAR_SUFFIX = '.index.json'
+CATALOG_NAME = '.csv2nc_time_index.json'
+
+# rows first:stop of station urn in a file
+Span = collections.namedtuple('Span', 'urn first stop')
+# rows of a file (of station urn) in the range queried, their time and the
+# values of each variable asked for
+Subset = collections.namedtuple('Subset', 'file urn rows time values')
+
+
+def sidecar_path(path):
+    """Path of the index of the netCDF file ``path``."""
+    return path + SIDECAR_SUFFIX
+
+
+def make_index(extent, spans):
+    """Index of a file from the coverage.Coverage ``extent`` its times were
+    fed to and the Spans of its stations, each started by a restart of
+    ``extent``."""
+    stations = []
+    for span in spans:
+        blocks = [block for block in extent.blocks
+                  if span.first <= block[0] < span.stop]
+        stations.append({
+            'urn'  : span.urn,
+            'rows' : [span.first, span.stop],
+            'start': min(block[1] for block in blocks) if blocks else None,
+            'end'  : max(block[2] for block in blocks) if blocks else None,
+        })
+    return {'version': VERSION, 'rows': extent.rows,
+            'chunk_rows': extent.chunk_rows, 'block_rows': extent.block_rows,
+            'stations': stations, 'blocks': extent.blocks}
+
+
+def _spans(nc, rows):
+    if 'row_size' in nc.variables:
+        # region file (see region.py)
+        urns = netCDF4.chartostring(nc['platform'][:])
+        offsets = np.concatenate(([0], np.cumsum(nc['row_size'][:])))
+        return [Span(str(urn), int(first), int(stop))
+                for urn, first, stop in zip(urns, offsets[:-1], offsets[1:])]
+    return [Span(nc.getncattr('platform'), 0, rows)]
+
+
+def index_file(path):
+    """Index of the netCDF file ``path`` from its time variable, for files
+    written without one."""
+    nc = netCDF4.Dataset(path)
+    try:
+        times = nc['time']
+        chunking = times.chunking()
+        extent = Coverage(chunking[0] if isinstance(chunking, list) else None)
+        seconds = np.ma.filled(times[:], 0)
+        spans = _spans(nc, len(seconds))
+        for span in spans:
+            extent.restart()
+            extent.add_times(seconds[span.first:span.stop])
+    finally:
+        nc.close()
+    return make_index(extent, spans)
+
+
+def write_index(path, index):
+    """Write ``index`` as the sidecar of ``path``, recording the size and
+    mtime of ``path`` so that a later change to it is noticed."""
+    stat = os.stat(path)
+    index = dict(index, size=stat.st_size, mtime=stat.st_mtime)
+    sidecar = sidecar_path(path)
+    tmp = sidecar + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(index, fh, separators=(',', ':'))
+    os.replace(tmp, sidecar)
+
+
+def remove_index(path):
+    """Remove the sidecar of ``path``, if any."""
+    try:
+        os.remove(sidecar_path(path))
+    except OSError:
+        pass
+
+
+def read_index(path):
+    """Index of ``path`` from its sidecar, or None when there is none or it
+    no longer matches the file."""
+    try:
+        with open(sidecar_path(path), 'r') as fh:
+            index = json.load(fh)
+        stat = os.stat(path)
+    except (IOError, OSError, ValueError):
+        return None
+    if index.get('version') != VERSION or index.get('size') != stat.st_size \
+            or index.get('mtime') != stat.st_mtime:
+        return None
+    return index
+
+
+def update_index(path):
+    """Index of ``path``, from its sidecar or, when missing or out of date,
+    from the file (and then written out)."""
+    index = read_index(path)
+    if index is None:
+        index = index_file(path)
+        write_index(path, index)
+    return index
+
+
+def _derived(paths):
+    """The resampled products (see resample.py) of the files among
+    ``paths``."""
+    return set(output_path(path, name) for path in paths
+               for name in RESOLUTIONS) & set(paths)
+
+
+def _read_catalog(out_dir):
+    """Entries {file name: {size, mtime, stations}} of the catalog file of
+    ``out_dir``, empty when there is none."""
+    try:
+        with open(os.path.join(out_dir, CATALOG_NAME), 'r') as fh:
+            catalog = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
+    if catalog.get('version') != CATALOG_VERSION:
+        return {}
+    return catalog['files']
+
+
+def _save_catalog(out_dir, files):
+    path = os.path.join(out_dir, CATALOG_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump({'version': CATALOG_VERSION, 'files': files}, fh, indent=1,
+                  sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _catalog(out_dir, known):
+    """Entries of the netCDF files of ``out_dir``: those of ``known`` that
+    still match the size and mtime of their file, the others from the
+    sidecars (indexing the files without an up-to-date one).  Files that
+    cannot be read are left out."""
+    files = {}
+    paths = sorted(glob.glob(os.path.join(out_dir, '*.nc')))
+    derived = _derived(paths)
+    for path in paths:
+        if path in derived:
+            # indexed by earlier versions
+            remove_index(path)
+            continue
+        name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+            entry = known.get(name)
+            if not entry or entry.get('size') != stat.st_size \
+                    or entry.get('mtime') != stat.st_mtime:
+                entry = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                         'stations': update_index(path)['stations']}
+        except (IOError, OSError) as e:
+            print('Not indexed: %s' % e)
+            continue
+        files[name] = entry
+    return files
+
+
+def _stations(files):
+    return dict((name, entry['stations']) for name, entry in files.items())
+
+
+def write_catalog(out_dir):
+    """Index every netCDF file of ``out_dir`` that has no up-to-date
+    sidecar and write the catalog of their stations; returns the catalog
+    {file name: stations}."""
+    files = _catalog(out_dir, _read_catalog(out_dir))
+    _save_catalog(out_dir, files)
+    return _stations(files)
+
+
+def load_catalog(out_dir):
+    """Catalog {file name: stations} of ``out_dir`` as written by
+    write_catalog, with the files added or changed since indexed again;
+    the catalog file is then updated when it can be."""
+    known = _read_catalog(out_dir)
+    files = _catalog(out_dir, known)
+    if files != known:
+        try:
+            _save_catalog(out_dir, files)
+        except (IOError, OSError):
+            # a read-only archive
+            pass
+    return _stations(files)
+
+
+def _seconds(value):
+    """Seconds since 1970 of a number, a datetime (naive ones are UTC) or an
+    ISO 8601 string."""
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _ranges(blocks, block_rows, span, start, end):
+    """Row ranges of ``span`` whose blocks overlap start..end, adjacent
+    blocks merged."""
+    ranges = []
+    for first, low, high in blocks:
+        if not span.first <= first < span.stop or high < start or low > end:
+            continue
+        stop = min(first + block_rows, span.stop)
+        if ranges and ranges[-1][1] == first:
+            ranges[-1][1] = stop
+        else:
+            ranges.append([first, stop])
+    return ranges
+
+
+def _record_variables(nc):
+    dimension = nc['time'].dimensions[0]
+    return [name for name, variable in nc.variables.items()
+            if variable.dimensions[:1] == (dimension,)
+            and name not in ('time', dimension)]
+
+
+def query(out_dir, start, end, urns=None, variables=None):
+    """Rows of the files of ``out_dir`` with a time from ``start`` to
+    ``end`` (inclusive; seconds since 1970, datetimes or ISO 8601 strings).
+
+    Only the files the catalog shows to have rows in the range are opened,
+    and only the blocks of rows whose time range overlaps it are read.
+    ``urns`` restricts the stations and ``variables`` the variables read
+    (default: every variable along time).  Returns a Subset per station and
+    file with rows in the range, in file order.
+    """
+    start, end = _seconds(start), _seconds(end)
+    urns = set(urns) if urns else None
+    subsets = []
+    for name, stations in sorted(load_catalog(out_dir).items()):
+        wanted = set(station['urn'] for station in stations
+                     if station['start'] is not None and station['start'] <= end
+                     and station['end'] >= start
+                     and (urns is None or station['urn'] in urns))
+        if not wanted:
+            continue
+        path = os.path.join(out_dir, name)
+        if not os.path.isfile(path):
+            continue
+        index = update_index(path)
+        nc = netCDF4.Dataset(path)
+        try:
+            nc.set_auto_mask(False)
+            names = variables or _record_variables(nc)
+            for station in index['stations']:
+                if station['urn'] not in wanted:
+                    continue
+                span = Span(station['urn'], *station['rows'])
+                rows, times = [], []
+                values = dict((variable, []) for variable in names)
+                for first, stop in _ranges(index['blocks'], index['block_rows'],
+                                           span, start, end):
+                    seconds = nc['time'][first:stop]
+                    keep = (seconds >= start) & (seconds <= end)
+                    rows.append(np.arange(first, stop)[keep])
+                    times.append(seconds[keep])
+                    for variable in names:
+                        values[variable].append(nc[variable][first:stop][keep])
+                if rows and sum(len(part) for part in rows):
+                    subsets.append(Subset(
+                        name, span.urn, np.concatenate(rows), np.concatenate(times),
+                        dict((variable, np.concatenate(parts))
+                             for variable, parts in values.items())))
+        finally:
+            nc.close()
+    return subsets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Index the netCDF files of a directory by time and write '
+                    'its catalog.')
+    parser.add_argument('out_dir', help='directory holding the *.nc files')
+    args = parser.parse_args(argv)
+    files = write_catalog(args.out_dir)
+    print('%d file(s) indexed in %s' % (len(files),
+                                        os.path.join(args.out_dir, CATALOG_NAME)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : times.py
+#  Required    : numpy
+#  Purpose     : Columnar conversion of the GCOOS WAF 'date' (YYYY-MM-DD) and
+#                'time' (HH:MM:SS) CSV columns to seconds since 1970-01-01 UTC.
+#                The whole column pair is decoded in one NumPy pass; rows that
+#                do not hold a valid timestamp are flagged in a boolean mask
+#                instead of raising on the first bad row.
+
+import numpy as np
+
+EPOCH_UNITS = 'seconds since 1970-01-01 00:00:00 UTC'
+
+_ZERO = ord('0')
+
+
+def _fixed_width(column, width):
+    """Return ``column`` as an (n, width) uint8 array plus a mask of rows
+    whose stripped value is not exactly ``width`` bytes long."""
+    column = np.char.strip(np.asarray(column).astype('S'))
+    wrong_width = np.char.str_len(column) != width
+    raw = column.astype('S%d' % width).view(np.uint8).reshape(-1, width)
+    return raw, wrong_width
+
+
+def _digits(raw, start, stop):
+    """Decode the decimal field raw[:, start:stop]; returns (values, bad)."""
+    field = raw[:, start:stop].astype(np.int64) - _ZERO
+    bad = ((field < 0) | (field > 9)).any(axis=1)
+    weights = 10 ** np.arange(stop - start - 1, -1, -1, dtype=np.int64)
+    return field.dot(weights), bad
+
+
+def parse_timestamps(dates, times):
+    """Convert the CSV date/time columns to seconds since 1970-01-01 UTC.
+
+    ``dates`` and ``times`` are equal-length sequences (str or bytes) as read
+    from the ``date`` and ``time`` columns.  Returns ``(seconds, bad)`` where
+    ``seconds`` is an int64 array and ``bad`` a boolean mask of the rows that
+    could not be parsed; ``seconds`` is 0 on those rows.
+    """
+    draw, bad = _fixed_width(dates, 10)
+    traw, bad_time = _fixed_width(times, 8)
+    bad |= bad_time
+    if len(draw) != len(traw):
+        raise ValueError('date and time columns differ in length (%d != %d)'
+                         % (len(draw), len(traw)))
+
+    bad |= (draw[:, 4] != ord('-')) | (draw[:, 7] != ord('-'))
+    bad |= (traw[:, 2] != ord(':')) | (traw[:, 5] != ord(':'))
+
+    year, b = _digits(draw, 0, 4)
+    bad |= b
+    month, b = _digits(draw, 5, 7)
+    bad |= b
+    day, b = _digits(draw, 8, 10)
+    bad |= b
+    hour, b = _digits(traw, 0, 2)
+    bad |= b
+    minute, b = _digits(traw, 3, 5)
+    bad |= b
+    second, b = _digits(traw, 6, 8)
+    bad |= b
+
+    bad |= (month < 1) | (month > 12)
+    bad |= (hour > 23) | (minute > 59) | (second > 59)
+    # neutralise bad rows before the calendar arithmetic
+    year = np.where(bad, 1970, year)
+    month = np.where(bad, 1, month)
+
+    first = (year - 1970) * 12 + (month - 1)
+    first = first.astype('datetime64[M]')
+    month_start = first.astype('datetime64[D]').astype(np.int64)
+    month_days = (first + 1).astype('datetime64[D]').astype(np.int64) - month_start
+    bad |= (day < 1) | (day > month_days)
+
+    seconds = (month_start + day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    seconds[bad] = 0
+    return seconds, bad
@@ -0,0 +1,262 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : verify.py
+#  Required    : numpy, netCDF4
+#  Usage       : bin/verify_gcoos_nc.py [-j N] [--rtol R] [--atol A] NEW REFERENCE
+#  Purpose     : Regression check of regenerated files against reference
+#                outputs (e.g. nc/). Two files match when they have the same
+#                dimensions, variables and attributes and their values agree:
+#                floating-point values within rtol/atol (NaNs and fill values
+#                equal to each other), all other values exactly. Variables
+#                are read in blocks of rows from both files and compared a
+#                block at a time, and the attributes that change at every
+#                run (VOLATILE: uuid, dates, history) are left out. A
+#                directory is checked file by file over a pool of worker
+#                processes.
+
+import argparse
+import collections
+import concurrent.futures
+import functools
+import glob
+import os
+import sys
+
+import netCDF4
+import numpy as np
+
+# global attributes set anew by every conversion
+VOLATILE = frozenset(('uuid', 'history', 'date_created', 'date_modified',
+                      'date_issued', 'date_metadata_modified'))
+
+DEFAULT_RTOL = 1e-6
+DEFAULT_ATOL = 0.
+
+# rows of each variable read at a time
+DEFAULT_BLOCK_ROWS = 65536
+
+# differences listed per file; the others are only counted
+MAX_DIFFERENCES = 20
+
+# differences is the list of the differences found (empty when the files
+# match), error the message of a file that could not be compared
+Result = collections.namedtuple('Result', 'new reference ok differences error')
+
+
+def _equal(a, b, rtol, atol):
+    """Element-wise agreement of the arrays ``a`` and ``b`` of one shape."""
+    if a.dtype.kind in 'fc' or b.dtype.kind in 'fc':
+        return np.isclose(a, b, rtol=rtol, atol=atol, equal_nan=True)
+    return a == b
+
+
+def _attribute_differences(where, new, reference, ignore, additions, rtol, atol):
+    differences = []
+    new_names, reference_names = set(new.ncattrs()), set(reference.ncattrs())
+    for name in sorted((reference_names - new_names) - ignore):
+        differences.append('%s: attribute %s missing' % (where, name))
+    if not additions:
+        for name in sorted((new_names - reference_names) - ignore):
+            differences.append('%s: attribute %s not in the reference' % (where, name))
+    for name in sorted((new_names & reference_names) - ignore):
+        a, b = new.getncattr(name), reference.getncattr(name)
+        if isinstance(a, str) or isinstance(b, str):
+            same = a == b
+        else:
+            a, b = np.atleast_1d(a), np.atleast_1d(b)
+            same = a.shape == b.shape and bool(_equal(a, b, rtol, atol).all())
+        if not same:
+            if not isinstance(a, str):
+                a, b = a.tolist(), b.tolist()
+            differences.append('%s: attribute %s is %r, not %r' % (where, name, a, b))
+    return differences
+
+
+def _value_differences(name, new, reference, block_rows, rtol, atol):
+    """Differences of the values of the variable ``name``, read ``block_rows``
+    rows (along the first dimension) at a time."""
+    if new.shape != reference.shape:
+        return ['%s: shape %s, not %s' % (name, new.shape, reference.shape)]
+    if new.dtype != reference.dtype:
+        return ['%s: type %s, not %s' % (name, new.dtype, reference.dtype)]
+    rows = new.shape[0] if new.shape else 1
+    mismatches, first, largest = 0, None, 0.
+    for start in range(0, rows, block_rows):
+        if new.shape:
+            a = new[start:start + block_rows]
+            b = reference[start:start + block_rows]
+        else:
+            a, b = new[...], reference[...]
+        a, b = np.asarray(a), np.asarray(b)
+        differ = ~_equal(a, b, rtol, atol)
+        count = int(np.count_nonzero(differ))
+        if not count:
+            continue
+        if first is None:
+            at = np.unravel_index(np.flatnonzero(differ)[0], differ.shape)
+            index = [int(n) for n in at]
+            if index:
+                index[0] += start
+            first = (index, a[at].tolist(), b[at].tolist())
+        if a.dtype.kind in 'fciu':
+            with np.errstate(invalid='ignore'):
+                gap = np.abs(a[differ].astype('d') - b[differ].astype('d'))
+            gap = gap[np.isfinite(gap)]
+            if len(gap):
+                largest = max(largest, float(gap.max()))
+        mismatches += count
+    if not mismatches:
+        return []
+    index, a, b = first
+    message = '%s: %d value(s) differ, first at %s (%r, not %r)' % (
+        name, mismatches, index, a, b)
+    if largest:
+        message += ', largest difference %g' % largest
+    return [message]
+
+
+def compare_files(new, reference, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL,
+                  ignore=VOLATILE, additions=False, block_rows=DEFAULT_BLOCK_ROWS):
+    """Differences of the netCDF file ``new`` from the file ``reference``,
+    as a list of messages (empty when they match).
+
+    Global attributes named in ``ignore`` are not compared.  With
+    ``additions`` the dimensions, variables and attributes of ``new`` that
+    the reference lacks are not differences, so that a converter writing
+    more can still be checked against older references.
+    """
+    ignore = frozenset(ignore)
+    a, b = netCDF4.Dataset(new), netCDF4.Dataset(reference)
+    try:
+        # raw values: fill values compare as they are stored
+        a.set_auto_mask(False)
+        b.set_auto_mask(False)
+        differences = []
+        if a.file_format != b.file_format:
+            differences.append('format %s, not %s' % (a.file_format, b.file_format))
+        differences += _attribute_differences('global', a, b, ignore, additions,
+                                              rtol, atol)
+        for name in sorted(set(b.dimensions) - set(a.dimensions)):
+            differences.append('dimension %s missing' % name)
+        for name in sorted(set(a.dimensions) - set(b.dimensions)):
+            if not additions:
+                differences.append('dimension %s not in the reference' % name)
+        for name in sorted(set(a.dimensions) & set(b.dimensions)):
+            x, y = a.dimensions[name], b.dimensions[name]
+            if (len(x), x.isunlimited()) != (len(y), y.isunlimited()):
+                differences.append('dimension %s: %d%s, not %d%s' % (
+                    name, len(x), ' (unlimited)' if x.isunlimited() else '',
+                    len(y), ' (unlimited)' if y.isunlimited() else ''))
+
+        for name in sorted(set(b.variables) - set(a.variables)):
+            differences.append('%s: variable missing' % name)
+        for name in sorted(set(a.variables) - set(b.variables)):
+            if not additions:
+                differences.append('%s: variable not in the reference' % name)
+        for name in sorted(set(a.variables) & set(b.variables)):
+            x, y = a.variables[name], b.variables[name]
+            if x.dimensions != y.dimensions:
+                differences.append('%s: dimensions %s, not %s'
+                                   % (name, x.dimensions, y.dimensions))
+                continue
+            differences += _attribute_differences(name, x, y, frozenset(),
+                                                  additions, rtol, atol)
+            differences += _value_differences(name, x, y, block_rows, rtol, atol)
+    finally:
+        a.close()
+        b.close()
+    return differences
+
+
+def verify_file(new, reference, **options):
+    """Compare ``new`` with ``reference`` (see compare_files) into a Result;
+    never raises for a file that cannot be read."""
+    if not os.path.isfile(new):
+        return Result(new, reference, False, [], 'no such file')
+    try:
+        differences = compare_files(new, reference, **options)
+    except Exception as e:
+        return Result(new, reference, False, [], '%s: %s' % (type(e).__name__, e))
+    return Result(new, reference, not differences, differences, None)
+
+
+def _verify_pair(options, pair):
+    return verify_file(pair[0], pair[1], **options)
+
+
+def verify_directory(new_dir, reference_dir, workers=None, **options):
+    """Compare every *.nc file of ``reference_dir`` with the file of the same
+    name in ``new_dir`` (a missing one fails), spread over ``workers``
+    processes (default: one per CPU).  Returns the Results in name order."""
+    pairs = [(os.path.join(new_dir, os.path.basename(path)), path)
+             for path in sorted(glob.glob(os.path.join(reference_dir, '*.nc')))]
+    check = functools.partial(_verify_pair, options)
+    if workers == 1 or len(pairs) < 2:
+        return list(map(check, pairs))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check, pairs, chunksize=max(1, len(pairs) // 256)))
+
+
+def report(results, out=None):
+    """Print one line per file, its first differences, and a summary;
+    returns the number of files that do not match."""
+    out = out or sys.stdout
+    failed = 0
+    for result in results:
+        name = os.path.basename(result.reference)
+        if result.ok:
+            out.write('OK    %s\n' % name)
+            continue
+        failed += 1
+        if result.error:
+            out.write('FAIL  %s: %s\n' % (name, result.error))
+            continue
+        out.write('DIFF  %s: %d difference(s)\n' % (name, len(result.differences)))
+        for difference in result.differences[:MAX_DIFFERENCES]:
+            out.write('        %s\n' % difference)
+        if len(result.differences) > MAX_DIFFERENCES:
+            out.write('        ...\n')
+    out.write('%d file(s) match, %d differ\n' % (len(results) - failed, failed))
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compare regenerated netCDF files with reference outputs.')
+    parser.add_argument('new', help='file, or directory of *.nc files, to check')
+    parser.add_argument('reference', help='reference file, or directory of '
+                                          'reference *.nc files (e.g. nc/)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL,
+                        help='relative tolerance of floating-point values '
+                             '(default: %(default)s)')
+    parser.add_argument('--atol', type=float, default=DEFAULT_ATOL,
+                        help='absolute tolerance of floating-point values '
+                             '(default: %(default)s)')
+    parser.add_argument('--ignore', metavar='ATTRIBUTE', action='append', default=[],
+                        help='also ignore this global attribute (repeatable; '
+                             'always ignored: %s)' % ', '.join(sorted(VOLATILE)))
+    parser.add_argument('--additions', action='store_true',
+                        help='accept dimensions, variables and attributes '
+                             'missing from the reference')
+    parser.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS,
+                        help='rows of each variable read at a time '
+                             '(default: %(default)s)')
+    args = parser.parse_args(argv)
+    options = dict(rtol=args.rtol, atol=args.atol,
+                   ignore=VOLATILE | frozenset(args.ignore),
+                   additions=args.additions, block_rows=args.block_rows)
+    if os.path.isdir(args.reference):
+        if not os.path.isdir(args.new):
+            parser.error('%s is not a directory' % args.new)
+        results = verify_directory(args.new, args.reference, workers=args.workers,
+                                   **options)
+    else:
+        results = [verify_file(args.new, args.reference, **options)]
+    return 1 if report(results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : writer.py
+#  Required    : numpy
+#  Purpose     : Bulk writes of in-memory columns into netCDF variables. Each
+#                variable is written with one slice assignment per block of
+#                rows rather than one HDF5 call per element, so a variable on
+#                the unlimited 'timeSeries' dimension is extended once per
+#                block instead of once per row.
+
+import numpy as np
+
+# rows per slice assignment; None or 0 writes a whole column in one call
+DEFAULT_BLOCK_SIZE = 65536
+
+
+def write_blocks(variable, values, start=0, block_size=DEFAULT_BLOCK_SIZE):
+    """Write ``values`` into ``variable`` along its first dimension.
+
+    Rows ``start:start+len(values)`` are written with one slice assignment
+    per ``block_size`` rows.  Returns the row index following the last row
+    written, which is where the next block of the same variable goes.
+    """
+    values = np.asarray(values)
+    count = len(values)
+    if not block_size or block_size >= count:
+        if count:
+            variable[start:start + count] = values
+        return start + count
+    for offset in range(0, count, block_size):
+        block = values[offset:offset + block_size]
+        variable[start + offset:start + offset + len(block)] = block
+    return start + count
+
+
+def write_columns(columns, start=0, block_size=DEFAULT_BLOCK_SIZE):
+    """Write several ``(variable, values)`` pairs of equal length starting
+    at row ``start`` and return the row index following the last row."""
+    stop = start
+    for variable, values in columns:
+        stop = write_blocks(variable, values, start, block_size)
+    return stop
@@ -0,0 +1,104 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_aggregate.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : Monthly files stitched into one file per station and stream
+#                (csv2nc/aggregate.py).
+
+import os
+import shutil
+import sys
+
+import netCDF4
+import numpy as np
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import aggregate, manifest
+from csv2nc.api import convert
+from csv2nc.verify import compare_files, VOLATILE
+
+SAMPLES = os.path.join(TESTS, os.pardir, 'csv')
+MONTHS = ['gcoos_ioos_station_DISL_BSCA_2015_05_atm',
+          'gcoos_ioos_station_DISL_BSCA_2015_06_atm']
+
+
+def _copy(directory, prefixes):
+    pairs = []
+    for prefix in prefixes:
+        paths = []
+        for extension in ('.csv', '.hdr'):
+            paths.append(str(directory / (prefix + extension)))
+            shutil.copy(os.path.join(SAMPLES, prefix + extension), paths[-1])
+        pairs.append(tuple(paths))
+    return pairs
+
+
+def _times(path):
+    with netCDF4.Dataset(path) as nc:
+        return nc['time'][:]
+
+
+def test_group():
+    pairs = [('b/x_2015_06_atm.csv', 'b/x_2015_06_atm.hdr'),
+             ('b/x_2015_05_ocn.csv', 'b/x_2015_05_ocn.hdr'),
+             ('b/x_2015_05_atm.csv', 'b/x_2015_05_atm.hdr'),
+             ('b/x_latest_atm.csv', 'b/x_latest_atm.hdr')]
+    groups = aggregate.group(pairs)
+    assert list(groups) == ['x_atm', 'x_ocn']
+    assert [csv for csv, _ in groups['x_atm']] == ['b/x_2015_05_atm.csv',
+                                                   'b/x_2015_06_atm.csv']
+    assert aggregate.aggregate_name('b/x_latest_atm.csv') is None
+
+
+def test_build_stitches_months(tmp_path):
+    members = _copy(tmp_path, MONTHS)
+    outfile = str(tmp_path / 'gcoos_ioos_station_DISL_BSCA_atm.nc')
+    rows, _ = aggregate.build(members, outfile, chunk_rows=200)
+
+    months = []
+    for n, (csv_path, hdr_path) in enumerate(members):
+        months.append(str(tmp_path / ('month%d.nc' % n)))
+        convert(csv_path, hdr_path, months[-1])
+    times = _times(outfile)
+    assert rows == len(times)
+    stitched = np.concatenate([_times(path) for path in months])
+    assert times.tolist() == stitched.tolist()
+    assert (np.diff(times) > 0).all()
+    with netCDF4.Dataset(outfile) as nc:
+        assert nc.title.endswith('for the period 2015-05 to 2015-06')
+        assert nc.time_coverage_start == '2015-05-01T00:30:00Z'
+        with netCDF4.Dataset(months[-1]) as last:
+            assert nc.time_coverage_end == last.time_coverage_end
+    assert os.path.isfile(outfile + '.index.json')
+
+
+def test_update_appends_new_month(tmp_path):
+    members = _copy(tmp_path, MONTHS)
+    outfile = str(tmp_path / 'gcoos_ioos_station_DISL_BSCA_atm.nc')
+
+    action, rows, entry = aggregate.update(None, members[:1], outfile)
+    assert action == manifest.CONVERT
+    action, same, entry = aggregate.update(entry, members[:1], outfile)
+    assert (action, same) == (manifest.SKIP, rows)
+    action, total, entry = aggregate.update(entry, members, outfile)
+    assert action == manifest.APPEND
+    assert [member['name'] for member in entry['members']] == \
+        [os.path.basename(csv_path) for csv_path, _ in members]
+
+    rebuilt = str(tmp_path / 'rebuilt.nc')
+    assert aggregate.build(members, rebuilt)[0] == total
+    # the file id is the name of the file
+    assert compare_files(outfile, rebuilt, ignore=VOLATILE | {'id'}) == []
+
+
+def test_earlier_month_changed_rebuilds(tmp_path):
+    members = _copy(tmp_path, MONTHS)
+    outfile = str(tmp_path / 'gcoos_ioos_station_DISL_BSCA_atm.nc')
+    _, _, entry = aggregate.update(None, members, outfile)
+    with open(members[0][0], 'a') as fh:
+        fh.write('2015-05-31,23:59:00,1012.0,22.0,-999.0,66.0,6.0,-999.0,'
+                 '244.0\n')
+    assert aggregate.plan(entry, members, outfile)[0] == manifest.CONVERT
@@ -0,0 +1,56 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_append.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : A file converted from the start of a CSV and appended the
+#                rest (csv2nc/engine.py, append_file) equals the file
+#                converted from the whole CSV.
+
+import os
+import shutil
+import sys
+
+import pytest
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc.engine import append_file, convert_file
+from csv2nc.header import read_hdr
+from csv2nc.verify import compare_files
+
+SAMPLES = os.path.join(TESTS, os.pardir, 'csv')
+
+
+@pytest.mark.parametrize('prefix, rows', [
+    ('gcoos_ioos_station_DISL_BSCA_2015_05_atm', 400),
+    # splits the two rows of a timestamp, merged into one record
+    ('gcoos_ioos_station_DISL_BSCA_2015_11_ocn', 401),
+])
+def test_append_equals_conversion(tmp_path, prefix, rows):
+    source = os.path.join(SAMPLES, prefix)
+    csv_path = str(tmp_path / (prefix + '.csv'))
+    hdr_path = str(tmp_path / (prefix + '.hdr'))
+    shutil.copy(source + '.hdr', hdr_path)
+    with open(source + '.csv') as fh:
+        lines = fh.readlines()
+    station = read_hdr(hdr_path)
+    options = dict(file_id=prefix, chunk_rows=128)
+
+    whole = str(tmp_path / 'whole.nc')
+    shutil.copy(source + '.csv', csv_path)
+    convert_file(csv_path, whole, station, station['period'], **options)
+
+    appended = str(tmp_path / 'appended.nc')
+    with open(csv_path, 'w') as fh:
+        fh.writelines(lines[:rows + 1])
+    first = convert_file(csv_path, appended, station, station['period'],
+                         **options)
+    offset = os.path.getsize(csv_path)
+    with open(csv_path, 'w') as fh:
+        fh.writelines(lines)
+    added = append_file(csv_path, appended, offset, chunk_rows=128)
+
+    assert first and added
+    assert compare_files(appended, whole) == []
@@ -0,0 +1,87 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_coverage.py
+#  Usage       : python -m pytest tests
+#  Purpose     : ACDD time/vertical coverage and time index blocks
+#                (csv2nc/coverage.py).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.cf import FILL_VALUE
+from csv2nc.coverage import Coverage, index_rows, iso_duration, INDEX_ROWS
+
+DAY = 86400
+
+
+def test_bounds_and_resolution_across_chunks():
+    extent = Coverage()
+    extent.add_times([0, 600, 1200])
+    # the interval between chunks counts; a repeated time does not
+    extent.add_times([1800, 1800, 5400])
+    attributes = extent.attributes()
+    assert attributes['time_coverage_start'] == '1970-01-01T00:00:00Z'
+    assert attributes['time_coverage_end'] == '1970-01-01T01:30:00Z'
+    assert attributes['time_coverage_duration'] == 'PT1H30M'
+    # intervals 600 x3 and 3600 x1
+    assert attributes['time_coverage_resolution'] == 'PT10M'
+    assert 'geospatial_vertical_min' not in attributes
+
+
+def test_resolution_is_the_median():
+    extent = Coverage()
+    extent.add_times([0, 60, 120, 3720, 7320, 10920])
+    assert extent.resolution() == 3600
+    extent = Coverage()
+    # an even count: the lower of the two middle intervals
+    extent.add_times([0, 60, 3660])
+    assert extent.resolution() == 60
+
+
+def test_unordered_times():
+    extent = Coverage()
+    extent.add_times([DAY, 0, 2 * DAY])
+    assert (extent.start, extent.end) == (0, 2 * DAY)
+    # the step back is left out of the intervals
+    assert extent.resolution() == 2 * DAY
+
+
+def test_empty():
+    attributes = Coverage().attributes()
+    assert attributes['time_coverage_start'] == ''
+    assert attributes['time_coverage_resolution'] == ''
+
+
+def test_depths():
+    extent = Coverage()
+    extent.add_depths([[0., 2.2], [FILL_VALUE, 2.6]])
+    extent.add_depths([FILL_VALUE])
+    extent.add_depths([1.5])
+    attributes = extent.attributes()
+    assert attributes['geospatial_vertical_min'] == 0.
+    assert attributes['geospatial_vertical_max'] == 2.6
+
+
+def test_iso_duration():
+    assert iso_duration(0) == 'PT0S'
+    assert iso_duration(30 * DAY + 23 * 3600) == 'P30DT23H'
+    assert iso_duration(DAY) == 'P1D'
+    assert iso_duration(3661) == 'PT1H1M1S'
+
+
+def test_index_blocks():
+    assert index_rows() == INDEX_ROWS
+    # whole chunks of at least INDEX_ROWS rows
+    assert index_rows(1000) == 2000
+    assert index_rows(4096) == 4096
+    extent = Coverage(chunk_rows=INDEX_ROWS)
+    extent.add_times(range(0, 1000))
+    extent.add_times(range(1000, INDEX_ROWS + 10))
+    assert extent.blocks == [[0, 0, INDEX_ROWS - 1],
+                             [INDEX_ROWS, INDEX_ROWS, INDEX_ROWS + 9]]
+    # the next station starts a block of its own
+    extent.restart()
+    extent.add_times([5, 3])
+    assert extent.blocks[-1] == [INDEX_ROWS + 10, 3, 5]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_manifest.py
+#  Usage       : python -m pytest tests
+#  Purpose     : Skip/append/convert decisions of incremental runs
+#                (csv2nc/manifest.py).
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc import manifest
+
+HEADER = 'date,time,air_temperature (Celsius)\n'
+ROWS = '2015-05-01,00:30:00,22.6\n2015-05-01,01:30:00,22.7\n'
+MORE = '2015-05-01,02:30:00,22.8\n'
+
+STATION = {'urn': 'urn:ioos:station:DISL:BSCA', 'records': 2}
+SETTINGS = {'profile': 'archive'}
+
+
+@pytest.fixture
+def files(tmp_path):
+    """(csv, hdr, outfile) paths and the manifest entry they were
+    converted with."""
+    csv_path, hdr_path = tmp_path / 'a_atm.csv', tmp_path / 'a_atm.hdr'
+    outfile = tmp_path / 'a_atm.nc'
+    csv_path.write_text(HEADER + ROWS)
+    hdr_path.write_text('header')
+    outfile.write_bytes(b'')
+    entry = manifest.make_entry(str(csv_path), str(hdr_path), STATION, 2,
+                                SETTINGS)
+    return csv_path, hdr_path, outfile, entry
+
+
+def _plan(files, station=STATION, settings=SETTINGS, entry=None):
+    csv_path, hdr_path, outfile, made = files
+    return manifest.plan(made if entry is None else entry, str(csv_path),
+                         str(hdr_path), str(outfile), station, settings)
+
+
+def _touch(path):
+    stat = os.stat(str(path))
+    os.utime(str(path), (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_unchanged_is_skipped(files):
+    assert _plan(files) == (manifest.SKIP, 0)
+
+
+def test_touched_is_skipped(files):
+    _touch(files[0])
+    _touch(files[1])
+    assert _plan(files) == (manifest.SKIP, 0)
+
+
+def test_new_rows_are_appended(files):
+    csv_path = files[0]
+    csv_path.write_text(HEADER + ROWS + MORE)
+    _touch(csv_path)
+    assert _plan(files) == (manifest.APPEND, len(HEADER + ROWS))
+
+
+def test_convert(files):
+    csv_path, hdr_path, outfile, entry = files
+    # no manifest entry, or other settings
+    assert _plan(files, entry={}) == (manifest.CONVERT, 0)
+    assert _plan(files, settings={}) == (manifest.CONVERT, 0)
+    # new rows for a station whose header changed
+    csv_path.write_text(HEADER + ROWS + MORE)
+    _touch(csv_path)
+    moved = dict(STATION, urn='urn:ioos:station:DISL:KATA')
+    assert _plan(files, station=moved) == (manifest.CONVERT, 0)
+    # the header changed alone
+    csv_path.write_text(HEADER + ROWS)
+    os.utime(str(csv_path), (entry['csv']['mtime'], entry['csv']['mtime']))
+    hdr_path.write_text('HEADER')
+    _touch(hdr_path)
+    assert _plan(files) == (manifest.CONVERT, 0)
+
+
+def test_rewritten_rows_are_converted(files):
+    csv_path = files[0]
+    csv_path.write_text(HEADER + ROWS.replace('22.7', '22.9') + MORE)
+    _touch(csv_path)
+    assert _plan(files) == (manifest.CONVERT, 0)
+
+
+def test_unterminated_row_is_converted(files):
+    csv_path, hdr_path, outfile, _ = files
+    csv_path.write_text(HEADER + ROWS.rstrip('\n'))
+    entry = manifest.make_entry(str(csv_path), str(hdr_path), STATION, 2,
+                                SETTINGS)
+    # the last row was incomplete when converted: more of it may follow
+    csv_path.write_text(HEADER + ROWS.rstrip('\n') + '5\n' + MORE)
+    _touch(csv_path)
+    assert _plan(files, entry=entry) == (manifest.CONVERT, 0)
+
+
+def test_missing_output_is_converted(files):
+    os.remove(str(files[2]))
+    assert _plan(files) == (manifest.CONVERT, 0)
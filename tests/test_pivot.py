@@ -0,0 +1,94 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_pivot.py
+#  Usage       : python -m pytest tests
+#  Purpose     : Pivot of ocn rows onto the (time, level) grid
+#                (csv2nc/pivot.py).
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.cf import FILL_VALUE
+from csv2nc.pivot import Rows, LayoutError, count_levels, pivot
+from csv2nc.schema import read_schema
+
+F = FILL_VALUE
+
+
+def _rows(*rows):
+    """Rows from (seconds, depth, value, ...) tuples."""
+    seconds, depth = [row[0] for row in rows], [row[1] for row in rows]
+    return Rows(np.array(seconds, dtype='i8'), np.array(depth, dtype='d'),
+                np.array([row[2:] for row in rows], dtype='d'))
+
+
+def test_records_and_levels():
+    records = pivot(_rows((20, 2., 5.), (10, 2., 2.), (10, 0., 1.),
+                          (20, 0., 4.), (30, 1., 6.)), 2)
+    assert records.times.tolist() == [10, 20, 30]
+    # the shallowest depth first, missing levels filled
+    assert records.z.tolist() == [[0., 2.], [0., 2.], [1., F]]
+    assert records.values[..., 0].tolist() == [[1., 2.], [4., 5.], [6., F]]
+    assert records.duplicates == 0
+
+
+def test_duplicates_merged():
+    records = pivot(_rows((10, 0., 1., F), (10, 0., F, 7.), (10, 0., 3., F),
+                          (10, 1., 2., 8.)), 2)
+    assert records.times.tolist() == [10]
+    # the last value that is not a fill value wins, column by column
+    assert records.values.tolist() == [[[3., 7.], [2., 8.]]]
+    assert records.duplicates == 2
+
+
+def test_too_many_depths():
+    with pytest.raises(LayoutError):
+        pivot(_rows((10, 0., 1.), (10, 1., 2.), (10, 2., 3.)), 2)
+    # a LayoutError is a ValueError
+    with pytest.raises(ValueError):
+        pivot(_rows((10, 0., 1.), (10, 1., 2.)), 1)
+
+
+def test_empty():
+    records = pivot(Rows(np.zeros(0, 'i8'), np.zeros(0), np.zeros((0, 1))), 3)
+    assert len(records.times) == 0
+    assert records.z.shape == (0, 3)
+    assert records.values.shape == (0, 3, 1)
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 3, None])
+def test_count_levels(tmp_path, chunk_rows):
+    path = tmp_path / 'levels_ocn.csv'
+    path.write_text(
+        'date,time,depth (m),sea_water_temperature (Celsius)\n'
+        '2015-11-01,00:00:00,0.0,20.1\n'
+        '2015-11-01,00:00:00,2.2,20.2\n'
+        '2015-11-01,01:00:00,0.0,20.3\n'
+        '2015-11-01,01:00:00,1.1,20.4\n'
+        '2015-11-01,01:00:00,1.1,20.5\n'
+        '2015-11-01,01:00:00,2.3,20.6\n'
+        'bad-date,02:00:00,0.0,20.7\n'
+        '2015-11-01,02:00:00,0.0,20.8\n')
+    schema = read_schema(str(path))
+    levels, rows = count_levels(str(path), schema, chunk_rows)
+    # the duplicate depth is one level, the bad row is not counted
+    assert levels == 3
+    assert rows == chunk_rows
+
+
+def test_count_levels_unordered(tmp_path):
+    path = tmp_path / 'unordered_ocn.csv'
+    path.write_text(
+        'date,time,depth (m),sea_water_temperature (Celsius)\n'
+        '2015-11-01,01:00:00,0.0,20.1\n'
+        '2015-11-01,01:00:00,1.0,20.2\n'
+        '2015-11-01,00:00:00,0.0,20.3\n'
+        '2015-11-01,01:00:00,2.0,20.4\n')
+    levels, rows = count_levels(str(path), read_schema(str(path)), 2)
+    # time goes back: the file is pivoted at once
+    assert (levels, rows) == (3, None)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_qc.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : QARTOD flags and actual ranges of the observation columns
+#                (csv2nc/qc.py).
+
+import os
+import sys
+
+import netCDF4
+import numpy as np
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import qc
+from csv2nc.api import convert
+from csv2nc.cf import FILL_VALUE
+from csv2nc.schema import Column
+
+SAMPLE = os.path.join(TESTS, os.pardir, 'csv',
+                      'gcoos_ioos_station_DISL_BSCA_2015_05_atm')
+
+# valid range -10 to 40 (cf.VARIABLES)
+AIR_TEMPERATURE = Column('air_temperature', 'Celsius')
+# not in cf.VARIABLES
+UNKNOWN = Column('unknown_quantity', '1')
+
+
+def test_flags():
+    checks = qc.Checks()
+    values = np.array([20., -11., 41., FILL_VALUE, np.nan, 25., 30.])
+    suspect = np.array([False, False, False, False, False, True, False])
+    flags = checks.flags(AIR_TEMPERATURE, values, suspect)
+    assert flags.tolist() == [qc.PASS, qc.FAIL, qc.FAIL, qc.MISSING,
+                              qc.MISSING, qc.SUSPECT, qc.PASS]
+    # failed and missing values are left out of the range, suspect ones not
+    assert checks.actual_ranges()['air_temperature'].tolist() == [20., 30.]
+
+
+def test_flags_without_valid_range():
+    checks = qc.Checks()
+    flags = checks.flags(UNKNOWN, np.array([1e6, FILL_VALUE]))
+    assert flags.tolist() == [qc.NOT_EVALUATED, qc.MISSING]
+    assert checks.actual_ranges()['unknown_quantity'].tolist() == [1e6, 1e6]
+
+
+def test_profile_flags():
+    # (records, levels): the time check applies to whole records
+    values = np.array([[20., FILL_VALUE], [21., 45.]])
+    flags = qc.Checks().flags(AIR_TEMPERATURE, values, np.array([False, True]))
+    assert flags.tolist() == [[qc.PASS, qc.MISSING], [qc.SUSPECT, qc.FAIL]]
+
+
+def test_time_flags_across_chunks():
+    checks = qc.Checks()
+    assert checks.time_flags([10, 20, 20, 15, 30]).tolist() == \
+        [False, False, True, True, False]
+    # the next chunk is checked against the latest time of the previous one
+    assert checks.time_flags([25, 40]).tolist() == [True, False]
+    assert checks.latest == 40
+    assert qc.Checks(latest=50).time_flags([50, 60]).tolist() == [True, False]
+
+
+def test_ranges_accumulate():
+    checks = qc.Checks(ranges={'air_temperature': (5., 10.)})
+    checks.flags(AIR_TEMPERATURE, np.array([12., 8.]))
+    checks.flags(AIR_TEMPERATURE, np.array([FILL_VALUE, 50.]))
+    checks.flags(AIR_TEMPERATURE, np.array([-1.]))
+    assert checks.actual_ranges()['air_temperature'].tolist() == [-1., 12.]
+
+
+def test_flag_attributes():
+    attributes = qc.flag_attributes(AIR_TEMPERATURE)
+    assert attributes['standard_name'] == 'air_temperature status_flag'
+    assert attributes['flag_values'].tolist() == [1, 2, 3, 4, 9]
+    assert 'standard_name' not in qc.flag_attributes(UNKNOWN)
+
+
+def test_actual_range_written(tmp_path):
+    outfile = str(tmp_path / 'atm.nc')
+    convert(SAMPLE + '.csv', SAMPLE + '.hdr', outfile, chunk_rows=100)
+    with netCDF4.Dataset(outfile) as nc:
+        nc.set_auto_mask(False)
+        for name in ('air_pressure', 'air_temperature', 'wind_speed'):
+            values = nc[name][:]
+            flags = nc[qc.flag_name(name)][:]
+            kept = values[(flags != qc.FAIL) & (flags != qc.MISSING)]
+            assert nc[name].actual_range.tolist() == [kept.min(), kept.max()]
+            assert not (flags[values == FILL_VALUE] != qc.MISSING).any()
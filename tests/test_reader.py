@@ -0,0 +1,47 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_reader.py
+#  Usage       : python -m pytest tests
+#  Purpose     : Row chunking of the streaming CSV reader (csv2nc/reader.py).
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.reader import iter_chunks
+
+DTYPE = np.dtype([('time', 'd'), ('value', 'd')])
+
+ROWS = '\n'.join('%d,%d.5' % (n, n) for n in range(10)) + '\n'
+
+
+def _read(path, **options):
+    chunks = list(iter_chunks(str(path), DTYPE, **options))
+    return np.concatenate(chunks) if chunks else np.zeros(0, DTYPE)
+
+
+def test_header_skipped(tmp_path):
+    path = tmp_path / 'header.csv'
+    path.write_text('time,value\n' + ROWS)
+    rows = _read(path, chunk_rows=3)
+    assert rows['time'].tolist() == list(range(10))
+
+
+def test_headerless(tmp_path):
+    path = tmp_path / 'headerless.csv'
+    path.write_text(ROWS)
+    for chunk_rows in (3, None):
+        rows = _read(path, chunk_rows=chunk_rows, skip_header=0)
+        assert rows['time'].tolist() == list(range(10))
+        assert rows['value'].tolist() == [n + .5 for n in range(10)]
+
+
+def test_offset(tmp_path):
+    path = tmp_path / 'offset.csv'
+    path.write_text('time,value\n' + ROWS)
+    offset = len('time,value\n') + len('0,0.5\n1,1.5\n')
+    rows = _read(path, chunk_rows=4, offset=offset)
+    assert rows['time'].tolist() == list(range(2, 10))
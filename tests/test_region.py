@@ -0,0 +1,85 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_region.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : Stations of a period merged into one contiguous ragged
+#                array file (csv2nc/region.py).
+
+import os
+import sys
+
+import netCDF4
+import numpy as np
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import region
+from csv2nc.api import convert
+from csv2nc.cf import FILL_VALUE
+
+SAMPLE = os.path.join(TESTS, os.pardir, 'csv',
+                      'gcoos_ioos_station_DISL_BSCA_2015_05_atm')
+
+
+def _stations(directory):
+    """(csv, hdr) of the sample station and of a second one holding the
+    first 100 rows of its first three columns."""
+    with open(SAMPLE + '.csv') as fh:
+        lines = fh.readlines()
+    with open(SAMPLE + '.hdr') as fh:
+        header = fh.read()
+    first = str(directory / 'gcoos_ioos_station_DISL_BSCA_2015_05_atm')
+    second = str(directory / 'gcoos_ioos_station_DISL_KATA_2015_05_atm')
+    with open(first + '.csv', 'w') as fh:
+        fh.writelines(lines)
+    with open(first + '.hdr', 'w') as fh:
+        fh.write(header)
+    with open(second + '.csv', 'w') as fh:
+        fh.writelines(','.join(line.split(',')[:3]) + '\n'
+                      for line in lines[:101])
+    with open(second + '.hdr', 'w') as fh:
+        fh.write(header.replace('DISL:BSCA', 'DISL:KATA')
+                       .replace('30.3288', '30.2500'))
+    return [(prefix + '.csv', prefix + '.hdr') for prefix in (first, second)]
+
+
+def test_row_size(tmp_path):
+    members = _stations(tmp_path)
+    outfile = str(tmp_path / 'gcoos_ioos_region_2015_05_atm.nc')
+    rows = region.build(members, outfile, chunk_rows=256)
+
+    single = str(tmp_path / 'single.nc')
+    convert(members[0][0], members[0][1], single)
+    with netCDF4.Dataset(outfile) as nc, netCDF4.Dataset(single) as one:
+        row_size = nc['row_size'][:]
+        assert row_size.tolist() == [len(one['time']), 100]
+        assert row_size.sum() == rows == len(nc.dimensions['obs'])
+        assert nc['lat'][:].tolist() == [30.3288, 30.25]
+
+        first = region.station_rows(row_size, 0)
+        second = region.station_rows(row_size, 1)
+        assert (first.start, first.stop) == (0, row_size[0])
+        assert (second.start, second.stop) == (row_size[0], rows)
+        assert nc['time'][first].tolist() == one['time'][:].tolist()
+        assert nc['air_temperature'][first].tolist() == \
+            one['air_temperature'][:].tolist()
+        assert nc['time'][second].tolist() == one['time'][:100].tolist()
+        # the columns the second station lacks are filled
+        nc.set_auto_mask(False)
+        assert (nc['air_temperature'][second] == FILL_VALUE).all()
+        assert not (nc['air_pressure'][second] == FILL_VALUE).all()
+
+
+def test_station_rows():
+    row_size = np.array([3, 0, 2])
+    assert region.station_rows(row_size, 0) == slice(0, 3)
+    assert region.station_rows(row_size, 1) == slice(3, 3)
+    assert region.station_rows(row_size, 2) == slice(3, 5)
+
+
+def test_region_name():
+    assert region.region_name('d/y_2015_06_atm.csv') == \
+        'gcoos_ioos_region_2015_06_atm'
+    assert region.region_name('x_latest_atm.csv') is None
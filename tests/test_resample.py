@@ -0,0 +1,101 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_resample.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : Hourly/daily binning of the observations
+#                (csv2nc/resample.py).
+
+import os
+import sys
+
+import netCDF4
+import numpy as np
+import pytest
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import qc, resample
+from csv2nc.api import convert
+from csv2nc.cf import FILL_VALUE
+from csv2nc.schema import Column
+
+F = FILL_VALUE
+COLUMNS = (Column('air_temperature', 'Celsius'),)
+SAMPLE = os.path.join(TESTS, os.pardir, 'csv',
+                      'gcoos_ioos_station_DISL_BSCA_2015_05_atm')
+
+
+def _add(resampler, seconds, values, flags=None):
+    values = np.array(values, dtype='d')
+    if flags is None:
+        flags = np.where(values == F, qc.MISSING, qc.PASS)
+    resampler.add(np.array(seconds, dtype='i8'), [values], [np.array(flags)])
+
+
+def test_hour_edges():
+    resampler = resample.Resampler('hourly', COLUMNS)
+    # a bin holds [start, start + 3600)
+    _add(resampler, [3600, 7199, 7200, 10799], [1., 3., 5., 7.])
+    times, (means, mins, maxs), counts = resampler.bins()
+    assert times.tolist() == [3600., 7200.]
+    assert means[:, 0].tolist() == [2., 6.]
+    assert mins[:, 0].tolist() == [1., 5.]
+    assert maxs[:, 0].tolist() == [3., 7.]
+    assert counts[:, 0].tolist() == [2, 2]
+
+
+def test_day_edges_are_utc_midnight():
+    resampler = resample.Resampler('daily', COLUMNS)
+    _add(resampler, [86399, 86400, 2 * 86400 - 1], [1., 2., 4.])
+    times, (means, _, _), counts = resampler.bins()
+    assert times.tolist() == [0., 86400.]
+    assert means[:, 0].tolist() == [1., 3.]
+
+
+def test_chunks_in_any_order():
+    resampler = resample.Resampler('hourly', COLUMNS)
+    _add(resampler, [5 * 3600 + 10], [5.])
+    # earlier bins, and a gap, after the first chunk
+    _add(resampler, [3600, 2 * 3600], [1., 2.])
+    _add(resampler, [5 * 3600 + 20], [7.])
+    times, (means, _, _), counts = resampler.bins()
+    # bins without rows are left out
+    assert times.tolist() == [3600., 7200., 18000.]
+    assert means[:, 0].tolist() == [1., 2., 6.]
+    assert counts[:, 0].tolist() == [1, 1, 2]
+
+
+def test_missing_and_failed_left_out():
+    resampler = resample.Resampler('hourly', COLUMNS)
+    _add(resampler, [0, 10, 20, 3600], [1., 99., F, F],
+         [qc.PASS, qc.FAIL, qc.MISSING, qc.MISSING])
+    times, (means, mins, maxs), counts = resampler.bins()
+    assert times.tolist() == [0., 3600.]
+    assert means[:, 0].tolist() == [1., F]
+    assert mins[:, 0].tolist() == [1., F]
+    assert maxs[:, 0].tolist() == [1., F]
+    assert counts[:, 0].tolist() == [1, 0]
+
+
+def test_check_resolutions():
+    with pytest.raises(ValueError):
+        resample.check_resolutions(['weekly'])
+    assert resample.output_path('d/x.nc', 'daily') == 'd/x_daily.nc'
+
+
+def test_product_bounds(tmp_path):
+    outfile = str(tmp_path / 'atm.nc')
+    convert(SAMPLE + '.csv', SAMPLE + '.hdr', outfile, resolutions=['hourly'],
+            chunk_rows=100)
+    with netCDF4.Dataset(outfile) as source, \
+            netCDF4.Dataset(resample.output_path(outfile, 'hourly')) as nc:
+        times = source['time'][:]
+        bins = nc['time'][:]
+        bounds = nc['time_bounds'][:]
+        assert (bins % 3600 == 0).all()
+        assert (bounds[:, 1] - bounds[:, 0] == 3600).all()
+        assert bins.tolist() == sorted(set((times // 3600 * 3600).tolist()))
+        assert nc['air_temperature_count'][:].sum() <= len(times)
+        assert nc['time'].calendar == 'standard'
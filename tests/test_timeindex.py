@@ -0,0 +1,90 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_timeindex.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : Time queries of an output directory through its catalog
+#                and the file sidecars (csv2nc/timeindex.py).
+
+import os
+import shutil
+import sys
+
+import netCDF4
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import timeindex
+from csv2nc.api import convert
+from csv2nc.coverage import iso_time
+
+SAMPLES = os.path.join(TESTS, os.pardir, 'csv')
+MAY  = 'gcoos_ioos_station_DISL_BSCA_2015_05_atm'
+JUNE = 'gcoos_ioos_station_DISL_BSCA_2015_06_atm'
+URN = 'urn:ioos:station:DISL:BSCA'
+
+
+def _convert(prefix, out_dir, **options):
+    source = os.path.join(SAMPLES, prefix)
+    outfile = os.path.join(str(out_dir), prefix + '.nc')
+    convert(source + '.csv', source + '.hdr', outfile, **options)
+    return outfile
+
+
+def _times(path):
+    with netCDF4.Dataset(path) as nc:
+        return nc['time'][:]
+
+
+def test_query_matches_the_file(tmp_path):
+    may = _convert(MAY, tmp_path)
+    _convert(JUNE, tmp_path)
+    timeindex.write_catalog(str(tmp_path))
+    times = _times(may)
+    start, end = times[100], times[200]
+
+    subsets = timeindex.query(str(tmp_path), iso_time(start), iso_time(end),
+                              variables=['air_temperature'])
+    assert [(subset.file, subset.urn) for subset in subsets] == \
+        [(os.path.basename(may), URN)]
+    subset = subsets[0]
+    assert subset.rows.tolist() == list(range(100, 201))
+    assert subset.time.tolist() == times[100:201].tolist()
+    with netCDF4.Dataset(may) as nc:
+        assert subset.values['air_temperature'].tolist() == \
+            nc['air_temperature'][100:201].tolist()
+    # other stations, or no rows in the range
+    assert timeindex.query(str(tmp_path), start, end, urns=['urn:x']) == []
+    assert timeindex.query(str(tmp_path), 0, 1) == []
+
+
+def test_changed_files_seen(tmp_path):
+    may = _convert(MAY, tmp_path)
+    timeindex.write_catalog(str(tmp_path))
+    june_times = _times(_convert(JUNE, tmp_path))
+    # June was converted after the catalog was written
+    found = timeindex.query(str(tmp_path), june_times[0], june_times[-1])
+    assert [subset.file for subset in found] == [JUNE + '.nc']
+
+    # May rewritten with the rows of June under its name
+    shutil.copy(os.path.join(str(tmp_path), JUNE + '.nc'), may)
+    os.utime(may, (0, os.stat(may).st_mtime + 10))
+    found = timeindex.query(str(tmp_path), june_times[0], june_times[-1])
+    assert sorted(subset.file for subset in found) == \
+        [MAY + '.nc', JUNE + '.nc']
+    assert set(timeindex.load_catalog(str(tmp_path))) == \
+        {MAY + '.nc', JUNE + '.nc'}
+
+    # removed files leave the catalog, unreadable ones are not indexed
+    os.remove(may)
+    with open(os.path.join(str(tmp_path), 'broken.nc'), 'w') as fh:
+        fh.write('not netCDF')
+    assert set(timeindex.load_catalog(str(tmp_path))) == {JUNE + '.nc'}
+
+
+def test_products_left_out(tmp_path):
+    _convert(MAY, tmp_path, resolutions=['hourly'])
+    assert len(os.listdir(str(tmp_path))) > 2
+    catalog = timeindex.write_catalog(str(tmp_path))
+    assert list(catalog) == [MAY + '.nc']
@@ -0,0 +1,54 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_times.py
+#  Usage       : python -m pytest tests
+#  Purpose     : Columnar date/time parsing (csv2nc/times.py).
+
+import calendar
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from csv2nc.times import parse_timestamps
+
+
+def _epoch(year, month, day, hour=0, minute=0, second=0):
+    return calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+
+
+def test_valid_rows():
+    seconds, bad = parse_timestamps(
+        ['1970-01-01', '2015-05-01', b'2016-02-29 '],
+        ['00:00:00', '00:30:00', b' 23:59:59'])
+    assert not bad.any()
+    assert seconds.tolist() == [0, _epoch(2015, 5, 1, 0, 30, 0),
+                                _epoch(2016, 2, 29, 23, 59, 59)]
+
+
+def test_bad_and_short_rows():
+    dates = ['2015-05-01', '2015-5-01', '2015/05/01', '', '2015-05-0x',
+             '2015-05-01', '2015-05-01', '2015-05-01']
+    times = ['01:00:00', '01:00:00', '01:00:00', '01:00:00', '01:00:00',
+             '1:00:00', '01-00-00', '01:00:00xx']
+    seconds, bad = parse_timestamps(dates, times)
+    assert bad.tolist() == [False] + [True] * 7
+    assert seconds[0] == _epoch(2015, 5, 1, 1)
+    assert not seconds[1:].any()
+
+
+def test_overflow():
+    dates = ['2015-13-01', '2015-00-10', '2015-04-31', '2015-02-29',
+             '2016-02-30', '2015-05-00', '2015-05-01', '2015-05-01',
+             '2015-05-01']
+    times = ['00:00:00'] * 6 + ['24:00:00', '00:60:00', '00:00:60']
+    seconds, bad = parse_timestamps(dates, times)
+    assert bad.all()
+    assert not seconds.any()
+
+
+def test_length_mismatch():
+    with pytest.raises(ValueError):
+        parse_timestamps(['2015-05-01'], ['00:00:00', '01:00:00'])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8; mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vim: fileencoding=utf-8 tabstop=4 expandtab shiftwidth=4
+
+#  Module      : test_verify.py
+#  Required    : numpy, netCDF4
+#  Usage       : python -m pytest tests
+#  Purpose     : Regression check of regenerated files (csv2nc/verify.py).
+
+import os
+import sys
+
+import netCDF4
+import numpy as np
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, os.pardir))
+from csv2nc import verify
+from csv2nc.api import convert
+
+SAMPLE = os.path.join(TESTS, os.pardir, 'csv',
+                      'gcoos_ioos_station_DISL_BSCA_2015_05_atm')
+
+
+def _write(path, values, extra=None, **attributes):
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('time', None)
+        time = nc.createVariable('time', 'i4', ('time',))
+        time[:] = np.arange(len(values))
+        x = nc.createVariable('x', 'f8', ('time',), fill_value=-9999.)
+        x[:] = values
+        x.units = 'Celsius'
+        if extra:
+            nc.createVariable(extra, 'f8', ('time',))[:] = values
+        nc.setncatts(dict(title='test', **attributes))
+    return path
+
+
+def test_converted_twice(tmp_path):
+    # uuid and dates differ between the two runs
+    a, b = str(tmp_path / 'a.nc'), str(tmp_path / 'b.nc')
+    convert(SAMPLE + '.csv', SAMPLE + '.hdr', a)
+    convert(SAMPLE + '.csv', SAMPLE + '.hdr', b)
+    assert verify.compare_files(a, b) == []
+    assert verify.compare_files(a, b, ignore=()) != []
+
+
+def test_values_within_tolerance(tmp_path):
+    values = np.linspace(10., 30., 20)
+    reference = _write(str(tmp_path / 'r.nc'), values)
+    new = _write(str(tmp_path / 'n.nc'), values * (1 + 1e-9))
+    assert verify.compare_files(new, reference) == []
+    assert verify.compare_files(new, reference, rtol=0.) != []
+
+
+def test_values_differ_across_blocks(tmp_path):
+    values = np.arange(20.)
+    values[3] = np.nan
+    reference = _write(str(tmp_path / 'r.nc'), values)
+    changed = values.copy()
+    changed[[12, 15]] += 0.5
+    changed[18] = -9999.
+    new = _write(str(tmp_path / 'n.nc'), changed)
+    differences = verify.compare_files(new, reference, block_rows=7)
+    assert differences == [
+        'x: 3 value(s) differ, first at [12] (12.5, not 12.0), '
+        'largest difference 10017']
+
+
+def test_structure_and_attributes(tmp_path):
+    values = np.arange(5.)
+    reference = _write(str(tmp_path / 'r.nc'), values, extra='y',
+                       source='csv')
+    new = _write(str(tmp_path / 'n.nc'), values, extra='z',
+                 source='hdr', date_created='now')
+    assert verify.compare_files(new, reference) == [
+        'global: attribute source is %r, not %r' % ('hdr', 'csv'),
+        'y: variable missing',
+        'z: variable not in the reference']
+    assert verify.compare_files(new, reference, additions=True) == [
+        'global: attribute source is %r, not %r' % ('hdr', 'csv'),
+        'y: variable missing']
+
+
+def test_verify_file(tmp_path):
+    reference = _write(str(tmp_path / 'r.nc'), np.arange(3.))
+    result = verify.verify_file(str(tmp_path / 'none.nc'), reference)
+    assert (result.ok, result.error) == (False, 'no such file')
+    unreadable = tmp_path / 'bad.nc'
+    unreadable.write_bytes(b'not netCDF')
+    result = verify.verify_file(str(unreadable), reference)
+    assert not result.ok and result.error
+    result = verify.verify_file(reference, reference)
+    assert (result.ok, result.differences, result.error) == (True, [], None)